@@ -0,0 +1,194 @@
+"""
+Speed and accuracy benchmark of the transcription backends (needs ffmpeg and the backends).
+
+Transcribes the fixtures with every combination of --backends, --models and
+--compute-types (faster-whisper only), each in a fresh interpreter so model loads
+and peak RSS are their own, and reports:
+- load: seconds to load the model
+- RTF:  real-time factor, transcription seconds per second of audio (lower is faster)
+- WER:  word error rate against the reference texts, after lowercasing and dropping
+        punctuation (word-level edit distance / reference words)
+With --trim-silence or --tempo, every combination also runs with that audio
+preprocessing ("+pre" in the label); its RTF is still per second of original audio,
+so the two rows give the speedup and what it costs in WER.
+
+A fixture is a reference text <name>.txt with an audio file of the same name
+(.wav, .mp3, .m4a, .flac, .ogg, .webm). The bundled fixtures (benchmarks/fixtures/asr)
+are texts only: their audio is synthesized with espeak-ng, espeak or say when one is
+installed. Synthetic speech is easier than real recordings, so compare the WER of
+backends on the same fixtures rather than with published numbers; pass --fixtures
+with recorded audio for realistic figures.
+
+Usage: python -m benchmarks.asr [--backends whisper faster-whisper] [--models tiny base small]
+                                [--compute-types int8 float32] [--batch-size 8] [--threads 4]
+                                [--trim-silence] [--tempo 1.25] [--fixtures DIR] [--output run.json]
+"""
+import argparse
+import json
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.e2e import ROOT, peak_rss_mb
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "asr"
+AUDIO_SUFFIXES = [".wav", ".mp3", ".m4a", ".flac", ".ogg", ".webm"]
+NON_WORD = re.compile(r"[^\w\s']+")
+
+
+def normalize(text):
+    return NON_WORD.sub(" ", text.lower()).replace(" '", " ").split()
+
+
+def word_errors(reference, hypothesis):
+    """
+    Word-level edit distance (substitutions, insertions and deletions) of two texts, and
+    the number of reference words.
+    """
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def synthesize(text_file, output_dir):
+    """
+    Speak a reference text into a WAV file; returns its path, or None without a speech synthesizer.
+    """
+    audio_file = Path(output_dir) / f"{text_file.stem}.wav"
+    if shutil.which("espeak-ng") or shutil.which("espeak"):
+        command = [shutil.which("espeak-ng") or shutil.which("espeak"), "-w", str(audio_file), "-f", str(text_file)]
+    elif shutil.which("say"):
+        command = ["say", "-o", str(audio_file), "--data-format=LEI16@16000", "-f", str(text_file)]
+    else:
+        return None
+    subprocess.run(command, check=True, capture_output=True)
+    return audio_file
+
+
+def find_fixtures(fixtures_dir, tmpdir):
+    """
+    Return (name, audio file, reference text) for every fixture, synthesizing missing audio.
+    """
+    fixtures = []
+    for text_file in sorted(Path(fixtures_dir).glob("*.txt")):
+        audio_file = next((text_file.with_suffix(suffix) for suffix in AUDIO_SUFFIXES
+                           if text_file.with_suffix(suffix).exists()), None) or synthesize(text_file, tmpdir)
+        if audio_file is None:
+            print(f"Skipping {text_file.name}: no audio file and no speech synthesizer (espeak-ng, espeak, say)")
+            continue
+        fixtures.append((text_file.stem, str(audio_file), text_file.read_text(encoding="utf-8")))
+    return fixtures
+
+
+def audio_seconds(audio_file):
+    from video.audio_stream import SAMPLE_RATE, AudioFileDecoder
+    return sum(len(window) for window in AudioFileDecoder(audio_file).windows()) / SAMPLE_RATE
+
+
+def run_child(config, fixtures):
+    from rich.console import Console
+    from video import transcription
+    from video.backends import BackendSpec
+    from video.preprocessing import AudioPreprocessing
+    from video.transcription import Transcriber
+
+    transcription.console = Console(quiet=True)
+    spec = BackendSpec(config["backend"], compute_type=config["compute_type"], threads=config["threads"],
+                       batch_size=config["batch_size"])
+    start = time.perf_counter()
+    preprocessing = AudioPreprocessing(trim=config["trim"], tempo=config["tempo"])
+    transcriber = Transcriber(config["model"], backend=spec, preprocessing=preprocessing)
+    load_seconds = time.perf_counter() - start
+    if not transcriber.loaded:
+        raise RuntimeError(f"cannot load {spec.name} model '{config['model']}'")
+
+    result = {"load_seconds": load_seconds, "audio_seconds": 0.0, "seconds": 0.0, "errors": 0, "words": 0}
+    for name, audio_file, reference in fixtures:
+        start = time.perf_counter()
+        transcript = transcriber.transcribe_with_whisper(audio_file) or ""
+        result["seconds"] += time.perf_counter() - start
+        result["audio_seconds"] += audio_seconds(audio_file)
+        errors, words = word_errors(reference, transcript)
+        result["errors"] += errors
+        result["words"] += words
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def measure(config, fixtures):
+    command = [sys.executable, "-m", "benchmarks.asr", "--child", json.dumps({"config": config, "fixtures": fixtures})]
+    process = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError((process.stderr.strip().splitlines() or ["failed"])[-1])
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def configs(args):
+    for backend in args.backends:
+        for model in args.models:
+            for compute_type in args.compute_types if backend == "faster-whisper" else [None]:
+                label = f"{backend}-{compute_type}" if compute_type else backend
+                config = {"backend": backend, "model": model, "compute_type": compute_type or "int8", "label": label,
+                          "threads": args.threads, "batch_size": args.batch_size, "trim": False, "tempo": 1.0}
+                yield config
+                if args.trim_silence or args.tempo != 1.0:
+                    yield dict(config, label=f"{label}+pre", trim=args.trim_silence, tempo=args.tempo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="*", default=["whisper", "faster-whisper"])
+    parser.add_argument("--models", nargs="*", default=["tiny", "base", "small"])
+    parser.add_argument("--compute-types", nargs="*", default=["int8", "float32"], help="faster-whisper only")
+    parser.add_argument("--batch-size", type=int, default=8, help="faster-whisper windows per batch")
+    parser.add_argument("--threads", type=int, help="CPU threads (default: all cores)")
+    parser.add_argument("--trim-silence", action="store_true", help="also run with non-speech trimmed")
+    parser.add_argument("--tempo", type=float, default=1.0, help="also run with the audio sped up this much")
+    parser.add_argument("--fixtures", default=FIXTURES, help="directory of <name>.txt references and audio")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child = json.loads(args.child)
+        run_child(child["config"], child["fixtures"])
+        return
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg is not installed")
+        sys.exit(2)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fixtures = find_fixtures(args.fixtures, tmpdir)
+        if not fixtures:
+            print("No fixtures to transcribe")
+            sys.exit(2)
+        for config in configs(args):
+            try:
+                result = measure(config, fixtures)
+            except RuntimeError as e:
+                print(f"{config['label']:<22} {config['model']:<9} failed: {e}")
+                continue
+            result.update(config, rtf=result["seconds"] / result["audio_seconds"],
+                          wer=result["errors"] / max(1, result["words"]))
+            results.append(result)
+            print(f"{config['label']:<22} {config['model']:<9} load {result['load_seconds']:6.1f}s  "
+                  f"RTF {result['rtf']:6.3f}  WER {100 * result['wer']:5.1f}%  "
+                  f"{result['peak_rss_mb']:6.0f} MB peak RSS")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
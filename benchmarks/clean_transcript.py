@@ -0,0 +1,105 @@
+"""
+Transcript cleaner benchmark.
+
+Compares the original five-pass clean_transcript with the precompiled
+TranscriptCleaner (whole-text and segment-by-segment) on MB-scale synthetic
+transcripts containing timecodes, <c> tags, filler words and repeated words.
+
+Usage: python -m benchmarks.clean_transcript [--sizes 1 10 50] [--json]
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from video.cleaning import TranscriptCleaner
+
+WORDS = ("we measured the pipeline and found that the slowest stage was decoding the audio "
+         "before the transcription could even start").split()
+NOISE = ["um", "uh", "like", "you know", "so", "actually", "<00:01:02.345>", "<c>", "</c>"]
+
+
+def legacy_clean_transcript(raw_transcript):
+    """
+    The original implementation: five full re.sub passes, filler regex rebuilt per call.
+    """
+    cleaned = re.sub(r'<\d{2}:\d{2}:\d{2}\.\d{3}>', '', raw_transcript)
+    cleaned = re.sub(r'</?c>', '', cleaned)
+    filler_words = ['um', 'uh', 'like', 'you know', 'so', 'actually']
+    pattern = r'\b(?:' + '|'.join(filler_words) + r')\b'
+    cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+    cleaned = re.sub(r'\b(\w+)( \1\b)+', r'\1', cleaned, flags=re.IGNORECASE)
+    cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+    return cleaned
+
+
+def make_transcript(size_mb, seed=0):
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < size_mb * 1e6:
+        roll = rng.random()
+        if roll < 0.15:
+            token = rng.choice(NOISE)
+        elif roll < 0.2:
+            word = rng.choice(WORDS)
+            token = f"{word} {word}"
+        else:
+            token = rng.choice(WORDS)
+        parts.append(token)
+        size += len(token) + 1
+    return " ".join(parts)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def clean_incrementally(text, segment_chars=2000):
+    # Segments split on spaces, as transcription windows would arrive
+    cleaner = TranscriptCleaner()
+    pieces, start = [], 0
+    while start < len(text):
+        end = text.find(" ", start + segment_chars)
+        end = len(text) if end == -1 else end
+        pieces.append(cleaner.feed(text[start:end]))
+        start = end
+    return " ".join(piece for piece in pieces if piece)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="*", default=[1, 10, 50], help="input sizes in MB")
+    parser.add_argument("--json", action="store_true", help="print a machine-readable report")
+    args = parser.parse_args()
+
+    results = []
+    for size_mb in args.sizes:
+        text = make_transcript(size_mb)
+        legacy, legacy_seconds = timed(legacy_clean_transcript, text)
+        compiled, compiled_seconds = timed(TranscriptCleaner().clean, text)
+        incremental, incremental_seconds = timed(clean_incrementally, text)
+        results.append({
+            "size_mb": size_mb,
+            "legacy_mb_per_second": size_mb / legacy_seconds,
+            "compiled_mb_per_second": size_mb / compiled_seconds,
+            "incremental_mb_per_second": size_mb / incremental_seconds,
+            "speedup": legacy_seconds / compiled_seconds,
+            "output_chars": {"legacy": len(legacy), "compiled": len(compiled), "incremental": len(incremental)},
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(f"{r['size_mb']:g} MB: legacy {r['legacy_mb_per_second']:.1f} MB/s, "
+              f"compiled {r['compiled_mb_per_second']:.1f} MB/s ({r['speedup']:.1f}×), "
+              f"incremental {r['incremental_mb_per_second']:.1f} MB/s; "
+              f"output chars {r['output_chars']['legacy']:,} / {r['output_chars']['compiled']:,} / "
+              f"{r['output_chars']['incremental']:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Offline end-to-end benchmark of the summarization pipeline.
+
+Runs real pipeline code against the fake yt-dlp (benchmarks.fake_ytdlp) and the
+mock LLM server (benchmarks.mock_llm), so no network or API key is involved.
+Scenarios:
+- single: one 20-minute video through YouTubeSummarizer.run (streamed summary)
+- batch:  --batch-size videos through BatchSummarizer
+- long:   one --long-hours video whose transcript needs map-reduce chunking
+- audio:  one video without subtitles, transcribed by Whisper (skipped unless
+          whisper is installed)
+
+Each scenario and provider runs in a fresh interpreter, so peak RSS is its own.
+Reports per-stage wall time, peak RSS, throughput and LLM requests, and writes
+them as JSON (--output) that a later run can be compared with (--baseline).
+
+Usage: python -m benchmarks.e2e [--scenarios single batch long] [--providers OLLAMA OPENAI]
+                                [--latency 0.2] [--tokens-per-second 50] [--output run.json]
+                                [--baseline previous.json]
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fake_ytdlp import FIXTURE_ENV, LATENCY_ENV, PLAYLIST_ID, video_url, write_executable, \
+    write_fixtures
+from benchmarks.mock_llm import MockLLMServer
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ["single", "batch", "long", "audio"]
+PROVIDERS = ["OLLAMA", "OPENAI", "ANTHROPIC", "GEMINI"]
+# YouTubeSummarizer steps timed in the single-video scenarios, and the stage they belong to
+STEPS = {
+    "fetch_info": "info",
+    "fetch_subtitles": "subtitles",
+    "fetch_cached_transcription": "subtitles",
+    "download_audio": "download",
+    "transcribe": "transcribe",
+    "stream_transcribe": "transcribe",
+    "stream_summary": "summarize",
+}
+
+
+def fixture_videos(batch_size, long_hours):
+    videos = [("single0001", 1 / 3, True), ("long000001", long_hours, True), ("audio00001", 1 / 60, False)]
+    videos += [(f"batch{i:05d}", 1 / 3, True) for i in range(batch_size)]
+    return videos
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def instrument(video, stage_times):
+    """
+    Wrap the pipeline steps of a YouTubeSummarizer so their wall time is added to stage_times.
+    """
+    for name, stage in STEPS.items():
+        step = getattr(video, name)
+
+        def timed(*args, _step=step, _stage=stage, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _step(*args, **kwargs)
+            finally:
+                stage_times[_stage] = stage_times.get(_stage, 0.0) + time.perf_counter() - start
+
+        setattr(video, name, timed)
+
+
+def run_single(llm, language, video_id):
+    from summary.summarizer import YouTubeSummarizer
+
+    video = YouTubeSummarizer(video_url(video_id), llm, language)
+    stage_times = {}
+    instrument(video, stage_times)
+    video.run()
+    if not video.summary:
+        raise RuntimeError("no summary produced")
+    return {"videos": 1, "video_seconds": video.video_length_seconds, "stage_times": stage_times,
+            "transcript_chars": len(video.transcript or "")}
+
+
+def run_batch(llm, language, batch_size):
+    from summary import batch as batch_module
+    from video.playlist import PlaylistExpander
+
+    urls = PlaylistExpander(f"https://www.youtube.com/playlist?list={PLAYLIST_ID}").get_video_urls()
+    urls = [url for url in urls if "v=batch" in url][:batch_size]
+    jobs = batch_module.BatchSummarizer(llm, language).run(urls)
+    failed = [job.error for job in jobs if not job.ok]
+    if failed:
+        raise RuntimeError(f"{len(failed)} videos failed: {failed[0]}")
+    stage_times = {}
+    for job in jobs:
+        for stage, seconds in job.stage_times.items():
+            stage_times[stage] = stage_times.get(stage, 0.0) + seconds
+    return {"videos": len(jobs), "video_seconds": sum(job.video.video_length_seconds or 0 for job in jobs),
+            "stage_times": stage_times, "transcript_chars": sum(len(job.video.transcript or "") for job in jobs)}
+
+
+def run_child(args):
+    """
+    Run one scenario with one provider in this process and print its result as JSON.
+    """
+    from benchmarks import fake_ytdlp
+    fake_ytdlp.install()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from rich.console import Console
+    from clients.transport import get_transport, transport_stats
+    from models import LLMOption
+    from summary import batch, summarizer
+
+    # Keep the rich output out of the measurements
+    for module in (summarizer, batch):
+        module.console = Console(quiet=True)
+    llm = LLMOption.from_name(args.provider)
+    if not args.rate_limits:
+        get_transport(llm, requests_per_minute=None, tokens_per_minute=None)
+
+    start = time.perf_counter()
+    if args.scenario == "batch":
+        result = run_batch(llm, "english", args.batch_size)
+    else:
+        video_id = {"single": "single0001", "long": "long000001", "audio": "audio00001"}[args.scenario]
+        result = run_single(llm, "english", video_id)
+    wall = time.perf_counter() - start
+
+    result.update({
+        "scenario": args.scenario,
+        "provider": args.provider,
+        "wall_seconds": wall,
+        "peak_rss_mb": peak_rss_mb(),
+        "videos_per_minute": result["videos"] / wall * 60,
+        "realtime_factor": result["video_seconds"] / wall,
+        "llm_requests": sum(stats["requests"] for stats in transport_stats().values()),
+    })
+    print(json.dumps(result))
+
+
+def run_scenario(scenario, provider, args, env):
+    command = [sys.executable, "-m", "benchmarks.e2e", "--child", "--scenario", scenario, "--provider", provider,
+               "--batch-size", str(args.batch_size)]
+    if args.rate_limits:
+        command.append("--rate-limits")
+    process = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        error = (process.stderr.strip().splitlines() or ["failed"])[-1]
+        return {"scenario": scenario, "provider": provider, "error": error}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def print_results(results, baseline=None):
+    previous = {(r["scenario"], r["provider"]): r for r in (baseline or {}).get("results", [])}
+    for r in results:
+        name = f"{r['scenario']:<7} {r['provider']:<9}"
+        if "error" in r:
+            print(f"{name} {r['error']}")
+            continue
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in r["stage_times"].items())
+        line = (f"{name} {r['wall_seconds']:7.2f}s  {r['peak_rss_mb']:6.0f} MB  "
+                f"{r['videos_per_minute']:7.1f} videos/min  {r['llm_requests']:3d} LLM requests  [{stages}]")
+        old = previous.get((r["scenario"], r["provider"]))
+        if old and "wall_seconds" in old:
+            line += (f"  wall {100 * (r['wall_seconds'] / old['wall_seconds'] - 1):+.0f}%"
+                     f", RSS {100 * (r['peak_rss_mb'] / old['peak_rss_mb'] - 1):+.0f}%")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="*", choices=SCENARIOS, default=["single", "batch", "long"])
+    parser.add_argument("--providers", nargs="*", choices=PROVIDERS, default=PROVIDERS)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--long-hours", type=float, default=4.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock LLM seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="mock LLM output rate")
+    parser.add_argument("--output-tokens", type=int, default=200, help="mock LLM tokens per answer")
+    parser.add_argument("--ytdlp-latency", type=float, default=0.05, help="fake yt-dlp seconds per call")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the client-side provider rate limits")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare with the JSON results of an earlier run")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    parser.add_argument("--provider", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    scenarios = list(args.scenarios)
+    if "audio" in scenarios and importlib.util.find_spec("whisper") is None:
+        print("Skipping the audio scenario: whisper is not installed")
+        scenarios.remove("audio")
+
+    server = MockLLMServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                           output_tokens=args.output_tokens).start()
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fixtures = write_fixtures(Path(tmpdir) / "fixtures", fixture_videos(args.batch_size, args.long_hours))
+        bin_dir = write_executable(Path(tmpdir) / "bin").parent
+        env = {**os.environ, **server.env(),
+               FIXTURE_ENV: str(fixtures),
+               LATENCY_ENV: str(args.ytdlp_latency),
+               "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+               # Measure the pipeline, not the caches
+               "YT_TLDR_CACHE_DIR": str(Path(tmpdir) / "cache")}
+        for scenario in scenarios:
+            for provider in args.providers:
+                results.append(run_scenario(scenario, provider, args, env))
+    server.stop()
+
+    report = {
+        "created": time.time(),
+        "python": platform.python_version(),
+        "settings": {key: getattr(args, key) for key in
+                     ("batch_size", "long_hours", "latency", "tokens_per_second", "output_tokens", "ytdlp_latency",
+                      "rate_limits")},
+        "results": results,
+    }
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+    print_results(results, baseline)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
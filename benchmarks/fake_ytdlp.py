@@ -0,0 +1,182 @@
+"""
+Offline stand-in for yt-dlp used by the end-to-end benchmarks.
+
+Serves canned info dicts, WebVTT captions and WAV audio from a fixture directory
+(YT_TLDR_FAKE_YTDLP_DIR), with an optional per-call latency
+(YT_TLDR_FAKE_YTDLP_LATENCY, seconds) standing in for the network:
+- install() registers a fake `yt_dlp` module implementing the parts of the
+  YoutubeDL API the extractor uses (extract_info, urlopen, dl, sanitize_info).
+- `python -m benchmarks.fake_ytdlp [--load-info-json FILE | URL] -o -` behaves like
+  the executable the audio streamer pipes from; write_executable() puts a `yt-dlp`
+  wrapper for it on disk.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import struct
+import sys
+import time
+import types
+import wave
+from pathlib import Path
+
+from benchmarks.vtt_parse import write_rolling_fixture
+
+FIXTURE_ENV = "YT_TLDR_FAKE_YTDLP_DIR"
+LATENCY_ENV = "YT_TLDR_FAKE_YTDLP_LATENCY"
+PLAYLIST_ID = "PLbenchmark"
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def video_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def write_wav(path, seconds, sample_rate=16000):
+    """
+    Write a mono 16-bit WAV of a quiet tone with one-second pauses.
+    """
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        second = [int(3000 * math.sin(2 * math.pi * 220 * i / sample_rate)) for i in range(sample_rate)]
+        tone = struct.pack(f"<{sample_rate}h", *second)
+        silence = bytes(2 * sample_rate)
+        for i in range(int(seconds)):
+            f.writeframes(silence if i % 5 == 4 else tone)
+
+
+def write_fixtures(root, videos, audio_seconds=60):
+    """
+    Write the fixtures of every (video_id, hours, has_subtitles) entry into root and
+    a playlist listing them. Audio is capped at audio_seconds to keep fixtures small.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    for video_id, hours, has_subtitles in videos:
+        captions = {}
+        if has_subtitles:
+            write_rolling_fixture(root / f"{video_id}.en.vtt", hours)
+            captions = {"en": [{"ext": "vtt", "url": f"fixture://{video_id}.en.vtt"}]}
+        audio_path = root / f"{video_id}.wav"
+        write_wav(audio_path, min(audio_seconds, hours * 3600))
+        info = {
+            "id": video_id,
+            "title": f"Benchmark video {video_id}",
+            "duration": int(hours * 3600),
+            "webpage_url": video_url(video_id),
+            "subtitles": {},
+            "automatic_captions": captions,
+            "formats": [{"format_id": "251", "ext": "wav", "vcodec": "none", "acodec": "pcm_s16le",
+                         "url": f"fixture://{video_id}.wav", "filesize": audio_path.stat().st_size}],
+        }
+        (root / f"{video_id}.info.json").write_text(json.dumps(info), encoding="utf-8")
+
+    playlist = {"id": PLAYLIST_ID, "_type": "playlist", "title": "Benchmark playlist",
+                "entries": [{"id": video_id, "url": video_url(video_id)} for video_id, _, _ in videos]}
+    (root / f"{PLAYLIST_ID}.info.json").write_text(json.dumps(playlist), encoding="utf-8")
+    return root
+
+
+def write_executable(bin_dir):
+    """
+    Write a `yt-dlp` script running this module, to be put first on PATH.
+    """
+    bin_dir = Path(bin_dir)
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    path = bin_dir / "yt-dlp"
+    path.write_text(f'#!/bin/sh\nPYTHONPATH="{ROOT}" exec "{sys.executable}" -m benchmarks.fake_ytdlp "$@"\n')
+    path.chmod(0o755)
+    return path
+
+
+class DownloadError(Exception):
+    pass
+
+
+def _fixture_dir():
+    return Path(os.environ[FIXTURE_ENV])
+
+
+def _wait():
+    time.sleep(float(os.getenv(LATENCY_ENV, "0")))
+
+
+def _fixture_id(url):
+    match = re.search(r"(?:v=|list=)([\w-]+)", url)
+    return match.group(1) if match else url
+
+
+class FakeYoutubeDL:
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def extract_info(self, url, download=False):
+        _wait()
+        path = _fixture_dir() / f"{_fixture_id(url)}.info.json"
+        if not path.exists():
+            raise DownloadError(f"no fixture for {url}")
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def urlopen(self, url):
+        _wait()
+        return open(_fixture_dir() / url.removeprefix("fixture://"), "rb")
+
+    def dl(self, name, info):
+        _wait()
+        source = _fixture_dir() / info["url"].removeprefix("fixture://")
+        shutil.copyfile(source, name)
+        size = source.stat().st_size
+        for hook in self.params.get("progress_hooks", []):
+            hook({"status": "downloading", "downloaded_bytes": size, "total_bytes": size})
+            hook({"status": "finished", "downloaded_bytes": size, "total_bytes": size})
+        return True, info
+
+    @staticmethod
+    def sanitize_info(info):
+        return info
+
+
+def install():
+    """
+    Register the fake as the `yt_dlp` module for the current process.
+    """
+    module = types.ModuleType("yt_dlp")
+    module.YoutubeDL = FakeYoutubeDL
+    utils = types.ModuleType("yt_dlp.utils")
+    utils.DownloadError = DownloadError
+    module.utils = utils
+    sys.modules["yt_dlp"] = module
+    sys.modules["yt_dlp.utils"] = utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fake yt-dlp: writes the audio fixture of a video")
+    parser.add_argument("url", nargs="?")
+    parser.add_argument("--load-info-json")
+    parser.add_argument("-o", "--output", default="-")
+    parser.add_argument("-f", "--format")
+    parser.add_argument("--quiet", action="store_true")
+    parser.add_argument("--no-warnings", action="store_true")
+    args = parser.parse_args()
+
+    if args.load_info_json:
+        info = json.loads(Path(args.load_info_json).read_text(encoding="utf-8"))
+    else:
+        info = FakeYoutubeDL().extract_info(args.url)
+    _wait()
+    source = _fixture_dir() / info["formats"][-1]["url"].removeprefix("fixture://")
+    with open(source, "rb") as f:
+        if args.output == "-":
+            shutil.copyfileobj(f, sys.stdout.buffer)
+        else:
+            with open(args.output, "wb") as out:
+                shutil.copyfileobj(f, out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Memory benchmark of audio decoding for transcription (needs ffmpeg).
+
+Decodes WAV fixtures of growing length, each in a fresh interpreter so peak RSS is
+its own, and touches every sample the way the transcriber does:
+- windowed: AudioFileDecoder, 30-second windows through an ffmpeg pipe
+- full:     the whole file in one float32 array, like whisper.load_audio (--full)
+
+Fails (exit code 1) when the windowed peak RSS of the longest fixture exceeds the
+shortest one by more than --tolerance-mb, i.e. when memory grows with the audio length,
+or when a window is longer than the 30 seconds the model takes (checked on synthetic
+PCM chunks first, then on every decoded fixture).
+
+Usage: python -m benchmarks.long_audio [--hours 0.25 1 3] [--full] [--tolerance-mb 32]
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.e2e import ROOT, peak_rss_mb
+from benchmarks.fake_ytdlp import write_wav
+
+
+def decode_full(audio_file):
+    import numpy as np
+    from video.audio_stream import SAMPLE_RATE
+
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", audio_file,
+               "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"]
+    data = subprocess.run(command, capture_output=True, check=True).stdout
+    audio = np.frombuffer(data, np.int16).flatten().astype(np.float32) / 32768.0
+    return [audio]
+
+
+def check_windows():
+    """
+    Feed pcm_windows full, short and odd-sized s16le chunks of noise with silent gaps;
+    return the problems found (windows over 30 seconds or lost samples).
+    """
+    import numpy as np
+    from video.audio_stream import BYTES_PER_SAMPLE, SAMPLE_RATE, pcm_windows
+
+    window_bytes = 30 * SAMPLE_RATE * BYTES_PER_SAMPLE
+    rng = np.random.default_rng(0)
+    pcm = (rng.standard_normal(200 * SAMPLE_RATE) * 3000).astype(np.int16)
+    for second in range(7, 200, 11):
+        pcm[second * SAMPLE_RATE:second * SAMPLE_RATE + SAMPLE_RATE // 10] = 0
+    data = pcm.tobytes()
+    problems = []
+    for name, sizes in {"full": [window_bytes], "short": [window_bytes, 12345 * 2],
+                        "odd": [window_bytes // 3 + 2, window_bytes + 2]}.items():
+        chunks, offset, turn = [], 0, 0
+        while offset < len(data):
+            size = sizes[turn % len(sizes)]
+            chunks.append(data[offset:offset + size])
+            offset, turn = offset + size, turn + 1
+        windows = list(pcm_windows(chunks, window_bytes))
+        longest = max(len(window) for window in windows)
+        if longest > 30 * SAMPLE_RATE:
+            problems.append(f"{name} chunks: a window of {longest / SAMPLE_RATE:.2f}s")
+        if sum(len(window) for window in windows) != len(pcm):
+            problems.append(f"{name} chunks: {sum(map(len, windows))} of {len(pcm)} samples")
+    return problems
+
+
+def run_child(mode, audio_file):
+    from video.audio_stream import SAMPLE_RATE, AudioFileDecoder
+
+    start = time.perf_counter()
+    samples, energy, longest = 0, 0.0, 0
+    windows = AudioFileDecoder(audio_file).windows() if mode == "windowed" else decode_full(audio_file)
+    for window in windows:
+        samples += len(window)
+        longest = max(longest, len(window))
+        energy += float(abs(window).mean()) if len(window) else 0.0
+    print(json.dumps({"audio_seconds": samples / SAMPLE_RATE, "seconds": time.perf_counter() - start,
+                      "peak_rss_mb": peak_rss_mb(), "longest_window_seconds": longest / SAMPLE_RATE}))
+
+
+def measure(mode, audio_file):
+    command = [sys.executable, "-m", "benchmarks.long_audio", "--child", mode, str(audio_file)]
+    process = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError((process.stderr.strip().splitlines() or ["failed"])[-1])
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", nargs="*", type=float, default=[0.25, 1, 3])
+    parser.add_argument("--full", action="store_true", help="also measure whole-file decoding")
+    parser.add_argument("--tolerance-mb", type=float, default=32)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+    problems = check_windows()
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg is not installed")
+        sys.exit(2)
+
+    modes = ["windowed", "full"] if args.full else ["windowed"]
+    results = {mode: [] for mode in modes}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for hours in sorted(args.hours):
+            audio_file = Path(tmpdir) / f"{hours}h.wav"
+            write_wav(audio_file, hours * 3600)
+            for mode in modes:
+                result = measure(mode, audio_file)
+                results[mode].append(result)
+                print(f"{mode:<9} {hours:5.2f} h  {result['seconds']:7.1f}s  "
+                      f"{result['audio_seconds'] / result['seconds']:7.0f}× real time  "
+                      f"{result['peak_rss_mb']:7.0f} MB peak RSS")
+            audio_file.unlink()
+
+    windowed = results["windowed"]
+    longest = max(result["longest_window_seconds"] for result in windowed)
+    if longest > 30:
+        print(f"FAIL: a decoded window is {longest:.2f}s long")
+        sys.exit(1)
+    growth = windowed[-1]["peak_rss_mb"] - windowed[0]["peak_rss_mb"]
+    shortest, longest = min(args.hours), max(args.hours)
+    print(f"Windowed peak RSS changed by {growth:+.0f} MB from {shortest} h to {longest} h")
+    if growth > args.tolerance_mb:
+        print(f"FAIL: more than {args.tolerance_mb:.0f} MB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Local mock of the OpenAI, Anthropic, Gemini and Ollama HTTP APIs for offline benchmarks.
+
+One server answers all four protocols (plain and streaming) on these paths:
+- OpenAI:    POST /v1/chat/completions
+- Anthropic: POST /v1/messages
+- Gemini:    POST /v1beta/models/<model>:generateContent and :streamGenerateContent?alt=sse
+- Ollama:    POST /api/generate
+
+Every answer waits `latency` seconds (time to first token) and then produces
+output_tokens tokens at tokens_per_second. env() returns the variables that point
+the clients at the server.
+
+Usage: python -m benchmarks.mock_llm [--port 8000] [--latency 0.2] [--tokens-per-second 50]
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from summary.tokens import estimate_tokens
+
+WORDS = "the video explains how the pipeline works and which stage takes the most time".split()
+
+
+class MockLLMServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, tokens_per_second=50.0, output_tokens=200):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.counters = {"requests": 0, "streams": 0, "prompt_tokens": 0, "output_tokens": 0}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        return {
+            "OPENAI_API_URL": f"{self.url}/v1/chat/completions",
+            "ANTHROPIC_API_URL": f"{self.url}/v1/messages",
+            "GEMINI_API_URL": f"{self.url}/v1beta/models",
+            "OLLAMA_HOST": self.url,
+        }
+
+    def tokens(self):
+        """
+        Yield the answer tokens, paced at tokens_per_second after the initial latency.
+        """
+        time.sleep(self.latency)
+        start = time.perf_counter()
+        for i in range(self.output_tokens):
+            delay = start + i / self.tokens_per_second - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield ("" if i == 0 else " ") + WORDS[i % len(WORDS)]
+
+    def ollama_counts(self, prompt):
+        # Token counts and durations (nanoseconds) that end an Ollama answer
+        return {"prompt_eval_count": estimate_tokens(prompt), "prompt_eval_duration": int(self.latency * 1e9),
+                "eval_count": self.output_tokens,
+                "eval_duration": int(self.output_tokens / self.tokens_per_second * 1e9)}
+
+    def _count(self, prompt, stream):
+        with self.lock:
+            self.counters["requests"] += 1
+            self.counters["streams"] += int(stream)
+            self.counters["prompt_tokens"] += estimate_tokens(prompt)
+            self.counters["output_tokens"] += self.output_tokens
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, content_type, events):
+                # No Content-Length: the body ends when the connection closes
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for event in events:
+                    self.wfile.write(event.encode("utf-8"))
+                    self.wfile.flush()
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                path = self.path.split("?")[0]
+                if path.endswith("/chat/completions"):
+                    prompt, stream = body["messages"][-1]["content"], bool(body.get("stream"))
+                    protocol = "openai"
+                elif path.endswith("/messages"):
+                    prompt, stream = body["messages"][-1]["content"], bool(body.get("stream"))
+                    protocol = "anthropic"
+                elif ":generateContent" in path or ":streamGenerateContent" in path:
+                    prompt, stream = body["contents"][-1]["parts"][0]["text"], "streamGenerateContent" in path
+                    protocol = "gemini"
+                elif path == "/api/generate":
+                    prompt, stream = body.get("prompt", ""), body.get("stream", True)
+                    protocol = "ollama"
+                else:
+                    self.send_error(404)
+                    return
+                mock._count(prompt, stream)
+
+                if protocol == "ollama" and not prompt:
+                    # An empty prompt only loads the model
+                    self._send_json(ollama_chunk("", True, load_duration=int(mock.latency * 1e9)))
+                elif protocol == "ollama" and not stream:
+                    self._send_json(ollama_chunk("".join(mock.tokens()), True, **mock.ollama_counts(prompt)))
+                elif protocol == "ollama":
+                    self._send_stream("application/x-ndjson", ollama_stream(mock.tokens(), mock.ollama_counts(prompt)))
+                elif not stream:
+                    text = "".join(mock.tokens())
+                    self._send_json(RESPONSES[protocol](text))
+                else:
+                    self._send_stream("text/event-stream", STREAMS[protocol](mock.tokens()))
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def ollama_chunk(text, done, **counts):
+    return {"model": "gemma2:latest", "created_at": "2024-01-01T00:00:00Z", "response": text, "done": done, **counts}
+
+
+def sse(payload):
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def ollama_stream(tokens, counts):
+    for token in tokens:
+        yield json.dumps(ollama_chunk(token, False)) + "\n"
+    yield json.dumps(ollama_chunk("", True, **counts)) + "\n"
+
+
+def openai_stream(tokens):
+    for token in tokens:
+        yield sse({"choices": [{"delta": {"content": token}}]})
+    yield "data: [DONE]\n\n"
+
+
+def anthropic_stream(tokens):
+    yield sse({"type": "message_start"})
+    for token in tokens:
+        yield sse({"type": "content_block_delta", "delta": {"type": "text_delta", "text": token}})
+    yield sse({"type": "message_stop"})
+
+
+def gemini_stream(tokens):
+    for token in tokens:
+        yield sse({"candidates": [{"content": {"parts": [{"text": token}]}}]})
+    yield sse({"candidates": [{"content": {"parts": []}, "finishReason": "STOP"}]})
+
+
+RESPONSES = {
+    "openai": lambda text: {"choices": [{"message": {"role": "assistant", "content": text}}]},
+    "anthropic": lambda text: {"content": [{"type": "text", "text": text}]},
+    "gemini": lambda text: {"candidates": [{"content": {"parts": [{"text": text}]}}]},
+}
+STREAMS = {"openai": openai_stream, "anthropic": anthropic_stream, "gemini": gemini_stream}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--output-tokens", type=int, default=200)
+    args = parser.parse_args()
+
+    server = MockLLMServer(port=args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                           output_tokens=args.output_tokens)
+    for name, value in server.env().items():
+        print(f"export {name}={value}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Startup-time benchmark for the CLI.
+
+Measures, over several fresh interpreters:
+- cold import time of main.py (and whether heavy modules such as torch/whisper were loaded)
+- time-to-prompt: from spawning `python main.py` until the URL prompt is printed
+
+Usage: python -m benchmarks.startup [--runs 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ["torch", "whisper", "ollama", "httpx", "yt_dlp", "markdown_it", "numpy"]
+
+IMPORT_PROBE = f"""
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+import json
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import():
+    result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, capture_output=True, text=True,
+                            check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_time_to_prompt(timeout=60):
+    env = {**os.environ, "PYTHONUNBUFFERED": "1", "COLUMNS": "120"}
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, env=env)
+    try:
+        output = b""
+        while b"YouTube URL" not in output:
+            chunk = proc.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError(f"main.py exited before prompting:\n{output.decode(errors='replace')}")
+            output += chunk
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError("main.py did not prompt in time")
+        return time.perf_counter() - start
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def top_imports(limit=10):
+    """
+    Return the slowest imports of main and its direct dependencies reported by `python -X importtime`.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                            capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Keep main and its direct imports; deeper levels are indented further
+        if not cumulative_us.strip().isdigit() or len(name) - len(name.lstrip()) > 3:
+            continue
+        rows.append((int(cumulative_us) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print a machine-readable report")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    prompts = [measure_time_to_prompt() for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "import_seconds_median": statistics.median(run["seconds"] for run in imports),
+        "time_to_prompt_seconds_median": statistics.median(prompts),
+        "heavy_modules_loaded": sorted(set().union(*(run["loaded"] for run in imports))),
+        "top_imports": [{"module": name, "cumulative_seconds": seconds} for seconds, name in top_imports()],
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"cold import of main.py: {report['import_seconds_median'] * 1000:.0f} ms (median of {args.runs})")
+    print(f"time to prompt:         {report['time_to_prompt_seconds_median'] * 1000:.0f} ms (median of {args.runs})")
+    print(f"heavy modules loaded:   {', '.join(report['heavy_modules_loaded']) or 'none'}")
+    print("slowest imports:")
+    for row in report["top_imports"]:
+        print(f"  {row['cumulative_seconds'] * 1000:8.1f} ms  {row['module']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+WebVTT parsing benchmark.
+
+Compares the original line/regex vtt_to_text with the streaming, overlap-aware
+parser on large YouTube-style auto-caption fixtures (rolling cues repeating each
+line), and reports transcript tokens, tokens saved and parse throughput.
+It first checks the parser on two small tracks and exits with status 1 if it fails:
+a rolling auto-caption track must yield every word once, and a manual track must
+keep the lines its speakers repeat.
+
+Usage: python -m benchmarks.vtt_parse [--hours 1 5 10] [--file captions.vtt ...] [--json]
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from summary.tokens import estimate_tokens
+from video.transcription import TranscriptProcessor
+from video.vtt import iter_vtt_segments
+
+WORDS = ("the model we trained on this data set shows that most of the time spent in the pipeline "
+         "goes into decoding audio and waiting for network requests which we can overlap").split()
+
+
+ROLLING_SAMPLE = """WEBVTT
+Kind: captions
+
+00:00:00.000 --> 00:00:02.500 align:start position:0%
+ 
+so<00:00:00.300><c> today</c><00:00:00.600><c> we</c>
+
+00:00:02.500 --> 00:00:02.510 align:start position:0%
+so today we
+ 
+
+00:00:02.510 --> 00:00:05.000 align:start position:0%
+so today we
+talk<00:00:02.800><c> about</c><00:00:03.100><c> caching</c>
+
+00:00:05.000 --> 00:00:05.010 align:start position:0%
+talk about caching
+ 
+"""
+MANUAL_SAMPLE = """WEBVTT
+
+1
+00:00:01.000 --> 00:00:02.000
+Are you coming?
+
+2
+00:00:02.000 --> 00:00:03.000
+No.
+
+3
+00:00:03.000 --> 00:00:04.000
+No.
+
+4
+00:00:04.000 --> 00:00:05.000
+Thank you very much.
+
+5
+00:00:05.000 --> 00:00:06.000
+Bye.
+
+6
+00:00:06.000 --> 00:00:07.000
+Thank you very much.
+"""
+CHECKS = [
+    ("rolling auto-captions", ROLLING_SAMPLE, "so today we talk about caching"),
+    ("manual captions with repeated lines", MANUAL_SAMPLE,
+     "Are you coming? No. No. Thank you very much. Bye. Thank you very much."),
+]
+
+
+def check_parser():
+    """
+    Parse the sample tracks and return the names of the checks that failed.
+    """
+    failed = []
+    for name, sample, expected in CHECKS:
+        text = " ".join(text for _, _, text in iter_vtt_segments(sample.splitlines(keepends=True)))
+        if text != expected:
+            print(f"FAIL {name}: expected {expected!r}, got {text!r}")
+            failed.append(name)
+    return failed
+
+
+def legacy_vtt_to_text(vtt_file):
+    """
+    The original implementation: per-line regex, one big join, then clean_transcript.
+    """
+    lines = []
+    with open(vtt_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if '-->' in line or line.strip() == "" or line.strip().startswith("WEBVTT"):
+                continue
+            clean_line = re.sub(r'</?c>', '', line)
+            lines.append(clean_line.strip())
+    return TranscriptProcessor.clean_transcript(" ".join(lines))
+
+
+def timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def write_rolling_fixture(path, hours, seed=0):
+    """
+    Write a synthetic YouTube auto-caption file: every ~2.5 s a cue shows the previous
+    line plus a new word-timed line, followed by a 10 ms cue repeating the new line.
+    """
+    rng = random.Random(seed)
+    previous = ""
+    t = 0.0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\nKind: captions\nLanguage: en\n\n")
+        while t < hours * 3600:
+            words = [rng.choice(WORDS) for _ in range(rng.randint(5, 9))]
+            timed = words[0] + "".join(f"<{timestamp(t + 0.3 * i)}><c> {word}</c>"
+                                       for i, word in enumerate(words[1:], start=1))
+            f.write(f"{timestamp(t)} --> {timestamp(t + 2.5)} align:start position:0%\n{previous or ' '}\n{timed}\n\n")
+            line = " ".join(words)
+            f.write(f"{timestamp(t + 2.5)} --> {timestamp(t + 2.51)} align:start position:0%\n{line}\n \n\n")
+            previous = line
+            t += 2.51
+    return path
+
+
+def measure(fn, path):
+    start = time.perf_counter()
+    text = fn(path)
+    elapsed = time.perf_counter() - start
+    size_mb = Path(path).stat().st_size / 1e6
+    return {"seconds": elapsed, "mb_per_second": size_mb / elapsed, "tokens": estimate_tokens(text)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, nargs="*", default=[1, 5, 10], help="synthetic fixture lengths")
+    parser.add_argument("--file", nargs="*", default=[], help="additional real .vtt files")
+    parser.add_argument("--json", action="store_true", help="print a machine-readable report")
+    args = parser.parse_args()
+
+    if check_parser():
+        sys.exit(1)
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fixtures = [(f"synthetic {hours:g}h", write_rolling_fixture(Path(tmpdir) / f"{hours:g}h.vtt", hours))
+                    for hours in args.hours]
+        fixtures += [(path, path) for path in args.file]
+        for name, path in fixtures:
+            legacy = measure(legacy_vtt_to_text, path)
+            streaming = measure(TranscriptProcessor.vtt_to_text, path)
+            results.append({
+                "fixture": name,
+                "size_mb": Path(path).stat().st_size / 1e6,
+                "legacy": legacy,
+                "streaming": streaming,
+                "tokens_saved": legacy["tokens"] - streaming["tokens"],
+                "tokens_saved_pct": 100 * (legacy["tokens"] - streaming["tokens"]) / max(1, legacy["tokens"]),
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(f"{r['fixture']} ({r['size_mb']:.1f} MB)")
+        print(f"  legacy:    {r['legacy']['tokens']:>10,} tokens  {r['legacy']['mb_per_second']:6.1f} MB/s")
+        print(f"  streaming: {r['streaming']['tokens']:>10,} tokens  {r['streaming']['mb_per_second']:6.1f} MB/s")
+        print(f"  saved:     {r['tokens_saved']:>10,} tokens ({r['tokens_saved_pct']:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
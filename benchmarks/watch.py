@@ -0,0 +1,171 @@
+"""
+Benchmark of the channel/playlist watcher on a large watch list, offline.
+
+Sources are fake playlists (benchmarks.fake_ytdlp) whose Atom feeds are served by a
+local feed server that honours If-None-Match. Measures, for --sources sources:
+- initial: first poll, one flat extraction per source
+- feeds:   second poll, every feed fetched once (200) to learn its ETag
+- steady:  third poll after --changed of the sources got a new upload; unchanged
+           feeds answer 304
+- rescan:  the same poll when every source is listed again with flat extraction
+           (what re-running a playlist by hand costs)
+
+Usage: python -m benchmarks.watch [--sources 2000] [--videos 50] [--changed 0.05]
+                                  [--ytdlp-latency 0.05] [--feed-latency 0.02]
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks import fake_ytdlp
+from benchmarks.fake_ytdlp import FIXTURE_ENV, LATENCY_ENV
+
+FEED_ENTRY = ("<entry><yt:videoId>{id}</yt:videoId><title>Video {id}</title>"
+              "<published>2024-01-01T00:00:00+00:00</published></entry>")
+FEED = ('<?xml version="1.0" encoding="UTF-8"?><feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" '
+        'xmlns="http://www.w3.org/2005/Atom">{entries}</feed>')
+
+
+class FeedServer:
+    """
+    Serves /feeds/videos.xml?playlist_id=<id> with the latest 15 videos of each playlist and an ETag.
+    """
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.videos = {}
+        self.counters = {"requests": 0, "not_modified": 0}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.server.request_queue_size = 128
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/feeds/videos.xml"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def _handler(self):
+        feeds = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(feeds.latency)
+                playlist_id = parse_qs(urlsplit(self.path).query).get("playlist_id", [""])[0]
+                videos = feeds.videos.get(playlist_id)
+                with feeds.lock:
+                    feeds.counters["requests"] += 1
+                if videos is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = FEED.format(entries="".join(FEED_ENTRY.format(id=v) for v in videos[:15])).encode()
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    with feeds.lock:
+                        feeds.counters["not_modified"] += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/atom+xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def write_playlists(root, sources, videos):
+    """
+    Write the flat info dicts of the fake playlists and return {playlist id: video ids, newest first}.
+    """
+    playlists = {}
+    for i in range(sources):
+        playlist_id = f"PLwatch{i:05d}"
+        ids = [f"w{i:05d}v{j:03d}" for j in range(videos)]
+        info = {"id": playlist_id, "_type": "playlist", "title": f"Playlist {i}",
+                "entries": [{"id": video_id, "url": fake_ytdlp.video_url(video_id)} for video_id in ids]}
+        (Path(root) / f"{playlist_id}.info.json").write_text(json.dumps(info), encoding="utf-8")
+        playlists[playlist_id] = ids
+    return playlists
+
+
+def timed_poll(watcher, feeds):
+    before = dict(feeds.counters)
+    start = time.perf_counter()
+    counts = watcher.poll()
+    seconds = time.perf_counter() - start
+    requests = feeds.counters["requests"] - before["requests"]
+    not_modified = feeds.counters["not_modified"] - before["not_modified"]
+    return seconds, counts, requests, not_modified
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", type=int, default=2000)
+    parser.add_argument("--videos", type=int, default=50, help="videos per playlist")
+    parser.add_argument("--changed", type=float, default=0.05, help="fraction of sources with a new upload")
+    parser.add_argument("--poll-workers", type=int, default=16)
+    parser.add_argument("--ytdlp-latency", type=float, default=0.05, help="fake yt-dlp seconds per extraction")
+    parser.add_argument("--feed-latency", type=float, default=0.02, help="feed server seconds per request")
+    args = parser.parse_args()
+
+    fake_ytdlp.install()
+    from rich.console import Console
+    from summary import watcher as watcher_module
+    from summary.watcher import ChannelWatcher, WatchState
+    from video.feeds import FeedReader
+
+    watcher_module.console = Console(quiet=True)
+    feeds = FeedServer(latency=args.feed_latency).start()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ[FIXTURE_ENV] = tmpdir
+        os.environ[LATENCY_ENV] = str(args.ytdlp_latency)
+        feeds.videos = write_playlists(tmpdir, args.sources, args.videos)
+        state = WatchState(Path(tmpdir) / "watch.sqlite3")
+        state.add_sources([f"https://www.youtube.com/playlist?list={playlist_id}" for playlist_id in feeds.videos])
+        watcher = ChannelWatcher(state, batch=None, poll_workers=args.poll_workers,
+                                 feeds=FeedReader(feeds.url, pool_size=args.poll_workers))
+
+        results = [("initial", *timed_poll(watcher, feeds)), ("feeds", *timed_poll(watcher, feeds))]
+        changed = list(feeds.videos)[:int(args.sources * args.changed)]
+        for playlist_id in changed:
+            feeds.videos[playlist_id].insert(0, f"{playlist_id}new")
+        results.append(("steady", *timed_poll(watcher, feeds)))
+        watcher.full_scan_interval = 0
+        results.append(("rescan", *timed_poll(watcher, feeds)))
+        pending = len(state.pending())
+    feeds.stop()
+
+    for name, seconds, counts, requests, not_modified in results:
+        print(f"{name:<8} {seconds:7.2f}s  {args.sources / seconds:8.0f} sources/s  "
+              f"{counts['scanned']:5d} flat extractions  {requests:5d} feed requests ({not_modified} 304)  "
+              f"{counts['new']:4d} new videos")
+    print(f"{pending} videos queued for summarization ({len(changed)} expected)")
+
+
+if __name__ == "__main__":
+    main()
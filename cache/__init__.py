@@ -0,0 +1,3 @@
+from .summaries import SummaryCache
+from .transcripts import TranscriptCache
+from .workspaces import Workspace, WorkspaceStore
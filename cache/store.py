@@ -0,0 +1,81 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def default_cache_dir():
+    """
+    Root directory of the on-disk caches, overridable with YT_TLDR_CACHE_DIR.
+    """
+    root = os.getenv("YT_TLDR_CACHE_DIR") or os.path.join(os.getenv("XDG_CACHE_HOME", "~/.cache"), "yt-tldr")
+    return Path(root).expanduser()
+
+
+def default_state_dir():
+    """
+    Directory of state that must survive clearing the caches (the watch list), overridable with YT_TLDR_STATE_DIR.
+    """
+    root = os.getenv("YT_TLDR_STATE_DIR") or os.path.join(os.getenv("XDG_STATE_HOME", "~/.local/state"), "yt-tldr")
+    return Path(root).expanduser()
+
+
+class SQLiteStore:
+    """
+    Base class for the caches and the watch state: a SQLite index in WAL mode so that
+    several threads and processes can share the same directory.
+    """
+
+    SCHEMA = ""
+    # Writes between two evictions while the size limit is not reached (for expiry)
+    EVICT_EVERY = 100
+    # An eviction shrinks the store to this fraction of its limit, so a full store
+    # is not scanned again on the very next write
+    LOW_WATER = 0.9
+
+    def __init__(self, root, db_name):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.root / db_name
+        with self.connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(self.SCHEMA)
+            db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextmanager
+    def connect(self):
+        # A short-lived connection per operation keeps the store usable from any thread
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def increment(self, db, name, amount=1):
+        db.execute("INSERT INTO stats (name, value) VALUES (?, ?) "
+                   "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    def needs_eviction(self, db, size, max_bytes):
+        """
+        Account for a write of size bytes. Returns True when the caller should run its
+        eviction, which scans the whole index: when the bytes kept by the last eviction
+        plus those written since exceed max_bytes, or every EVICT_EVERY writes.
+        """
+        self.increment(db, "pending_writes")
+        self.increment(db, "pending_bytes", size)
+        values = dict(db.execute("SELECT name, value FROM stats "
+                                 "WHERE name IN ('kept_bytes', 'pending_bytes', 'pending_writes')"))
+        return (values.get("kept_bytes", 0) + values["pending_bytes"] > max_bytes
+                or values["pending_writes"] >= self.EVICT_EVERY)
+
+    def evicted(self, db, kept_bytes):
+        """
+        Record the bytes left after an eviction and restart the write accounting.
+        """
+        db.executemany("INSERT OR REPLACE INTO stats (name, value) VALUES (?, ?)",
+                       [("kept_bytes", kept_bytes), ("pending_bytes", 0), ("pending_writes", 0)])
+
+    def counters(self):
+        with self.connect() as db:
+            return dict(db.execute("SELECT name, value FROM stats"))
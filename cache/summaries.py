@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from cache.store import SQLiteStore, default_cache_dir
+
+
+class SummaryCache(SQLiteStore):
+    """
+    Persistent LLM response cache shared by threads and processes.
+
+    Entries are keyed by a hash of the rendered prompt plus the provider, model and
+    request parameters, expire after ttl seconds and are evicted least recently used
+    first once the stored text exceeds max_bytes (checked as in TranscriptCache, not on
+    every write). While one worker computes a missing entry it holds a lease row in
+    the database, so other workers (in this or another process) wait for its answer
+    instead of issuing a duplicate LLM call. The lease expires lease_timeout seconds
+    after it was last renewed; it is renewed while the computation runs, so only a
+    worker that died loses it.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS summaries (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS summaries_accessed ON summaries (accessed_at);
+    CREATE TABLE IF NOT EXISTS leases (
+        key TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, root=None, ttl=30 * 24 * 3600, max_bytes=64 * 1024 * 1024, lease_timeout=60,
+                 poll_interval=0.5):
+        root = root or default_cache_dir() / "summaries"
+        super().__init__(root, "index.sqlite3")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    @staticmethod
+    def make_key(prompt, provider, params):
+        """
+        Hash the rendered prompt together with the provider and its request parameters.
+        """
+        material = json.dumps({"prompt": prompt, "provider": provider, "params": params}, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key, since=None):
+        """
+        Return the stored value, or None if it is missing, expired or (with since) written before since.
+        """
+        oldest = time.time() - self.ttl if since is None else max(since, time.time() - self.ttl)
+        with self.connect() as db:
+            row = db.execute("SELECT value FROM summaries WHERE key = ? AND created_at >= ?", (key, oldest)).fetchone()
+            if row is None:
+                self.increment(db, "misses")
+                return None
+            db.execute("UPDATE summaries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.increment(db, "hits")
+        return row[0]
+
+    def put(self, key, value):
+        now, size = time.time(), len(value.encode("utf-8"))
+        with self.connect() as db:
+            db.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?)", (key, value, size, now, now))
+            evict = self.needs_eviction(db, size, self.max_bytes)
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """
+        Drop expired entries, then the least recently used ones until the cache fits in
+        LOW_WATER × max_bytes.
+        """
+        with self.connect() as db:
+            db.execute("DELETE FROM summaries WHERE created_at < ?", (time.time() - self.ttl,))
+            total = 0
+            for key, size in db.execute("SELECT key, size FROM summaries ORDER BY accessed_at DESC").fetchall():
+                total += size
+                if total > self.LOW_WATER * self.max_bytes:
+                    db.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                    self.increment(db, "evictions")
+                    total -= size
+            self.evicted(db, total)
+
+    def _acquire_lease(self, key):
+        now = time.time()
+        with self.connect() as db:
+            cursor = db.execute(
+                "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.expires_at < ?",
+                (key, self.owner, now + self.lease_timeout, now))
+            return cursor.rowcount == 1
+
+    def _renew_lease(self, key):
+        with self.connect() as db:
+            db.execute("UPDATE leases SET expires_at = ? WHERE key = ? AND owner = ?",
+                       (time.time() + self.lease_timeout, key, self.owner))
+
+    def _keep_lease(self, key, stop):
+        # Renews the lease until stop is set, so a long computation never loses it
+        while not stop.wait(self.lease_timeout / 3):
+            self._renew_lease(key)
+
+    def _lease_held(self, key):
+        with self.connect() as db:
+            row = db.execute("SELECT 1 FROM leases WHERE key = ? AND expires_at >= ?", (key, time.time())).fetchone()
+        return row is not None
+
+    def _release_lease(self, key):
+        with self.connect() as db:
+            db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def _key_lock(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get_or_compute(self, key, compute, bypass=False):
+        """
+        Return the cached value for key, or call compute() exactly once across all
+        workers sharing this cache and store its (non-empty) result.
+        With bypass=True the cached value is ignored and refreshed: only a value written
+        by another worker after this call started is returned instead of computing it.
+        """
+        # With bypass, an entry older than this call is the one being refreshed
+        since = time.time() if bypass else None
+        if not bypass:
+            value = self.get(key)
+            if value is not None:
+                return value
+
+        # Threads of this process queue up on a lock, other processes on the lease row
+        with self._key_lock(key):
+            value = self.get(key, since)
+            if value is not None:
+                return value
+
+            while not self._acquire_lease(key):
+                logging.debug("Waiting for another worker to compute summary %s", key[:12])
+                while self._lease_held(key):
+                    time.sleep(self.poll_interval)
+                value = self.get(key, since)
+                if value is not None:
+                    return value
+
+            stop = threading.Event()
+            threading.Thread(target=self._keep_lease, args=(key, stop), daemon=True).start()
+            try:
+                value = compute()
+                if value:
+                    self.put(key, value)
+                return value
+            finally:
+                stop.set()
+                self._release_lease(key)
+                with self._locks_guard:
+                    self._locks.pop(key, None)
+
+    def stats(self):
+        counters = self.counters()
+        with self.connect() as db:
+            entries, stored = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "bytes": stored,
+        }
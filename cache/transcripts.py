@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+import zlib
+
+from cache.store import SQLiteStore, default_cache_dir
+
+
+class TranscriptCache(SQLiteStore):
+    """
+    Persistent content-addressed transcript store.
+
+    Transcripts are indexed by (video id, source), where the source tells how the
+    transcript was produced, e.g. "subs:manual:en", "subs:auto:en", "whisper:turbo" or
+    "faster-whisper-int8:small".
+    The text itself lives in zlib-compressed blobs named after their SHA-256, so
+    identical transcripts are stored once. Entries are evicted least recently used
+    first when the blobs exceed max_bytes or an entry was not read for max_age seconds.
+    The eviction scans the index and the blobs, so puts only run it when the size
+    limit may have been crossed or every EVICT_EVERY writes (see SQLiteStore).
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS transcripts (
+        video_id TEXT NOT NULL,
+        source TEXT NOT NULL,
+        digest TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL,
+        PRIMARY KEY (video_id, source)
+    );
+    CREATE INDEX IF NOT EXISTS transcripts_accessed ON transcripts (accessed_at);
+    """
+
+    def __init__(self, root=None, max_bytes=512 * 1024 * 1024, max_age=90 * 24 * 3600):
+        root = root or default_cache_dir() / "transcripts"
+        super().__init__(root, "index.sqlite3")
+        self.blob_dir = self.root / "blobs"
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def _blob_path(self, digest):
+        return self.blob_dir / digest[:2] / f"{digest}.z"
+
+    def get(self, video_id, source):
+        """
+        Return the cached transcript for (video_id, source), or None on a miss.
+        """
+        if not video_id:
+            return None
+        with self.connect() as db:
+            row = db.execute("SELECT digest FROM transcripts WHERE video_id = ? AND source = ?",
+                             (video_id, source)).fetchone()
+            if row is None:
+                self.increment(db, "misses")
+                return None
+            try:
+                text = zlib.decompress(self._blob_path(row[0]).read_bytes()).decode("utf-8")
+            except (OSError, zlib.error) as e:
+                logging.warning("Dropping unreadable cached transcript %s/%s: %s", video_id, source, e)
+                db.execute("DELETE FROM transcripts WHERE video_id = ? AND source = ?", (video_id, source))
+                self.increment(db, "misses")
+                return None
+            db.execute("UPDATE transcripts SET accessed_at = ? WHERE video_id = ? AND source = ?",
+                       (time.time(), video_id, source))
+            self.increment(db, "hits")
+        return text
+
+    def put(self, video_id, source, transcript):
+        """
+        Store a transcript and evict old entries if the cache may have grown past its limits.
+        """
+        if not video_id or not transcript:
+            return
+        data = transcript.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so concurrent readers never see a partial blob
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data, 6))
+            os.replace(tmp_path, path)
+
+        now, size = time.time(), path.stat().st_size
+        with self.connect() as db:
+            db.execute("INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?)",
+                       (video_id, source, digest, size, now, now))
+            evict = self.needs_eviction(db, size, self.max_bytes)
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """
+        Drop entries not accessed within max_age, then the least recently used ones
+        until the distinct blobs fit in LOW_WATER × max_bytes. Unreferenced blobs are deleted.
+        """
+        with self.connect() as db:
+            db.execute("DELETE FROM transcripts WHERE accessed_at < ?", (time.time() - self.max_age,))
+            rows = db.execute("SELECT video_id, source, digest, size FROM transcripts "
+                              "ORDER BY accessed_at DESC").fetchall()
+            kept, total = set(), 0
+            for video_id, source, digest, size in rows:
+                if digest not in kept:
+                    if total + size > self.LOW_WATER * self.max_bytes:
+                        db.execute("DELETE FROM transcripts WHERE video_id = ? AND source = ?", (video_id, source))
+                        self.increment(db, "evictions")
+                        continue
+                    total += size
+                    kept.add(digest)
+            self.evicted(db, total)
+
+        if self.blob_dir.exists():
+            # Skip fresh blobs: another process may have written one and not indexed it yet
+            cutoff = time.time() - 60
+            for path in self.blob_dir.glob("*/*.z"):
+                if path.stem not in kept and path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+
+    def stats(self):
+        """
+        Return hit/miss/eviction counters plus the number of entries and stored bytes.
+        """
+        counters = self.counters()
+        with self.connect() as db:
+            entries, = db.execute("SELECT COUNT(*) FROM transcripts").fetchone()
+            stored, = db.execute("SELECT COALESCE(SUM(size), 0) FROM "
+                                 "(SELECT DISTINCT digest, size FROM transcripts)").fetchone()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "bytes": stored,
+        }
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from cache.store import default_cache_dir
+
+MANIFEST = "manifest.json"
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Workspace:
+    """
+    Durable working directory of one video. manifest.json records every completed
+    stage ("info", "audio", "transcript", "summary") with the SHA-256, size and mtime
+    of the files it produced and any extra data, so a later run can skip the stage. A
+    stage whose files are missing or no longer match their checksum counts as not
+    completed; a file is only hashed again when its size or mtime changed.
+    """
+
+    def __init__(self, path, video_id):
+        self.path = Path(path)
+        self.video_id = video_id
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.manifest = self._load()
+
+    def _load(self):
+        try:
+            return json.loads((self.path / MANIFEST).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {"video_id": self.video_id, "created": time.time(), "stages": {}}
+        except (OSError, ValueError) as e:
+            logging.warning("Ignoring unreadable workspace manifest of %s: %s", self.video_id, e)
+            return {"video_id": self.video_id, "created": time.time(), "stages": {}}
+
+    def _save(self):
+        self.manifest["updated"] = time.time()
+        # Write then rename so an interrupted run never leaves a truncated manifest
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.path / MANIFEST)
+
+    def file(self, name):
+        return self.path / name
+
+    def _unchanged(self, record, name):
+        # Size and mtime vouch for the checksum; a file touched since is hashed again
+        path = self.file(name)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return False
+        stats = record.get("stats", {}).get(name)
+        if stats == [stat.st_size, stat.st_mtime_ns]:
+            return True
+        if stats is not None and stats[0] != stat.st_size:
+            return False
+        if file_checksum(path) != record["files"][name]:
+            return False
+        record.setdefault("stats", {})[name] = [stat.st_size, stat.st_mtime_ns]
+        self._save()
+        return True
+
+    def completed(self, stage, max_age=None):
+        """
+        Return the record of a completed stage ({"files", "completed_at", "data"}), or None
+        if the stage has not completed, is older than max_age seconds or its files changed.
+        """
+        record = self.manifest["stages"].get(stage)
+        if record is None:
+            return None
+        if max_age is not None and time.time() - record["completed_at"] > max_age:
+            return None
+        for name in record["files"]:
+            if not self._unchanged(record, name):
+                logging.warning("Workspace %s: %s of stage %s changed; running the stage again.",
+                                self.video_id, name, stage)
+                del self.manifest["stages"][stage]
+                self._save()
+                return None
+        return record
+
+    def complete(self, stage, files=(), **data):
+        """
+        Record a stage as completed with the checksums of its files (paths inside the workspace).
+        """
+        names = [Path(path).name for path in files if path]
+        stats = {name: self.file(name).stat() for name in names}
+        self.manifest["stages"][stage] = {"files": {name: file_checksum(self.file(name)) for name in names},
+                                          "stats": {name: [stat.st_size, stat.st_mtime_ns]
+                                                    for name, stat in stats.items()},
+                                          "completed_at": time.time(), "data": data}
+        self._save()
+
+    def write_text(self, name, text):
+        path = self.file(name)
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    def read_text(self, name):
+        return self.file(name).read_text(encoding="utf-8")
+
+
+class WorkspaceStore:
+    """
+    Directory of per-video workspaces (~/.cache/yt-tldr/workspaces/<video id>).
+    gc() deletes the workspaces not updated within max_age seconds, then the least
+    recently updated ones until the rest fit in max_bytes.
+    """
+
+    def __init__(self, root=None, max_bytes=5 * 1024 ** 3, max_age=7 * 24 * 3600):
+        self.root = Path(root) if root else default_cache_dir() / "workspaces"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def get(self, video_id):
+        return Workspace(self.root / video_id, video_id)
+
+    @staticmethod
+    def _usage(path):
+        files = [f for f in path.rglob("*") if f.is_file()]
+        size = sum(f.stat().st_size for f in files)
+        updated = max((f.stat().st_mtime for f in files), default=path.stat().st_mtime)
+        return size, updated
+
+    def gc(self):
+        """
+        Delete old workspaces and return {"removed", "freed_bytes", "kept", "kept_bytes"}.
+        """
+        workspaces = sorted(((path, *self._usage(path)) for path in self.root.iterdir() if path.is_dir()),
+                            key=lambda item: item[2], reverse=True)
+        cutoff = time.time() - self.max_age
+        stats = {"removed": 0, "freed_bytes": 0, "kept": 0, "kept_bytes": 0}
+        for path, size, updated in workspaces:
+            if updated < cutoff or stats["kept_bytes"] + size > self.max_bytes:
+                shutil.rmtree(path, ignore_errors=True)
+                stats["removed"] += 1
+                stats["freed_bytes"] += size
+            else:
+                stats["kept"] += 1
+                stats["kept_bytes"] += size
+        return stats
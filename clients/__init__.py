@@ -1,4 +1,7 @@
 from .anthropic import AnthropicClient
+from .cached import CachedClient
 from .gemini import GeminiClient
 from .ollama_client import OllamaClient
 from .openai import OpenAIClient
+from .router import RouterClient, get_router
+from .streaming import StreamInterrupted
@@ -1,15 +1,23 @@
+import logging
 import os
 
 import requests
 from dotenv import load_dotenv
 
+from clients.streaming import StreamInterrupted, aiter_stream, iter_sse_json
+from clients.tracing import traced_chat, traced_stream
+from clients.transport import get_transport
+from models import LLMOption
+from summary.tokens import estimate_tokens
+
 load_dotenv()
 
 
 class AnthropicClient:
-    def __init__(self, host="https://api.anthropic.com/v1/messages", model="claude-3-5-sonnet-20241022"):
+    def __init__(self, host=None, model="claude-3-5-sonnet-20241022"):
         self.api_key = os.getenv("ANTHROPIC_API_KEY", "")
-        self.host = host
+        self.host = host or os.getenv("ANTHROPIC_API_URL") or "https://api.anthropic.com/v1/messages"
+        self.transport = get_transport(LLMOption.ANTHROPIC)
         self.model = model
         self.headers = {
             "Content-Type": "application/json",
@@ -17,6 +25,7 @@ class AnthropicClient:
             "anthropic-version": "2023-06-01",
         }
 
+    @traced_chat
     def chat(self, user_prompt, max_tokens=1024):
         messages = [
             {"role": "user", "content": user_prompt},
@@ -27,7 +36,8 @@ class AnthropicClient:
             "messages": messages,
         }
         try:
-            response = requests.post(self.host, headers=self.headers, json=payload)
+            response = self.transport.post(self.host, tokens=estimate_tokens(user_prompt), headers=self.headers,
+                                           json=payload)
             response.raise_for_status()
             answer = response.json()
             return answer["content"][0]["text"].strip()
@@ -37,3 +47,40 @@ class AnthropicClient:
         except KeyError as e:
             print(f"Error parsing Anthropic API response: {e}")
             return None
+
+    @traced_stream
+    def stream(self, user_prompt, max_tokens=1024):
+        """
+        Yield the completion text as it arrives over server-sent events. Raises
+        StreamInterrupted if the stream ends before message_stop.
+        """
+        payload = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": user_prompt}],
+            "stream": True,
+        }
+        done = False
+        try:
+            with self.transport.post(self.host, tokens=estimate_tokens(user_prompt), headers=self.headers,
+                                     json=payload, stream=True) as response:
+                response.raise_for_status()
+                for event in iter_sse_json(response):
+                    if event.get("type") == "content_block_delta":
+                        token = event["delta"].get("text")
+                        if token:
+                            yield token
+                    elif event.get("type") == "message_stop":
+                        done = True
+                    elif event.get("type") == "error":
+                        logging.error(f"Error from Anthropic API stream: {event['error'].get('message')}")
+                        break
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error communicating with Anthropic API: {e}")
+        except (KeyError, ValueError) as e:
+            logging.error(f"Error parsing Anthropic API stream: {e}")
+        if not done:
+            raise StreamInterrupted("the Anthropic stream ended before message_stop")
+
+    def astream(self, user_prompt, max_tokens=1024):
+        return aiter_stream(self.stream(user_prompt, max_tokens=max_tokens))
@@ -0,0 +1,52 @@
+from clients.streaming import aiter_stream
+
+
+class CachedClient:
+    """
+    Wraps any LLM client with the same chat() interface and serves repeated
+    prompts from a SummaryCache instead of calling the provider again.
+    """
+
+    def __init__(self, client, cache, provider, bypass=False):
+        self.client = client
+        self.cache = cache
+        self.provider = provider
+        self.bypass = bypass
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def cache_key(self, prompt, **kwargs):
+        params = {
+            "host": getattr(self.client, "host", None),
+            "model": getattr(self.client, "model", None),
+            **kwargs,
+        }
+        return self.cache.make_key(prompt, self.provider, params)
+
+    def chat(self, prompt, **kwargs):
+        key = self.cache_key(prompt, **kwargs)
+        return self.cache.get_or_compute(key, lambda: self.client.chat(prompt, **kwargs), bypass=self.bypass)
+
+    def stream(self, prompt, **kwargs):
+        """
+        Yield the cached answer in one piece on a hit, otherwise stream from the client
+        and store the answer once the stream finished. An interrupted stream raises
+        StreamInterrupted before anything is stored.
+        """
+        key = self.cache_key(prompt, **kwargs)
+        cached = None if self.bypass else self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        tokens = []
+        for token in self.client.stream(prompt, **kwargs):
+            tokens.append(token)
+            yield token
+        answer = "".join(tokens).strip()
+        if answer:
+            self.cache.put(key, answer)
+
+    def astream(self, prompt, **kwargs):
+        return aiter_stream(self.stream(prompt, **kwargs))
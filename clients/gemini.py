@@ -1,19 +1,29 @@
+import logging
 import os
 
 import requests
 from dotenv import load_dotenv
 
+from clients.streaming import StreamInterrupted, aiter_stream, iter_sse_json
+from clients.tracing import traced_chat, traced_stream
+from clients.transport import get_transport
+from models import LLMOption
+from summary.tokens import estimate_tokens
+
 load_dotenv()
 
 
 class GeminiClient:
-    def __init__(self, host="https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"):
+    def __init__(self, host=None, model="gemini-1.5-flash"):
         self.api_key = os.getenv("GEMINI_API_KEY", "")
-        self.host = host
+        self.host = host or os.getenv("GEMINI_API_URL") or "https://generativelanguage.googleapis.com/v1beta/models"
+        self.transport = get_transport(LLMOption.GEMINI)
+        self.model = model
         self.headers = {
             "Content-Type": "application/json",
         }
 
+    @traced_chat
     def chat(self, user_prompt):
         payload = {
             "contents": [
@@ -25,8 +35,9 @@ class GeminiClient:
             ]
         }
         try:
-            url = f"{self.host}?key={self.api_key}"
-            response = requests.post(url, headers=self.headers, json=payload)
+            url = f"{self.host}/{self.model}:generateContent?key={self.api_key}"
+            response = self.transport.post(url, tokens=estimate_tokens(user_prompt), headers=self.headers,
+                                           json=payload)
             response.raise_for_status()
             answer = response.json()
             return answer["candidates"][0]["content"]["parts"][0]["text"].strip()
@@ -36,3 +47,40 @@ class GeminiClient:
         except KeyError as e:
             print(f"Error parsing Gemini API response: {e}")
             return None
+
+    @traced_stream
+    def stream(self, user_prompt):
+        """
+        Yield the completion text as it arrives over server-sent events. Raises
+        StreamInterrupted if no candidate reports a finishReason.
+        """
+        payload = {
+            "contents": [
+                {
+                    "parts": [
+                        {"text": user_prompt}
+                    ]
+                }
+            ]
+        }
+        done = False
+        try:
+            url = f"{self.host}/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}"
+            with self.transport.post(url, tokens=estimate_tokens(user_prompt), headers=self.headers,
+                                     json=payload, stream=True) as response:
+                response.raise_for_status()
+                for event in iter_sse_json(response):
+                    for candidate in event.get("candidates", []):
+                        for part in candidate.get("content", {}).get("parts", []):
+                            if part.get("text"):
+                                yield part["text"]
+                        done = done or bool(candidate.get("finishReason"))
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error communicating with Gemini API: {e}")
+        except ValueError as e:
+            logging.error(f"Error parsing Gemini API stream: {e}")
+        if not done:
+            raise StreamInterrupted("the Gemini stream ended without a finishReason")
+
+    def astream(self, user_prompt):
+        return aiter_stream(self.stream(user_prompt))
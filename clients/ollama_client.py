@@ -1,18 +1,251 @@
+import asyncio
 import logging
+import os
+import queue
+import threading
 
-from ollama import Client
+from clients.streaming import StreamInterrupted, aiter_stream
+from clients.tracing import traced_chat, traced_stream
+from clients.transport import get_transport
+from models import LLMOption, ProviderLimits, get_provider_limits
+from summary.tokens import estimate_tokens
+from telemetry import current_span
+
+# Room left in the context for the answer and the prompt template
+ANSWER_TOKENS = 1024
+CTX_STEP = 2048
+
+
+class GenerationPool:
+    """
+    Process-wide state of one Ollama server: an ollama AsyncClient on its own event
+    loop thread, shared by every caller thread (batch workers, map-reduce chunks,
+    service jobs) with at most `parallel` generations in flight, the num_ctx in use
+    and the token rates reported by the server.
+    """
+
+    def __init__(self, host, timeout, parallel, num_ctx):
+        # Imported here so the ollama SDK (and httpx) only load when Ollama is selected
+        from ollama import AsyncClient
+
+        self.client = AsyncClient(host=host, timeout=timeout)
+        self.parallel = parallel
+        self.slots = asyncio.Semaphore(parallel)
+        self.num_ctx = num_ctx
+        self.lock = threading.Lock()
+        self.preloaded = set()
+        self.counters = {"generations": 0, "prompt_tokens": 0, "prompt_seconds": 0.0, "eval_tokens": 0,
+                         "eval_seconds": 0.0, "load_seconds": 0.0}
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="ollama", daemon=True).start()
+
+    def submit(self, coroutine):
+        """
+        Run a coroutine on the pool's loop once a generation slot is free; returns a concurrent Future.
+        """
+        async def limited():
+            async with self.slots:
+                return await coroutine
+        return asyncio.run_coroutine_threadsafe(limited(), self.loop)
+
+    def record(self, response):
+        """
+        Add the token counts and durations (nanoseconds) of a final response to the counters.
+        """
+        with self.lock:
+            self.counters["generations"] += 1
+            self.counters["prompt_tokens"] += response.prompt_eval_count or 0
+            self.counters["prompt_seconds"] += (response.prompt_eval_duration or 0) / 1e9
+            self.counters["eval_tokens"] += response.eval_count or 0
+            self.counters["eval_seconds"] += (response.eval_duration or 0) / 1e9
+            self.counters["load_seconds"] += (response.load_duration or 0) / 1e9
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats["prompt_rate"] = stats["prompt_tokens"] / stats["prompt_seconds"] if stats["prompt_seconds"] else None
+        stats["eval_rate"] = stats["eval_tokens"] / stats["eval_seconds"] if stats["eval_seconds"] else None
+        stats["parallel"] = self.parallel
+        stats["num_ctx"] = self.num_ctx
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host, timeout, parallel, num_ctx):
+    """
+    Return the generation pool of an Ollama host, creating it on first use.
+    """
+    with _pools_lock:
+        if host not in _pools:
+            _pools[host] = GenerationPool(host, timeout, parallel, num_ctx)
+        return _pools[host]
+
+
+def ollama_stats():
+    """
+    Return the generation counters and token rates of every Ollama host used so far.
+    """
+    with _pools_lock:
+        return {host: pool.stats() for host, pool in _pools.items()}
+
+
+def env_keep_alive():
+    value = os.getenv("YT_TLDR_OLLAMA_KEEP_ALIVE") or "30m"
+    # Ollama takes seconds as a number ("-1" keeps the model forever) or a duration such as "30m"
+    try:
+        return float(value)
+    except ValueError:
+        return value
 
 
 class OllamaClient:
-    def __init__(self, host="http://localhost:11434", model="gemma2:latest"):
-        self.host = host
+    """
+    Client of a local or self-hosted Ollama server, tuned for throughput:
+    - keep_alive (YT_TLDR_OLLAMA_KEEP_ALIVE, default 30m) keeps the model loaded
+      between requests and runs, and preload() loads it once per process, before the
+      first prompt.
+    - num_ctx is sized from the estimated prompt tokens instead of the server default,
+      which silently truncates long prompts. It grows in steps of CTX_STEP up to
+      max_ctx (YT_TLDR_OLLAMA_NUM_CTX, default the provider's context_tokens) and never
+      shrinks, since every new num_ctx makes the server reload the model. The chunk
+      budgets scale with max_ctx.
+    - Up to `parallel` generations (YT_TLDR_OLLAMA_PARALLEL, else the server's
+      OLLAMA_NUM_PARALLEL, else 4 like Ollama's own default) are in flight at once,
+      and chunked transcripts send that many chunks at a time; see GenerationPool.
+    The prompt and generation token rates reported by the server are logged, added
+    to the span and summed by ollama_stats().
+    """
+
+    def __init__(self, host=None, model="gemma2:latest", timeout=300, keep_alive=None, max_ctx=None, parallel=None):
+        self.host = host or os.getenv("OLLAMA_HOST") or "http://localhost:11434"
         self.model = model
-        self.client = Client(host=host)
+        self.keep_alive = keep_alive if keep_alive is not None else env_keep_alive()
+        defaults = get_provider_limits(LLMOption.OLLAMA)
+        self.max_ctx = max_ctx or int(os.getenv("YT_TLDR_OLLAMA_NUM_CTX") or defaults.context_tokens)
+        parallel = parallel or int(os.getenv("YT_TLDR_OLLAMA_PARALLEL") or os.getenv("OLLAMA_NUM_PARALLEL") or 4)
+        scale = self.max_ctx / defaults.context_tokens
+        self.limits = ProviderLimits(context_tokens=self.max_ctx, chunk_tokens=int(defaults.chunk_tokens * scale),
+                                     overlap_tokens=defaults.overlap_tokens, max_concurrency=parallel,
+                                     compressed_tokens=int(defaults.compressed_tokens * scale))
+        # Sized up front for a full chunk, so the usual prompts never change it
+        self.pool = get_pool(self.host, timeout, parallel, self._round_ctx(self.limits.chunk_tokens + ANSWER_TOKENS))
+        self.transport = get_transport(LLMOption.OLLAMA)
+
+    def _round_ctx(self, tokens):
+        return min(self.max_ctx, -(-tokens // CTX_STEP) * CTX_STEP)
+
+    def context_size(self, prompt):
+        """
+        Return the num_ctx to send with a prompt, growing the pool's num_ctx if the prompt needs it.
+        """
+        needed = estimate_tokens(prompt) + ANSWER_TOKENS
+        with self.pool.lock:
+            if needed > self.pool.num_ctx:
+                self.pool.num_ctx = max(self.pool.num_ctx, self._round_ctx(needed))
+            if needed > self.pool.num_ctx:
+                logging.warning("Prompt of about %d tokens exceeds the Ollama context of %d tokens and will be "
+                                "truncated; raise YT_TLDR_OLLAMA_NUM_CTX if the model allows it.",
+                                needed - ANSWER_TOKENS, self.pool.num_ctx)
+            return self.pool.num_ctx
+
+    def _generate(self, prompt, stream=False):
+        return self.pool.client.generate(model=self.model, prompt=prompt, stream=stream, keep_alive=self.keep_alive,
+                                         options={"num_ctx": self.context_size(prompt)})
+
+    async def _stream_into(self, prompt, tokens):
+        # Puts the text of each chunk in tokens, then None; returns the final chunk with the counts
+        final = None
+        try:
+            async for chunk in await self._generate(prompt, stream=True):
+                if chunk.response:
+                    tokens.put(chunk.response)
+                if chunk.done:
+                    final = chunk
+        finally:
+            tokens.put(None)
+        return final
+
+    def _record(self, response):
+        if response is None:
+            return
+        self.pool.record(response)
+        prompt_seconds = (response.prompt_eval_duration or 0) / 1e9
+        eval_seconds = (response.eval_duration or 0) / 1e9
+        prompt_rate = (response.prompt_eval_count or 0) / prompt_seconds if prompt_seconds else 0.0
+        eval_rate = (response.eval_count or 0) / eval_seconds if eval_seconds else 0.0
+        current_span().set(prompt_eval_tokens=response.prompt_eval_count, eval_tokens=response.eval_count,
+                           prompt_tokens_per_second=prompt_rate, eval_tokens_per_second=eval_rate)
+        if eval_seconds:
+            logging.info("Ollama: %d prompt tokens at %.0f tokens/s, %d generated at %.1f tokens/s",
+                         response.prompt_eval_count or 0, prompt_rate, response.eval_count or 0, eval_rate)
+
+    def preload(self):
+        """
+        Load the model in the background (an empty prompt only loads it) with the
+        keep_alive and num_ctx of the coming requests, so the first one doesn't wait
+        for the load or trigger a reload. Only the first call for a model in this process
+        sends the request.
+        """
+        with self.pool.lock:
+            if self.model in self.pool.preloaded:
+                return
+            self.pool.preloaded.add(self.model)
 
+        def loaded(future):
+            if future.exception() is not None:
+                logging.warning("Could not preload Ollama model '%s': %s", self.model, future.exception())
+            else:
+                logging.info("Ollama model '%s' loaded in %.1fs", self.model,
+                             (future.result().load_duration or 0) / 1e9)
+
+        self.pool.submit(self._generate("")).add_done_callback(loaded)
+
+    @traced_chat
     def chat(self, prompt):
         try:
-            answer = self.client.generate(model=self.model, prompt=prompt)
+            answer = self.transport.call(lambda: self.pool.submit(self._generate(prompt)).result(),
+                                         tokens=estimate_tokens(prompt))
+            self._record(answer)
             return answer.response
         except Exception as e:
             logging.error(f"Error communicating with Ollama API: {e}")
             return None
+
+    @traced_stream
+    def stream(self, prompt):
+        """
+        Yield the generated text as Ollama produces it. A request failing before the
+        first token is retried by the transport. Raises StreamInterrupted if the stream
+        ends before the final (done) chunk.
+        """
+        def start():
+            # Waits for the first token so that errors before it reach transport.call
+            tokens = queue.Queue()
+            future = self.pool.submit(self._stream_into(prompt, tokens))
+            first = tokens.get()
+            if first is None:
+                future.result()
+            return future, tokens, first
+
+        future = final = None
+        try:
+            future, tokens, first = self.transport.call(start, tokens=estimate_tokens(prompt))
+            if first is not None:
+                yield first
+                yield from iter(tokens.get, None)
+            final = future.result()
+            self._record(final)
+        except Exception as e:
+            logging.error(f"Error communicating with Ollama API: {e}")
+        finally:
+            # Stops the generation when the caller closes the stream early
+            if future is not None:
+                future.cancel()
+        if final is None:
+            raise StreamInterrupted("the Ollama stream ended before its final chunk")
+
+    def astream(self, prompt):
+        return aiter_stream(self.stream(prompt))
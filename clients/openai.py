@@ -1,21 +1,30 @@
+import logging
 import os
 
 import requests
 from dotenv import load_dotenv
 
+from clients.streaming import DONE, StreamInterrupted, aiter_stream, iter_sse_json
+from clients.tracing import traced_chat, traced_stream
+from clients.transport import get_transport
+from models import LLMOption
+from summary.tokens import estimate_tokens
+
 load_dotenv()
 
 
 class OpenAIClient:
-    def __init__(self, host="https://api.openai.com/v1/chat/completions", model="gpt-4o-mini"):
+    def __init__(self, host=None, model="gpt-4o-mini"):
         self.api_key = os.getenv("OPENAI_API_KEY", "")
-        self.host = host
+        self.host = host or os.getenv("OPENAI_API_URL") or "https://api.openai.com/v1/chat/completions"
+        self.transport = get_transport(LLMOption.OPENAI)
         self.model = model
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}",
         }
 
+    @traced_chat
     def chat(self, user_prompt):
         messages = [
             {"role": "user", "content": user_prompt},
@@ -25,7 +34,8 @@ class OpenAIClient:
             "messages": messages,
         }
         try:
-            response = requests.post(self.host, headers=self.headers, json=payload)
+            response = self.transport.post(self.host, tokens=estimate_tokens(user_prompt), headers=self.headers,
+                                           json=payload)
             response.raise_for_status()
             return response.json()["choices"][0]["message"]["content"].strip()
         except requests.exceptions.RequestException as e:
@@ -34,3 +44,37 @@ class OpenAIClient:
         except KeyError as e:
             print(f"Error parsing OpenAI API response: {e}")
             return None
+
+    @traced_stream
+    def stream(self, user_prompt):
+        """
+        Yield the completion text as it arrives over server-sent events. Raises
+        StreamInterrupted if the stream ends before "[DONE]".
+        """
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": user_prompt}],
+            "stream": True,
+        }
+        done = False
+        try:
+            with self.transport.post(self.host, tokens=estimate_tokens(user_prompt), headers=self.headers,
+                                     json=payload, stream=True) as response:
+                response.raise_for_status()
+                for event in iter_sse_json(response):
+                    if event is DONE:
+                        done = True
+                        break
+                    choices = event.get("choices") or [{}]
+                    token = choices[0].get("delta", {}).get("content")
+                    if token:
+                        yield token
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error communicating with OpenAI API: {e}")
+        except ValueError as e:
+            logging.error(f"Error parsing OpenAI API stream: {e}")
+        if not done:
+            raise StreamInterrupted("the OpenAI stream ended before [DONE]")
+
+    def astream(self, user_prompt):
+        return aiter_stream(self.stream(user_prompt))
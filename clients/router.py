@@ -0,0 +1,279 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from clients.anthropic import AnthropicClient
+from clients.gemini import GeminiClient
+from clients.ollama_client import OllamaClient
+from clients.openai import OpenAIClient
+from clients.streaming import StreamInterrupted, aiter_stream
+from models import LLMOption, ProviderLimits, get_provider_limits
+
+CLIENT_CLASSES = {
+    LLMOption.OPENAI: OpenAIClient,
+    LLMOption.ANTHROPIC: AnthropicClient,
+    LLMOption.GEMINI: GeminiClient,
+    LLMOption.OLLAMA: OllamaClient,
+}
+API_KEY_VARIABLES = {
+    LLMOption.OPENAI: "OPENAI_API_KEY",
+    LLMOption.ANTHROPIC: "ANTHROPIC_API_KEY",
+    LLMOption.GEMINI: "GEMINI_API_KEY",
+}
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ProviderHealth:
+    """
+    Rolling latency and error statistics of one provider over its last `window` calls.
+    """
+
+    def __init__(self, window=100, max_error_rate=0.5, min_samples=5, cooldown=60.0):
+        self.calls = deque(maxlen=window)
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.requests = 0
+        self.last_error = None
+        self.lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self.lock:
+            self.calls.append((seconds, ok))
+            self.requests += 1
+            if not ok:
+                self.last_error = time.monotonic()
+
+    def latency(self, fraction):
+        with self.lock:
+            latencies = [seconds for seconds, ok in self.calls if ok]
+        return _percentile(latencies, fraction) if latencies else None
+
+    def expected_latency(self):
+        """
+        Median latency used for ranking: 0 for an untried provider (so it gets tried),
+        infinity for one that has only failed so far.
+        """
+        p50 = self.latency(0.5)
+        if p50 is not None:
+            return p50
+        with self.lock:
+            return float("inf") if self.calls else 0.0
+
+    def error_rate(self):
+        with self.lock:
+            return sum(1 for _, ok in self.calls if not ok) / len(self.calls) if self.calls else 0.0
+
+    def healthy(self):
+        """
+        A provider is unhealthy while its error rate exceeds max_error_rate; after
+        `cooldown` seconds without a new error it gets another chance.
+        """
+        with self.lock:
+            if len(self.calls) < self.min_samples:
+                return True
+            if self.last_error is not None and time.monotonic() - self.last_error > self.cooldown:
+                return True
+            return sum(1 for _, ok in self.calls if not ok) / len(self.calls) <= self.max_error_rate
+
+    def stats(self):
+        p50, p95 = self.latency(0.5), self.latency(0.95)
+        return {"requests": self.requests, "p50": p50, "p95": p95, "error_rate": self.error_rate(),
+                "healthy": self.healthy()}
+
+
+class RouterClient:
+    """
+    LLM client with the usual chat()/stream() interface that spreads requests over
+    several providers.
+
+    Each request goes to the healthy provider with the lowest rolling median latency
+    (untried providers first, in configured order). When a provider
+    fails, the next one is tried, so a run only fails when all of them do. With
+    hedge_after set (seconds, or "p95" for the chosen provider's own p95 latency), a
+    chat request still unanswered after that delay is also sent to the next provider
+    and the first answer wins. Streams fall back but are not hedged.
+    """
+
+    def __init__(self, providers, hedge_after=None, clients=None, window=100, max_error_rate=0.5):
+        self.providers = list(providers)
+        if not self.providers:
+            raise ValueError("the router needs at least one provider")
+        self.hedge_after = hedge_after
+        self.clients = clients or {}
+        self.clients_lock = threading.Lock()
+        self.health = {option: ProviderHealth(window, max_error_rate) for option in self.providers}
+        self.counters = {"hedged": 0, "hedge_wins": 0, "fallbacks": 0, "failed": 0}
+        self.counters_lock = threading.Lock()
+        # Hedged requests that lost the race finish in the background
+        self.pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="router")
+        self.limits = self._combined_limits()
+        self.host = None
+        self.model = ",".join(option.name for option in self.providers)
+
+    def _combined_limits(self):
+        """
+        Budgets every provider accepts, from each member client's limits (Ollama's follow
+        its num_ctx): a chunk must fit whichever one answers it, and all of them may land
+        on the same provider, so every budget is the smallest among the members. The
+        input cost is the cheapest member's, so the compression savings are a lower bound.
+        """
+        limits = [self._member_limits(option) for option in self.providers]
+        return ProviderLimits(context_tokens=min(limit.context_tokens for limit in limits),
+                              chunk_tokens=min(limit.chunk_tokens for limit in limits),
+                              overlap_tokens=min(limit.overlap_tokens for limit in limits),
+                              max_concurrency=min(limit.max_concurrency for limit in limits),
+                              compressed_tokens=min(limit.compressed_tokens for limit in limits),
+                              input_cost_per_mtok=min(limit.input_cost_per_mtok for limit in limits))
+
+    def _member_limits(self, option: LLMOption):
+        try:
+            client = self.client(option)
+        except Exception as e:
+            # The request will fail over to another provider; budget with the defaults meanwhile
+            logging.warning("Could not create the %s client: %s", option.name, e)
+            return get_provider_limits(option)
+        return getattr(client, "limits", None) or get_provider_limits(option)
+
+    def client(self, option: LLMOption):
+        with self.clients_lock:
+            if option not in self.clients:
+                self.clients[option] = CLIENT_CLASSES[option]()
+            return self.clients[option]
+
+    def ranked(self):
+        """
+        Return the providers in the order they should be tried: healthy ones by median
+        latency, then the unhealthy ones as a last resort.
+        """
+        order = {option: i for i, option in enumerate(self.providers)}
+        healthy = [option for option in self.providers if self.health[option].healthy()]
+        unhealthy = [option for option in self.providers if option not in healthy]
+        healthy.sort(key=lambda option: (self.health[option].expected_latency(), order[option]))
+        return healthy + unhealthy
+
+    def _count(self, name):
+        with self.counters_lock:
+            self.counters[name] += 1
+
+    def _call(self, option, prompt, **kwargs):
+        start = time.perf_counter()
+        try:
+            answer = self.client(option).chat(prompt, **kwargs)
+        except Exception as e:
+            logging.error("Error from %s: %s", option.value, e)
+            answer = None
+        self.health[option].record(time.perf_counter() - start, answer is not None)
+        return answer
+
+    def _hedge_delay(self, option):
+        if self.hedge_after == "p95":
+            return self.health[option].latency(0.95)
+        return self.hedge_after
+
+    def chat(self, prompt, **kwargs):
+        candidates = self.ranked()
+        pending = {}
+        hedged = False
+
+        def launch():
+            option = candidates.pop(0)
+            pending[self.pool.submit(self._call, option, prompt, **kwargs)] = option
+            return option
+
+        first = primary = launch()
+        while pending:
+            delay = self._hedge_delay(primary) if candidates and not hedged else None
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                self._count("hedged")
+                logging.info("%s is slow; hedging the request to %s.", primary.value, candidates[0].value)
+                launch()
+                continue
+            for future in done:
+                option = pending.pop(future)
+                answer = future.result()
+                if answer is not None:
+                    if option != first:
+                        self._count("hedge_wins" if hedged else "fallbacks")
+                    return answer
+            if not pending and candidates:
+                logging.warning("%s failed; falling back to %s.", primary.value, candidates[0].value)
+                primary = launch()
+        self._count("failed")
+        return None
+
+    def stream(self, prompt, **kwargs):
+        """
+        Stream from the best provider; if it fails before producing any text, fall
+        back to the next one. Raises StreamInterrupted when a stream breaks after
+        producing text (the text can't be taken back) or when every provider failed.
+        """
+        for i, option in enumerate(self.ranked()):
+            if i:
+                self._count("fallbacks")
+            start = time.perf_counter()
+            produced = False
+            try:
+                for token in self.client(option).stream(prompt, **kwargs):
+                    produced = True
+                    yield token
+            except Exception as e:
+                logging.error("Error from %s: %s", option.value, e)
+                self.health[option].record(time.perf_counter() - start, False)
+                if produced:
+                    self._count("failed")
+                    raise StreamInterrupted(f"the {option.value} stream broke off: {e}") from e
+                continue
+            self.health[option].record(time.perf_counter() - start, produced)
+            if produced:
+                return
+        self._count("failed")
+        raise StreamInterrupted("every provider failed")
+
+    def astream(self, prompt, **kwargs):
+        return aiter_stream(self.stream(prompt, **kwargs))
+
+    def stats(self):
+        with self.counters_lock:
+            counters = dict(self.counters)
+        return {"providers": {option.value: self.health[option].stats() for option in self.providers}, **counters}
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def default_providers():
+    """
+    Providers listed in YT_TLDR_ROUTER_PROVIDERS (comma-separated LLMOption names), or
+    else every cloud provider with an API key followed by the local Ollama.
+    """
+    names = os.getenv("YT_TLDR_ROUTER_PROVIDERS")
+    if names:
+        options = [LLMOption.from_name(name.strip().upper()) for name in names.split(",") if name.strip()]
+        return [option for option in options if option is not None and option != LLMOption.AUTO]
+    return [option for option, variable in API_KEY_VARIABLES.items() if os.getenv(variable)] + [LLMOption.OLLAMA]
+
+
+def get_router():
+    """
+    Return the process-wide router, so every summarizer shares its latency and error statistics.
+    YT_TLDR_HEDGE_AFTER sets the hedging delay in seconds, or "p95".
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            hedge_after = os.getenv("YT_TLDR_HEDGE_AFTER") or None
+            if hedge_after and hedge_after != "p95":
+                hedge_after = float(hedge_after)
+            _router = RouterClient(default_providers(), hedge_after=hedge_after)
+        return _router
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+# Yielded by iter_sse_json for the OpenAI-style "[DONE]" sentinel
+DONE = object()
+
+
+class StreamInterrupted(Exception):
+    """
+    Raised by a client's stream() when the answer ends without the provider's final
+    event (dropped connection, error event, unparsable data), so a partial answer is
+    never taken for a complete one.
+    """
+
+
+def iter_sse_json(response):
+    """
+    Parse a server-sent events HTTP response and yield the JSON payload of each
+    data event. The OpenAI-style "[DONE]" sentinel is yielded as DONE and ends the
+    iteration, which tells a finished stream from a closed connection.
+    """
+    data_lines = []
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            if line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+            continue
+        # A blank line terminates the event
+        if not data_lines:
+            continue
+        data = "\n".join(data_lines)
+        data_lines = []
+        if data == "[DONE]":
+            yield DONE
+            return
+        yield json.loads(data)
+    if data_lines == ["[DONE]"]:
+        yield DONE
+    elif data_lines:
+        yield json.loads("\n".join(data_lines))
+
+
+async def aiter_stream(stream):
+    """
+    Expose a blocking token iterator as an async iterator, pulling each token in a worker thread.
+    """
+    iterator = iter(stream)
+    sentinel = object()
+    while True:
+        token = await asyncio.to_thread(next, iterator, sentinel)
+        if token is sentinel:
+            return
+        yield token
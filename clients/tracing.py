@@ -0,0 +1,51 @@
+import functools
+import time
+
+from summary.tokens import estimate_tokens
+from telemetry import get_tracer
+
+
+def traced_chat(chat):
+    """
+    Run a client's chat(prompt, ...) in an "llm.chat" span recording prompt and completion tokens.
+    """
+    @functools.wraps(chat)
+    def wrapper(self, prompt, *args, **kwargs):
+        tracer = get_tracer()
+        if not tracer.enabled:
+            return chat(self, prompt, *args, **kwargs)
+        with tracer.span("llm.chat", provider=self.transport.name, model=self.model,
+                         prompt_tokens=estimate_tokens(prompt)) as span:
+            answer = chat(self, prompt, *args, **kwargs)
+            if answer is None:
+                span.fail("no answer")
+            else:
+                span.set(completion_tokens=estimate_tokens(answer))
+        return answer
+    return wrapper
+
+
+def traced_stream(stream):
+    """
+    Run a client's stream(prompt, ...) generator in an "llm.stream" span recording prompt
+    and completion tokens and the time to the first token.
+    """
+    @functools.wraps(stream)
+    def wrapper(self, prompt, *args, **kwargs):
+        tracer = get_tracer()
+        if not tracer.enabled:
+            yield from stream(self, prompt, *args, **kwargs)
+            return
+        with tracer.stream_span("llm.stream", provider=self.transport.name, model=self.model,
+                                prompt_tokens=estimate_tokens(prompt)) as span:
+            start = time.perf_counter()
+            chars = 0
+            for token in stream(self, prompt, *args, **kwargs):
+                if not chars:
+                    span.set(first_token_seconds=time.perf_counter() - start)
+                chars += len(token)
+                yield token
+            if not chars:
+                span.fail("no answer")
+            span.set(completion_tokens=(chars + 3) // 4)
+    return wrapper
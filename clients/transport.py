@@ -0,0 +1,195 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from models import LLMOption, get_provider_limits
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """
+        Take amount tokens, sleeping until they are available. Returns the seconds waited.
+        """
+        # A request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class Transport:
+    """
+    Shared HTTP transport of one LLM provider: a pooled keep-alive session,
+    timeouts, retries with exponential backoff and jitter (honoring Retry-After),
+    and token buckets for requests and tokens per minute.
+    """
+
+    def __init__(self, name, timeout=(10, 300), max_retries=5, backoff_base=1.0, backoff_max=60.0,
+                 requests_per_minute=None, tokens_per_minute=None, pool_size=16):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+        self.session = requests.Session()
+        # pool_block caps the connections, and so the requests in flight, at pool_size
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.counters = {"requests": 0, "retries": 0, "throttled": 0, "rate_limited": 0, "rate_limit_wait": 0.0}
+        self.counters_lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self.counters_lock:
+            self.counters[name] += amount
+
+    def _throttle(self, tokens):
+        waited = 0.0
+        if self.request_bucket:
+            waited += self.request_bucket.acquire()
+        if self.token_bucket and tokens:
+            waited += self.token_bucket.acquire(tokens)
+        if waited:
+            self._count("rate_limited")
+            self._count("rate_limit_wait", waited)
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Full jitter: a random delay up to the exponential cap
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            date = email.utils.parsedate_to_datetime(value)
+            return max(0.0, date.timestamp() - time.time()) if date else None
+
+    def post(self, url, tokens=0, **kwargs):
+        """
+        POST through the pooled session. Retries connection errors, timeouts and
+        retryable statuses; returns the last response, whose status the caller checks.
+        tokens is the estimated prompt size charged to the tokens-per-minute bucket.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            self._throttle(tokens)
+            self._count("requests")
+            try:
+                response = self.session.post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logging.warning("%s request failed (%s); retrying in %.1fs", self.name, e, delay)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                if response.status_code == 429:
+                    self._count("throttled")
+                delay = self._backoff(attempt, self._retry_after(response))
+                logging.warning("%s returned HTTP %d; retrying in %.1fs", self.name, response.status_code, delay)
+                response.close()
+            self._count("retries")
+            time.sleep(delay)
+
+    def call(self, fn, tokens=0):
+        """
+        Run fn() (a request made by a provider SDK) with the same rate limiting and retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._throttle(tokens)
+            self._count("requests")
+            try:
+                return fn()
+            except Exception as e:
+                if attempt == self.max_retries or not self._is_retryable(e):
+                    raise
+                if getattr(e, "status_code", None) == 429:
+                    self._count("throttled")
+                delay = self._backoff(attempt)
+                logging.warning("%s request failed (%s); retrying in %.1fs", self.name, e, delay)
+            self._count("retries")
+            time.sleep(delay)
+
+    @staticmethod
+    def _is_retryable(exc):
+        if getattr(exc, "status_code", None) in RETRY_STATUSES:
+            return True
+        if isinstance(exc, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+            return True
+        try:
+            import httpx
+        except ImportError:
+            return False
+        return isinstance(exc, httpx.TransportError)
+
+    def stats(self):
+        with self.counters_lock:
+            return dict(self.counters)
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(llm_option: LLMOption, **settings):
+    """
+    Return the process-wide transport of a provider, creating it on first use
+    with the rate limits from its ProviderLimits (settings override them).
+    """
+    with _transports_lock:
+        transport = _transports.get(llm_option)
+        if transport is None:
+            limits = get_provider_limits(llm_option)
+            settings = {
+                "requests_per_minute": limits.requests_per_minute,
+                "tokens_per_minute": limits.tokens_per_minute,
+                **settings,
+            }
+            transport = _transports[llm_option] = Transport(llm_option.value, **settings)
+        return transport
+
+
+def transport_stats():
+    """
+    Return the counters of every transport created so far, keyed by provider name.
+    """
+    with _transports_lock:
+        return {option.value: transport.stats() for option, transport in _transports.items()}
@@ -1,3 +1,4 @@
+import argparse
 import logging
 import re
 import sys
@@ -6,8 +7,18 @@ from rich.console import Console
 from rich.prompt import Prompt
 from rich.text import Text
 
+from cache import SummaryCache, TranscriptCache, WorkspaceStore
+from models import set_rate_limits
 from models.llm_option import LLMOption
-from summary.summarizer import YouTubeSummarizer
+from summary.batch import BatchSummarizer
+from summary.service import DEFAULT_SERVICE_ADDRESS, SummaryService
+from summary.summarizer import Summarizer, YouTubeSummarizer
+from summary.watcher import CHANNEL_URL, ChannelWatcher, WatchState
+from telemetry import enable_tracing
+from video.backends import BACKENDS, BackendSpec
+from video.preprocessing import AudioPreprocessing
+from video.playlist import PlaylistExpander
+from video.transcription_service import DEFAULT_ADDRESS, RemoteTranscriber, TranscriptionServer
 
 logging.basicConfig(level=logging.INFO)
 console = Console()
@@ -21,6 +32,21 @@ def validate_youtube_url(url: str) -> bool:
     return bool(re.match(pattern, url))
 
 
+def validate_playlist_url(url: str) -> bool:
+    """
+    Basic validation to check if the URL matches a YouTube playlist link.
+    """
+    pattern = r"^(https?://(www\.)?youtube\.com/playlist\?list=[\w-]+)$"
+    return bool(re.match(pattern, url))
+
+
+def validate_channel_url(url: str) -> bool:
+    """
+    Basic validation to check if the URL matches a YouTube channel link (@handle, /channel/, /c/ or /user/).
+    """
+    return bool(CHANNEL_URL.match(url))
+
+
 def get_youtube_url_from_user() -> str:
     """
     Prompt the user repeatedly until a valid YouTube URL is entered.
@@ -41,24 +67,25 @@ def select_llm() -> LLMOption:
     console.print("Please select the language model you want to use:")
     for idx, option in enumerate(options, start=1):
         console.print(f"[cyan]{idx}[/cyan]: {option['name']}")
-    llm_value = Prompt.ask(
-        f"Select language model ({'/'.join(str(i) for i in range(1, len(options) + 1))})",
-        default="4"
-    )
-    try:
-        llm_index = int(llm_value) - 1
-        if 0 <= llm_index < len(options):
-            return LLMOption.from_name(options[llm_index]["value"])
-    except (ValueError, IndexError):
-        pass
-    console.print(Text("Invalid selection. Please try again.", style="red"))
+    # Asks again until the selection is valid, so callers never get None
+    while True:
+        llm_value = Prompt.ask(
+            f"Select language model ({'/'.join(str(i) for i in range(1, len(options) + 1))})",
+            default="4"
+        )
+        try:
+            llm_index = int(llm_value) - 1
+            if 0 <= llm_index < len(options):
+                return LLMOption.from_name(options[llm_index]["value"])
+        except (ValueError, IndexError):
+            pass
+        console.print(Text("Invalid selection. Please try again.", style="red"))
 
 
-def get_youtube_url_from_params():
+def get_youtube_url_from_params(youtube_url: str):
     """
-    Get the YouTube URL from the command-line parameters.
+    Validate the YouTube URL given as a command-line parameter.
     """
-    youtube_url = sys.argv[1]
     if not validate_youtube_url(youtube_url):
         console.print(Text("Error: The provided command-line URL is not valid.", style="red"))
         console.print(
@@ -74,13 +101,296 @@ def select_language() -> str:
     return language.strip().lower()
 
 
-def main():
-    youtube_url = get_youtube_url_from_params() if len(sys.argv) > 1 else get_youtube_url_from_user()
-    llm = select_llm()
-    language = select_language()
-    summarizer = YouTubeSummarizer(youtube_url, llm, language)
+def parse_rate_limit(value):
+    """
+    Parse a --rate-limit value, PROVIDER=RPM or PROVIDER=RPM:TPM (0 removes a limit).
+    """
+    name, _, rates = value.partition("=")
+    llm = LLMOption.from_name(name.strip().upper())
+    if llm is None or llm == LLMOption.AUTO or not rates:
+        raise argparse.ArgumentTypeError(f"expected PROVIDER=RPM[:TPM], e.g. GEMINI=2000, not '{value}'")
+    requests_per_minute, _, tokens_per_minute = rates.partition(":")
+    try:
+        return (llm, int(requests_per_minute) if requests_per_minute else None,
+                int(tokens_per_minute) if tokens_per_minute else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected PROVIDER=RPM[:TPM], e.g. GEMINI=2000, not '{value}'")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Summarize YouTube videos with an LLM.")
+    parser.add_argument("urls", nargs="*", help="YouTube video or playlist URLs")
+    parser.add_argument("-f", "--file", help="read URLs from a file, one per line ('-' for stdin)")
+    parser.add_argument("--llm", choices=[option["value"] for option in LLMOption.list_options()],
+                        help="language model to use (prompted if omitted)")
+    parser.add_argument("--language", help="summary language (prompted if omitted)")
+    parser.add_argument("--fetch-workers", type=int, default=4, help="batch: concurrent info/subtitle/audio fetches")
+    parser.add_argument("--transcribe-workers", type=int, default=1, help="batch: concurrent Whisper transcriptions")
+    parser.add_argument("--summarize-workers", type=int, default=4, help="batch: concurrent LLM calls")
+    parser.add_argument("--rate-limit", metavar="PROVIDER=RPM[:TPM]", type=parse_rate_limit, action="append",
+                        help="requests (and tokens) per minute allowed for a provider, e.g. GEMINI=2000 on a paid "
+                             "tier (also YT_TLDR_<PROVIDER>_RPM/_TPM; 0 removes the limit)")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write the transcript and summary caches")
+    parser.add_argument("--refresh-summary", action="store_true",
+                        help="ignore cached summaries and store the fresh ones")
+    parser.add_argument("--whisper-workers", type=int, default=1,
+                        help="transcribe silence-split windows of the audio in this many CPU processes")
+    parser.add_argument("--whisper-model", default="turbo",
+                        help="speech-to-text model size (tiny, base, small, medium, large-v3, turbo, ...)")
+    parser.add_argument("--whisper-backend", choices=list(BACKENDS), default="whisper",
+                        help="speech-to-text engine: openai-whisper on PyTorch, or faster-whisper (CTranslate2)")
+    parser.add_argument("--whisper-compute-type", default="int8",
+                        help="faster-whisper: weight quantization (int8, int8_float32, float16, float32)")
+    parser.add_argument("--whisper-threads", type=int,
+                        help="CPU threads per transcribing process (default: all cores, or a share per worker)")
+    parser.add_argument("--whisper-batch-size", type=int, default=8,
+                        help="faster-whisper: 30-second windows decoded together in one batch (1 disables batching)")
+    parser.add_argument("--trim-silence", action="store_true",
+                        help="drop silent stretches of the audio before transcribing it")
+    parser.add_argument("--silence-threshold-db", type=float, default=-40.0,
+                        help="--trim-silence: frames quieter than this (dBFS) count as silence")
+    parser.add_argument("--tempo", type=float, default=1.0,
+                        help="speed the audio up by this factor before transcribing it (0.5 to 2, try 1.25)")
+    parser.add_argument("--stream-audio", action="store_true",
+                        help="pipe the audio through ffmpeg into Whisper while it downloads (needs ffmpeg)")
+    parser.add_argument("--transcription-server", metavar="ADDRESS", nargs="?", const=DEFAULT_ADDRESS,
+                        help=f"send Whisper jobs to a running transcription service (socket path or host:port, "
+                             f"default {DEFAULT_ADDRESS})")
+    parser.add_argument("--serve-transcription", metavar="ADDRESS", nargs="?", const=DEFAULT_ADDRESS,
+                        help=f"run the transcription service that keeps Whisper models loaded "
+                             f"(default {DEFAULT_ADDRESS})")
+    parser.add_argument("--transcription-stats", metavar="ADDRESS", nargs="?", const=DEFAULT_ADDRESS,
+                        help="print queue depth and job latency of a running transcription service")
+    parser.add_argument("--serve", metavar="ADDRESS", nargs="?", const=DEFAULT_SERVICE_ADDRESS,
+                        help=f"run the HTTP summarization service (default {DEFAULT_SERVICE_ADDRESS})")
+    parser.add_argument("--service-workers", type=int, default=2, help="service: concurrent summarize jobs")
+    parser.add_argument("--service-queue", type=int, default=32,
+                        help="service: jobs that may wait before new ones are rejected with HTTP 503")
+    parser.add_argument("--compress", action="store_true",
+                        help="shrink long transcripts to the provider's token budget by dropping the least "
+                             "informative and repeated sentences before summarizing")
+    parser.add_argument("--trace-report", metavar="FILE",
+                        help="write the timing spans of this run (yt-dlp, Whisper, LLM) as a JSON report")
+    parser.add_argument("--metrics-file", metavar="FILE",
+                        help="write the span metrics of this run in the Prometheus text format")
+    parser.add_argument("--output-dir", help="batch: write each summary as a Markdown file in this directory")
+    parser.add_argument("--resume", action="store_true",
+                        help="keep each video's downloads, transcript and summary in a workspace and skip the "
+                             "stages an earlier run completed")
+    parser.add_argument("--gc-workspaces", action="store_true",
+                        help="delete workspaces older than --workspace-max-age days or beyond --workspace-max-gb")
+    parser.add_argument("--workspace-max-age", type=float, default=7, help="workspaces: days to keep")
+    parser.add_argument("--workspace-max-gb", type=float, default=5, help="workspaces: total size to keep")
+    parser.add_argument("--watch", action="store_true",
+                        help="add the channel and playlist URLs to the watch list and summarize their new uploads")
+    parser.add_argument("--watch-interval", type=float, default=900, help="watch: seconds between polls")
+    parser.add_argument("--watch-once", action="store_true", help="watch: poll and summarize once, then exit")
+    parser.add_argument("--watch-db", help="watch: state database (default ~/.local/state/yt-tldr/watch.sqlite3)")
+    parser.add_argument("--backfill", action="store_true",
+                        help="watch: also summarize the videos already on a newly added channel or playlist")
+    args = parser.parse_args()
+    if not 0.5 <= args.tempo <= 2.0:
+        parser.error("--tempo must be between 0.5 and 2")
+    return args
+
+
+def read_urls(args) -> list:
+    """
+    Collect the URLs from the arguments and the optional URL file,
+    expanding playlists and skipping invalid entries.
+    """
+    urls = []
+    for url in read_raw_urls(args):
+        if validate_youtube_url(url):
+            urls.append(url)
+        elif validate_playlist_url(url):
+            console.print(f"[cyan]Expanding playlist {url}...[/cyan]")
+            urls.extend(PlaylistExpander(url).get_video_urls())
+        else:
+            console.print(Text(f"Skipping invalid URL: {url}", style="yellow"))
+    return urls
+
+
+def read_raw_urls(args) -> list:
+    raw_urls = list(args.urls)
+    if args.file:
+        handle = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+        with handle:
+            raw_urls.extend(line.strip() for line in handle if line.strip() and not line.startswith("#"))
+    return raw_urls
+
+
+def make_workspaces(args):
+    """
+    Return the workspace store when resuming, after clearing out old workspaces.
+    """
+    if not (args.resume or args.gc_workspaces):
+        return None
+    workspaces = WorkspaceStore(max_bytes=int(args.workspace_max_gb * 1024 ** 3),
+                                max_age=args.workspace_max_age * 24 * 3600)
+    stats = workspaces.gc()
+    if stats["removed"] or args.gc_workspaces:
+        console.print(f"Workspaces: removed {stats['removed']} ({stats['freed_bytes'] / 1024 ** 2:.0f} MiB), "
+                      f"kept {stats['kept']} ({stats['kept_bytes'] / 1024 ** 2:.0f} MiB).")
+    return workspaces
+
+
+def make_backend(args):
+    return BackendSpec(args.whisper_backend, compute_type=args.whisper_compute_type, threads=args.whisper_threads,
+                       batch_size=args.whisper_batch_size)
+
+
+def make_preprocessing(args):
+    return AudioPreprocessing(trim=args.trim_silence, tempo=args.tempo, threshold_db=args.silence_threshold_db)
+
+
+def make_batch(args):
+    # Prompts can't be answered when the URLs themselves come from stdin
+    interactive = args.file != "-"
+    if args.llm:
+        llm = LLMOption.from_name(args.llm)
+    else:
+        llm = select_llm() if interactive else LLMOption.OLLAMA
+    if args.language:
+        language = args.language.strip().lower()
+    else:
+        language = select_language() if interactive else "english"
+
+    return BatchSummarizer(llm, language,
+                           fetch_workers=args.fetch_workers,
+                           transcribe_workers=args.transcribe_workers,
+                           summarize_workers=args.summarize_workers,
+                           output_dir=args.output_dir,
+                           cache=None if args.no_cache else TranscriptCache(),
+                           summary_cache=None if args.no_cache else SummaryCache(),
+                           bypass_summary_cache=args.refresh_summary,
+                           transcription_server=args.transcription_server,
+                           whisper_workers=args.whisper_workers,
+                           whisper_model=args.whisper_model,
+                           whisper_backend=make_backend(args),
+                           audio_preprocessing=make_preprocessing(args),
+                           stream_audio=args.stream_audio,
+                           compress=args.compress,
+                           workspaces=make_workspaces(args))
+
+
+def run_batch(args):
+    urls = read_urls(args)
+    if not urls:
+        console.print(Text("Error: No valid YouTube URLs to process.", style="red"))
+        sys.exit(1)
+
+    jobs = make_batch(args).run(urls)
+    if not any(job.ok for job in jobs):
+        sys.exit(1)
+
+
+def export_traces(tracer, args):
+    if args.trace_report:
+        tracer.write_report(args.trace_report)
+        console.print(f"Trace report written to {args.trace_report}")
+    if args.metrics_file:
+        with open(args.metrics_file, "w", encoding="utf-8") as f:
+            f.write(tracer.prometheus())
+        console.print(f"Metrics written to {args.metrics_file}")
+
+
+def run_watch(args):
+    """
+    Add the given channels and playlists to the watch list, then poll the whole list
+    once (--watch-once) or every --watch-interval seconds.
+    """
+    sources = []
+    for url in read_raw_urls(args):
+        if validate_channel_url(url) or validate_playlist_url(url):
+            sources.append(url)
+        else:
+            console.print(Text(f"Skipping URL that is not a channel or playlist: {url}", style="yellow"))
+
+    state = WatchState(args.watch_db)
+    state.add_sources(sources)
+    if not state.sources():
+        console.print(Text("Error: The watch list is empty; pass channel or playlist URLs.", style="red"))
+        sys.exit(1)
+
+    watcher = ChannelWatcher(state, make_batch(args), interval=args.watch_interval, backfill=args.backfill)
+    if args.watch_once:
+        watcher.run_once()
+    else:
+        try:
+            watcher.run_forever()
+        except KeyboardInterrupt:
+            console.print("Stopped watching.")
+    console.print(f"Watch list: {len(state.sources())} sources, videos by status {state.status_counts()}")
+
+
+def run(args):
+    if args.watch:
+        run_watch(args)
+        return
+    is_batch = args.file or len(args.urls) > 1 or any(validate_playlist_url(url) for url in args.urls)
+    if is_batch:
+        run_batch(args)
+        return
+
+    youtube_url = get_youtube_url_from_params(args.urls[0]) if args.urls else get_youtube_url_from_user()
+    llm = LLMOption.from_name(args.llm) if args.llm else select_llm()
+    language = args.language.strip().lower() if args.language else select_language()
+    summarizer = YouTubeSummarizer(youtube_url, llm, language,
+                                   summarizer=Summarizer(llm, language,
+                                                         cache=None if args.no_cache else SummaryCache(),
+                                                         bypass_cache=args.refresh_summary,
+                                                         compress=args.compress),
+                                   cache=None if args.no_cache else TranscriptCache(),
+                                   transcription_server=args.transcription_server,
+                                   whisper_workers=args.whisper_workers,
+                                   whisper_model=args.whisper_model,
+                                   whisper_backend=make_backend(args),
+                                   audio_preprocessing=make_preprocessing(args),
+                                   stream_audio=args.stream_audio,
+                                   workspaces=make_workspaces(args))
     summarizer.run()
 
 
+def main():
+    args = parse_args()
+    for llm, requests_per_minute, tokens_per_minute in args.rate_limit or []:
+        set_rate_limits(llm, requests_per_minute, tokens_per_minute)
+    if args.serve_transcription:
+        try:
+            server = TranscriptionServer(args.serve_transcription)
+        except ValueError as e:
+            console.print(f"[red]Error: {e}[/red]")
+            sys.exit(1)
+        server.serve_forever()
+        return
+    if args.serve:
+        SummaryService(args.serve, workers=args.service_workers, max_queue=args.service_queue,
+                       transcribe_workers=args.transcribe_workers,
+                       cache=None if args.no_cache else TranscriptCache(),
+                       summary_cache=None if args.no_cache else SummaryCache(),
+                       transcription_server=args.transcription_server,
+                       whisper_workers=args.whisper_workers,
+                       whisper_model=args.whisper_model,
+                       whisper_backend=make_backend(args),
+                       audio_preprocessing=make_preprocessing(args),
+                       stream_audio=args.stream_audio,
+                       compress=args.compress).serve_forever()
+        return
+    if args.gc_workspaces and not (args.urls or args.file):
+        make_workspaces(args)
+        return
+    if args.transcription_stats:
+        console.print(RemoteTranscriber(args.transcription_stats, model_name=None).stats())
+        return
+
+    tracer = enable_tracing() if args.trace_report or args.metrics_file else None
+    try:
+        run(args)
+    finally:
+        if tracer is not None:
+            export_traces(tracer, args)
+
+
 if __name__ == "__main__":
     main()
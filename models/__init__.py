@@ -1 +1,2 @@
 from .llm_option import LLMOption
+from .provider_limits import ProviderLimits, get_provider_limits, set_rate_limits
@@ -6,6 +6,8 @@ class LLMOption(Enum):
     ANTHROPIC = "Anthropic"
     GEMINI = "Gemini"
     OLLAMA = "Ollama"
+    # Routes each request to the fastest healthy provider (see clients.router)
+    AUTO = "Auto"
 
     @classmethod
     def list_options(cls):
@@ -0,0 +1,86 @@
+import copy
+import os
+
+from models.llm_option import LLMOption
+
+
+class ProviderLimits:
+    """
+    Prompt budget, concurrency and rate settings of a provider: chunk_tokens is the
+    transcript share of a single request, overlap_tokens is repeated between
+    neighbouring chunks and max_concurrency caps the chunk requests in flight at once.
+    requests_per_minute and tokens_per_minute feed the client-side rate limiter
+    (None means unlimited). compressed_tokens is the transcript budget of the optional
+    extractive compression pass and input_cost_per_mtok the price in USD per million
+    input tokens of the default model, used to estimate what compression saved.
+    """
+
+    def __init__(self, context_tokens, chunk_tokens, overlap_tokens, max_concurrency,
+                 requests_per_minute=None, tokens_per_minute=None, compressed_tokens=None, input_cost_per_mtok=0.0):
+        self.context_tokens = context_tokens
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.compressed_tokens = compressed_tokens or chunk_tokens
+        self.input_cost_per_mtok = input_cost_per_mtok
+
+
+# Compressed budgets keep a transcript in a single request; costs are list prices of the default models.
+# The rates are those of the entry tiers (Gemini's free tier); see get_provider_limits to raise them.
+PROVIDER_LIMITS = {
+    LLMOption.OPENAI: ProviderLimits(context_tokens=128_000, chunk_tokens=24_000, overlap_tokens=200, max_concurrency=8,
+                                     requests_per_minute=500, tokens_per_minute=200_000, compressed_tokens=12_000,
+                                     input_cost_per_mtok=0.15),
+    LLMOption.ANTHROPIC: ProviderLimits(context_tokens=200_000, chunk_tokens=24_000, overlap_tokens=200,
+                                        max_concurrency=4, requests_per_minute=50, tokens_per_minute=40_000,
+                                        compressed_tokens=12_000, input_cost_per_mtok=3.0),
+    LLMOption.GEMINI: ProviderLimits(context_tokens=1_000_000, chunk_tokens=64_000, overlap_tokens=200,
+                                     max_concurrency=4, requests_per_minute=15, tokens_per_minute=1_000_000,
+                                     compressed_tokens=24_000, input_cost_per_mtok=0.075),
+    # gemma2 has an 8k context window; OllamaClient scales these to its num_ctx and parallel settings
+    LLMOption.OLLAMA: ProviderLimits(context_tokens=8_192, chunk_tokens=3_000, overlap_tokens=100, max_concurrency=1,
+                                     compressed_tokens=3_000),
+}
+
+
+# Rate limits set with set_rate_limits (the --rate-limit option), which win over the environment
+_rate_overrides = {}
+
+
+def set_rate_limits(llm_option: LLMOption, requests_per_minute=None, tokens_per_minute=None):
+    """
+    Override the rate limits of a provider for this process (None keeps the current
+    value, 0 removes the limit). Takes effect for transports created afterwards.
+    """
+    overrides = _rate_overrides.setdefault(llm_option, {})
+    if requests_per_minute is not None:
+        overrides["requests_per_minute"] = requests_per_minute
+    if tokens_per_minute is not None:
+        overrides["tokens_per_minute"] = tokens_per_minute
+
+
+def _env_rates(llm_option: LLMOption):
+    rates = {}
+    for name, suffix in (("requests_per_minute", "RPM"), ("tokens_per_minute", "TPM")):
+        value = os.getenv(f"YT_TLDR_{llm_option.name}_{suffix}")
+        if value:
+            rates[name] = int(value)
+    return rates
+
+
+def get_provider_limits(llm_option: LLMOption) -> ProviderLimits:
+    """
+    Return the limits of a provider. Its requests and tokens per minute can be raised
+    for paid tiers with YT_TLDR_<PROVIDER>_RPM and YT_TLDR_<PROVIDER>_TPM (e.g.
+    YT_TLDR_GEMINI_RPM=2000) or set_rate_limits; 0 removes the limit.
+    """
+    limits = PROVIDER_LIMITS[llm_option]
+    rates = {**_env_rates(llm_option), **_rate_overrides.get(llm_option, {})}
+    if not rates:
+        return limits
+    limits = copy.copy(limits)
+    for name, value in rates.items():
+        setattr(limits, name, value or None)
+    return limits
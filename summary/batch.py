@@ -0,0 +1,378 @@
+import logging
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+
+from rich import box
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+from cache import SummaryCache, TranscriptCache, WorkspaceStore
+from clients.ollama_client import ollama_stats
+from clients.transport import transport_stats
+from models import LLMOption
+from summary.summarizer import Summarizer, YouTubeSummarizer
+from telemetry import span
+from video.backends import BackendSpec
+from video.preprocessing import AudioPreprocessing, preprocessing_stats
+from video.subtitles import subtitle_stats
+
+console = Console()
+
+
+class VideoJob:
+    """
+    State of a single video while it moves through the batch pipeline.
+    """
+
+    def __init__(self, index, video: YouTubeSummarizer):
+        self.index = index
+        self.video = video
+        self.workdir = None
+        self.audio_file = None
+        self.transcript_source = None
+        self.error = None
+        self.stage_times = {}
+
+    @property
+    def ok(self):
+        return self.error is None and bool(self.video.summary)
+
+
+class TranscriberPool:
+    """
+    Up to `size` transcribers (each a loaded Whisper model or a transcription service
+    connection) shared by every thread and pipeline given the pool. A job checks one
+    out for its whole transcription, so at most `size` jobs transcribe at once and at
+    most `size` models are loaded, however many threads and pipelines there are.
+    """
+
+    def __init__(self, size=1):
+        self.size = size
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self, factory):
+        """
+        Wait for a free slot and yield an idle transcriber, or a new one from factory().
+        """
+        with self.slots:
+            with self.lock:
+                transcriber = self.idle.pop() if self.idle else None
+            if transcriber is None:
+                transcriber = factory()
+            try:
+                yield transcriber
+            finally:
+                with self.lock:
+                    self.idle.append(transcriber)
+
+    def close(self):
+        """
+        Close the idle transcribers (stopping their worker processes); a later checkout loads new ones.
+        """
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for transcriber in idle:
+            transcriber.close()
+
+
+class BatchSummarizer:
+    """
+    Summarizes many videos through a staged pipeline:
+    - fetch: video info, subtitles and (if needed) audio download (network-bound)
+    - transcribe: Whisper transcription of downloaded (or streamed) audio (CPU/GPU-bound)
+    - summarize: LLM summarization (network-bound)
+
+    Each stage has its own bounded worker pool, so stages overlap across videos.
+    A failing video is reported and does not stop the others. With a WorkspaceStore,
+    every video works in its durable workspace and resumes after the last stage an
+    earlier run completed. Transcription goes through a TranscriberPool of
+    transcribe_workers transcribers, or the one passed in to share it between pipelines.
+    """
+
+    FETCH = "fetch"
+    TRANSCRIBE = "transcribe"
+    SUMMARIZE = "summarize"
+
+    def __init__(self, llm: LLMOption, language: str, fetch_workers=4, transcribe_workers=1, summarize_workers=4,
+                 whisper_model="turbo", output_dir=None, max_in_flight=None, cache: TranscriptCache = None,
+                 summary_cache: SummaryCache = None, bypass_summary_cache=False, transcription_server=None,
+                 whisper_workers=1, stream_audio=False, compress=False, workspaces: WorkspaceStore = None,
+                 whisper_backend: BackendSpec = None, audio_preprocessing: AudioPreprocessing = None,
+                 transcribers: TranscriberPool = None):
+        self.summarizer = Summarizer(llm_option=llm, language=language, cache=summary_cache,
+                                     bypass_cache=bypass_summary_cache, compress=compress)
+        self.llm = llm
+        self.language = language
+        self.fetch_workers = fetch_workers
+        self.transcribe_workers = transcribe_workers
+        self.summarize_workers = summarize_workers
+        self.whisper_model = whisper_model
+        self.cache = cache
+        self.transcription_server = transcription_server
+        self.whisper_workers = whisper_workers
+        self.whisper_backend = whisper_backend
+        self.audio_preprocessing = audio_preprocessing
+        self.stream_audio = stream_audio
+        self.workspaces = workspaces
+        self.output_dir = Path(output_dir) if output_dir else None
+        # Caps how many videos hold a working directory at once (downloaded audio waiting for Whisper)
+        self.max_in_flight = max_in_flight or 2 * (fetch_workers + transcribe_workers + summarize_workers)
+        # A pool passed in belongs to the caller, who closes it
+        self.owns_transcribers = transcribers is None
+        self.transcribers = transcribers or TranscriberPool(transcribe_workers)
+
+    def _fetch(self, job: VideoJob):
+        video = job.video
+        if video.fetch_info() is None:
+            raise RuntimeError("failed to retrieve video information")
+
+        if video.workspace is not None:
+            job.workdir = str(video.workspace.path)
+            if video.resume_summary():
+                job.transcript_source = "earlier run"
+                return None
+            if video.resume_transcript():
+                job.transcript_source = "earlier run"
+                return self.SUMMARIZE
+        else:
+            job.workdir = tempfile.mkdtemp(prefix="yt-tldr-")
+        if video.fetch_subtitles(job.workdir):
+            job.transcript_source = f"subtitles ({video.subtitle_track.kind}, {video.subtitle_track.language})"
+            return self.SUMMARIZE
+        if video.fetch_cached_transcription():
+            job.transcript_source = "cache"
+            return self.SUMMARIZE
+
+        if video.stream_audio:
+            # Download and transcription happen together in the transcription stage
+            job.transcript_source = "whisper (streamed)"
+            return self.TRANSCRIBE
+
+        job.audio_file = video.download_audio(job.workdir, show_progress=False)
+        if not job.audio_file:
+            raise RuntimeError("failed to download audio")
+        job.transcript_source = "whisper"
+        return self.TRANSCRIBE
+
+    def _transcribe(self, job: VideoJob):
+        with self.transcribers.checkout(job.video.make_transcriber) as transcriber:
+            if job.audio_file is None:
+                transcript = job.video.stream_transcribe(job.workdir, transcriber, show_progress=False)
+            else:
+                transcript = job.video.transcribe(job.audio_file, transcriber)
+        if not transcript:
+            raise RuntimeError("failed to transcribe audio")
+        return self.SUMMARIZE
+
+    def _summarize(self, job: VideoJob):
+        if not job.video.summarize():
+            raise RuntimeError("failed to summarize the transcript")
+        return None
+
+    @staticmethod
+    def _timed(stage_fn, stage, job: VideoJob):
+        start = time.perf_counter()
+        try:
+            with span("batch.stage", stage=stage, url=job.video.youtube_url):
+                return stage_fn(job)
+        finally:
+            job.stage_times[stage] = time.perf_counter() - start
+
+    @staticmethod
+    def _cleanup(job: VideoJob):
+        # Workspaces outlive the run; the garbage collector removes them
+        if job.workdir and job.video.workspace is None:
+            shutil.rmtree(job.workdir, ignore_errors=True)
+        job.workdir = None
+
+    def make_job(self, index, url):
+        return VideoJob(index, YouTubeSummarizer(url, self.llm, self.language, summarizer=self.summarizer,
+                                                 cache=self.cache, whisper_model=self.whisper_model,
+                                                 transcription_server=self.transcription_server,
+                                                 whisper_workers=self.whisper_workers,
+                                                 stream_audio=self.stream_audio, workspaces=self.workspaces,
+                                                 whisper_backend=self.whisper_backend,
+                                                 audio_preprocessing=self.audio_preprocessing))
+
+    def run_job(self, job: VideoJob, on_stage=None):
+        """
+        Run a single job through all stages in the calling thread, calling on_stage(stage)
+        as each one starts. Transcription waits for a transcriber from the pool, so at most
+        its size of jobs transcribe at the same time. Errors are recorded on the job;
+        returns job.ok.
+        """
+        stage_fns = {self.FETCH: self._fetch, self.TRANSCRIBE: self._transcribe, self.SUMMARIZE: self._summarize}
+        stage = self.FETCH
+        try:
+            while stage is not None:
+                if on_stage:
+                    on_stage(stage)
+                stage = self._timed(stage_fns[stage], stage, job)
+        except Exception as e:
+            logging.error("Video %s failed during %s: %s", job.video.youtube_url, stage, e)
+            job.error = f"{stage}: {e}"
+        finally:
+            self._cleanup(job)
+        return job.ok
+
+    def run(self, urls):
+        """
+        Process all URLs and return the list of VideoJob results, in input order.
+        """
+        jobs = [self.make_job(i, url) for i, url in enumerate(urls, start=1)]
+        backlog = deque(jobs)
+        stage_fns = {self.FETCH: self._fetch, self.TRANSCRIBE: self._transcribe, self.SUMMARIZE: self._summarize}
+
+        console.print(f"[bold cyan]\nProcessing {len(jobs)} videos "
+                      f"(fetch={self.fetch_workers}, transcribe={self.transcribe_workers}, "
+                      f"summarize={self.summarize_workers})...[/bold cyan]")
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(self.fetch_workers, thread_name_prefix="fetch") as fetch_pool, \
+                ThreadPoolExecutor(self.transcribe_workers, thread_name_prefix="transcribe") as transcribe_pool, \
+                ThreadPoolExecutor(self.summarize_workers, thread_name_prefix="summarize") as summarize_pool:
+            pools = {self.FETCH: fetch_pool, self.TRANSCRIBE: transcribe_pool, self.SUMMARIZE: summarize_pool}
+            pending = {}
+
+            def submit(stage, job):
+                future = pools[stage].submit(self._timed, stage_fns[stage], stage, job)
+                pending[future] = (stage, job)
+
+            while backlog or pending:
+                while backlog and len(pending) < self.max_in_flight:
+                    submit(self.FETCH, backlog.popleft())
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, job = pending.pop(future)
+                    try:
+                        next_stage = future.result()
+                    except Exception as e:
+                        logging.error("Video %s failed during %s: %s", job.video.youtube_url, stage, e)
+                        job.error = f"{stage}: {e}"
+                        next_stage = None
+
+                    if next_stage is None:
+                        self._cleanup(job)
+                        self._report_job(job)
+                    else:
+                        submit(next_stage, job)
+        if self.owns_transcribers:
+            self.transcribers.close()
+
+        self._report_summary(jobs, time.perf_counter() - start)
+        if self.cache is not None:
+            stats = self.cache.stats()
+            console.print(f"Transcript cache: {stats['hits']} hits, {stats['misses']} misses, "
+                          f"{stats['entries']} entries ({stats['bytes'] / 1024:.0f} KiB)")
+        self._report_subtitles(subtitle_stats())
+        self._report_preprocessing(preprocessing_stats())
+        if self.summarizer.compress:
+            console.print(self.summarizer.compression_summary())
+        if self.llm == LLMOption.AUTO:
+            self._report_router(self.summarizer.client.stats())
+        for provider, stats in transport_stats().items():
+            console.print(f"{provider} transport: {stats['requests']} requests, {stats['retries']} retries, "
+                          f"{stats['throttled']} throttled (HTTP 429), "
+                          f"{stats['rate_limit_wait']:.1f}s waiting on the rate limiter")
+        for host, stats in ollama_stats().items():
+            self._report_ollama(host, stats)
+        return jobs
+
+    def _report_job(self, job: VideoJob):
+        video = job.video
+        if not job.ok:
+            console.print(f"[red]✗ [{job.index}] {video.video_title or video.youtube_url}: {job.error}[/red]")
+            return
+
+        if self.output_dir:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            path = self.output_dir / f"{video.video_id or job.index}.md"
+            path.write_text(f"# {video.video_title}\n\n{video.youtube_url}\n\n{video.summary}\n", encoding="utf-8")
+            console.print(f"[green]✓ [{job.index}] {video.video_title} → {path}[/green]")
+        else:
+            from rich.markdown import Markdown
+            console.print(Panel(Markdown(f"## {video.video_title}\n\n{video.summary}"),
+                                title=f"[bold green]Video Summary ({job.index})[/bold green]",
+                                border_style="green"))
+
+    @staticmethod
+    def _report_subtitles(stats):
+        if not stats["whisper_avoided"]:
+            return
+        console.print(f"Captions: {stats['manual']} manual, {stats['auto']} auto, {stats['translated']} translated; "
+                      f"{stats['whisper_avoided']} Whisper runs avoided ({stats['audio_seconds'] / 3600:.1f} h of "
+                      f"audio), {stats['rescued']} of them on videos without English auto-captions")
+
+    @staticmethod
+    def _report_preprocessing(stats):
+        if not stats["transcriptions"]:
+            return
+        console.print(f"Audio preprocessing: Whisper ran on {stats['processed_seconds'] / 60:.1f} min in "
+                      f"{stats['windows']} windows instead of {stats['original_seconds'] / 60:.1f} min in "
+                      f"{stats['original_windows']} ({stats['trimmed_seconds'] / 60:.1f} min of non-speech removed), "
+                      f"about {stats['speedup']:.2f}× less transcription work")
+
+    @staticmethod
+    def _report_router(stats):
+        for provider, health in stats["providers"].items():
+            latency = (f"p50 {health['p50']:.1f}s, p95 {health['p95']:.1f}s" if health["p50"] is not None
+                       else "no successful requests")
+            console.print(f"Router → {provider}: {health['requests']} requests, {latency}, "
+                          f"{100 * health['error_rate']:.0f}% errors")
+        console.print(f"Router: {stats['hedged']} hedged ({stats['hedge_wins']} won by the hedge), "
+                      f"{stats['fallbacks']} fallbacks, {stats['failed']} failed on every provider")
+
+    @staticmethod
+    def _report_ollama(host, stats):
+        if not stats["generations"]:
+            return
+        rates = (f"prompt {stats['prompt_rate'] or 0:.0f} tokens/s, generation {stats['eval_rate'] or 0:.1f} tokens/s"
+                 if stats["eval_seconds"] else "no token counts reported")
+        console.print(f"Ollama {host}: {stats['generations']} generations ({stats['parallel']} in flight, "
+                      f"num_ctx {stats['num_ctx']}), {stats['prompt_tokens']:,} prompt and {stats['eval_tokens']:,} "
+                      f"generated tokens; {rates}; {stats['load_seconds']:.1f}s loading the model")
+
+    @staticmethod
+    def _report_summary(jobs, elapsed):
+        table = Table(box=box.ROUNDED, expand=True, title="Batch Results")
+        table.add_column("#", justify="right")
+        table.add_column("Video", style="bold cyan")
+        table.add_column("Source")
+        table.add_column("Fetch", justify="right")
+        table.add_column("Transcribe", justify="right")
+        table.add_column("Summarize", justify="right")
+        table.add_column("Status")
+
+        def fmt(seconds):
+            return f"{seconds:.1f}s" if seconds is not None else "-"
+
+        for job in jobs:
+            table.add_row(
+                str(job.index),
+                job.video.video_title or job.video.youtube_url,
+                job.transcript_source or "-",
+                fmt(job.stage_times.get(BatchSummarizer.FETCH)),
+                fmt(job.stage_times.get(BatchSummarizer.TRANSCRIBE)),
+                fmt(job.stage_times.get(BatchSummarizer.SUMMARIZE)),
+                "[green]ok[/green]" if job.ok else f"[red]{job.error}[/red]",
+            )
+        console.print(table)
+
+        succeeded = sum(1 for job in jobs if job.ok)
+        video_seconds = sum(job.video.video_length_seconds or 0 for job in jobs if job.ok)
+        videos_per_minute = succeeded / elapsed * 60 if elapsed > 0 else 0
+        console.print(f"[bold]{succeeded}/{len(jobs)} videos summarized in {elapsed:.1f}s "
+                      f"({videos_per_minute:.2f} videos/min, "
+                      f"{video_seconds / 3600:.2f} h of video, "
+                      f"{video_seconds / elapsed if elapsed > 0 else 0:.1f}× real time)[/bold]")
@@ -0,0 +1,73 @@
+import re
+
+from summary.tokens import estimate_tokens
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+")
+
+
+class TranscriptChunker:
+    """
+    Splits a transcript into chunks that fit a token budget.
+
+    Chunks break on sentence boundaries (or on the given segments, e.g. subtitle cues);
+    a unit longer than the budget on its own, as happens with unpunctuated
+    auto-captions, is split on word boundaries. The last overlap_tokens of each
+    chunk are repeated at the start of the next one to keep context across the cut.
+    """
+
+    def __init__(self, max_tokens, overlap_tokens=0):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def _units(self, segments):
+        for segment in segments:
+            for sentence in SENTENCE_BOUNDARY.split(segment.strip()):
+                if not sentence:
+                    continue
+                if estimate_tokens(sentence) <= self.max_tokens:
+                    yield sentence
+                    continue
+                # Oversized sentence: fall back to word boundaries
+                words, size = [], 0
+                for word in sentence.split():
+                    cost = estimate_tokens(word) + 1
+                    if words and size + cost > self.max_tokens:
+                        yield " ".join(words)
+                        words, size = [], 0
+                    words.append(word)
+                    size += cost
+                if words:
+                    yield " ".join(words)
+
+    def chunk(self, transcript):
+        """
+        Split a transcript (a string or a list of segment strings) into a list of chunk strings.
+        """
+        segments = [transcript] if isinstance(transcript, str) else transcript
+        chunks = []
+        current, size = [], 0
+        for unit in self._units(segments):
+            cost = estimate_tokens(unit) + 1
+            if current and size + cost > self.max_tokens:
+                chunks.append(" ".join(current))
+                current, size = self._overlap(current)
+                if size + cost > self.max_tokens:
+                    current, size = [], 0
+            current.append(unit)
+            size += cost
+        if current:
+            chunks.append(" ".join(current))
+        return chunks
+
+    def _overlap(self, units):
+        # Carry over trailing units of the previous chunk, up to overlap_tokens
+        carried, size = [], 0
+        for unit in reversed(units):
+            cost = estimate_tokens(unit) + 1
+            if size + cost > self.overlap_tokens:
+                break
+            carried.insert(0, unit)
+            size += cost
+        return carried, size
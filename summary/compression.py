@@ -0,0 +1,113 @@
+import re
+from collections import Counter
+
+import numpy as np
+
+from summary.tokens import estimate_tokens
+from video.transcription import TranscriptProcessor
+
+WORD = re.compile(r"\w+")
+
+
+class CompressionResult:
+    def __init__(self, text, tokens_before, tokens_after, units_before, units_after):
+        self.text = text
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.units_before = units_before
+        self.units_after = units_after
+
+    @property
+    def tokens_saved(self):
+        return self.tokens_before - self.tokens_after
+
+
+class TranscriptCompressor:
+    """
+    Extractive transcript compression: keeps the most central sentences until the
+    transcript fits target_tokens, and drops near-duplicates of sentences already kept.
+
+    Sentences (see TranscriptProcessor.split_sentences) are merged into at most max_units
+    consecutive units so the similarity matrix stays small. Units are TF-IDF vectors over
+    the max_features most widespread words; TextRank (PageRank over their cosine
+    similarity graph) scores them. Units are then taken best first, skipping those whose
+    similarity to a kept unit exceeds redundancy (or duplicate, when the budget is not
+    filled otherwise), and kept in transcript order.
+    """
+
+    def __init__(self, max_units=2000, max_features=4096, redundancy=0.7, duplicate=0.95, damping=0.85,
+                 iterations=50):
+        self.max_units = max_units
+        self.max_features = max_features
+        self.redundancy = redundancy
+        self.duplicate = duplicate
+        self.damping = damping
+        self.iterations = iterations
+
+    def _units(self, transcript):
+        sentences = TranscriptProcessor.split_sentences(transcript)
+        per_unit = -(-len(sentences) // self.max_units)
+        return [" ".join(sentences[i:i + per_unit]) for i in range(0, len(sentences), per_unit)]
+
+    def _tfidf(self, units):
+        """
+        Return the L2-normalized TF-IDF matrix (units × features) as float32.
+        """
+        counts = [Counter(WORD.findall(unit.lower())) for unit in units]
+        document_frequency = Counter(word for count in counts for word in count)
+        vocabulary = {word: i for i, (word, _) in enumerate(document_frequency.most_common(self.max_features))}
+        matrix = np.zeros((len(units), len(vocabulary)), dtype=np.float32)
+        for row, count in enumerate(counts):
+            columns = [vocabulary[word] for word in count if word in vocabulary]
+            matrix[row, columns] = [count[word] for word in count if word in vocabulary]
+        idf = np.log((1 + len(units)) / (1 + np.array([document_frequency[word] for word in vocabulary],
+                                                          dtype=np.float32))) + 1
+        matrix = np.log1p(matrix) * idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def _textrank(self, similarity):
+        n = len(similarity)
+        weights = similarity.copy()
+        np.fill_diagonal(weights, 0)
+        totals = weights.sum(axis=1, keepdims=True)
+        # Rows without any similar unit link to every unit instead
+        transition = np.where(totals > 0, weights / np.where(totals == 0, 1, totals), 1.0 / n)
+        scores = np.full(n, 1.0 / n, dtype=np.float32)
+        for _ in range(self.iterations):
+            updated = (1 - self.damping) / n + self.damping * (transition.T @ scores)
+            if np.abs(updated - scores).sum() < 1e-6:
+                return updated
+            scores = updated
+        return scores
+
+    def compress(self, transcript, target_tokens):
+        """
+        Return a CompressionResult whose text fits target_tokens (the transcript
+        itself when it already fits).
+        """
+        tokens_before = estimate_tokens(transcript)
+        units = self._units(transcript) if tokens_before > target_tokens else []
+        if len(units) < 2:
+            return CompressionResult(transcript, tokens_before, tokens_before, len(units), len(units))
+
+        matrix = self._tfidf(units)
+        similarity = matrix @ matrix.T
+        scores = self._textrank(similarity)
+
+        # First pass skips units similar to kept ones; if that leaves budget unused (a
+        # repetitive transcript), a second pass only skips near-exact duplicates
+        kept, budget = [], target_tokens
+        ranked = np.argsort(-scores)
+        for threshold in (self.redundancy, self.duplicate):
+            for index in ranked:
+                cost = estimate_tokens(units[index]) + 1
+                if cost > budget or index in kept:
+                    continue
+                if kept and similarity[index, kept].max() > threshold:
+                    continue
+                kept.append(index)
+                budget -= cost
+
+        text = " ".join(units[index] for index in sorted(kept))
+        return CompressionResult(text, tokens_before, estimate_tokens(text), len(units), len(kept))
@@ -0,0 +1,385 @@
+import asyncio
+import itertools
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from cache import SummaryCache, TranscriptCache
+from clients.ollama_client import ollama_stats
+from models import LLMOption
+from summary.batch import BatchSummarizer, TranscriberPool
+from telemetry import enable_tracing
+from video.backends import BackendSpec
+from video.preprocessing import AudioPreprocessing, preprocessing_stats
+from video.subtitles import subtitle_stats
+
+DEFAULT_SERVICE_ADDRESS = "127.0.0.1:8080"
+VIDEO_URL = re.compile(r"^https?://(?:www\.)?youtube\.com/watch\?v=([\w-]+)$")
+MAX_BODY_BYTES = 64 * 1024
+# A summary language is a name such as "english" or "brazilian portuguese", or a code such as "pt-br"
+LANGUAGE = re.compile(r"^[^\W\d_]+(?:[ -][^\W\d_]+){0,2}$")
+MAX_LANGUAGE_CHARS = 32
+# (model, language) pipelines kept; the least recently used one is dropped beyond that
+MAX_PIPELINES = 16
+HTTP_STATUS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class SummaryJob:
+    """
+    A summarize request and its progress. Requests for the same video, model and
+    language that arrive while it is queued or running share this job.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, job_id, key, url, llm: LLMOption, language):
+        self.id = job_id
+        self.key = key
+        self.url = url
+        self.llm = llm
+        self.language = language
+        self.status = self.QUEUED
+        self.stage = None
+        self.requests = 1
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.subscribers = []
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "url": self.url,
+            "llm": self.llm.name,
+            "language": self.language,
+            "status": self.status,
+            "stage": self.stage,
+            "requests": self.requests,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+class SummaryService:
+    """
+    HTTP front end for summarization, so the pipeline can be used without the
+    interactive prompts.
+
+    POST /summaries {"url", "llm", "language"} queues a job and answers 202 with it.
+    Jobs run on `workers` threads through the same stages as batch mode; at most
+    max_queue jobs wait, beyond that new jobs get 503 with Retry-After. Requests for
+    a video/model/language that is already queued or running join that job instead
+    of starting another one. Results are read by polling GET /summaries/<id> or by
+    following GET /summaries/<id>/events (server-sent events). GET /stats reports
+    queue depth and counters, GET /metrics the same plus the span metrics in the
+    Prometheus format, and GET /report the recent spans as JSON.
+
+    Jobs run in one pipeline per model and language (the last MAX_PIPELINES are
+    kept), and every pipeline shares one TranscriberPool, so at most
+    transcribe_workers jobs transcribe, and as many models are loaded, in total.
+    """
+
+    def __init__(self, address=DEFAULT_SERVICE_ADDRESS, workers=2, max_queue=32, transcribe_workers=1,
+                 cache: TranscriptCache = None, summary_cache: SummaryCache = None, job_ttl=3600,
+                 transcription_server=None, whisper_workers=1, stream_audio=False, compress=False,
+                 whisper_model="turbo", whisper_backend: BackendSpec = None,
+                 audio_preprocessing: AudioPreprocessing = None):
+        host, _, port = address.rpartition(":")
+        self.host = host or "127.0.0.1"
+        self.port = int(port)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.transcribe_workers = transcribe_workers
+        self.cache = cache
+        self.summary_cache = summary_cache
+        self.job_ttl = job_ttl
+        self.transcription_server = transcription_server
+        self.whisper_workers = whisper_workers
+        self.whisper_model = whisper_model
+        self.whisper_backend = whisper_backend
+        self.audio_preprocessing = audio_preprocessing
+        self.stream_audio = stream_audio
+        self.compress = compress
+        self.jobs = {}
+        # Queued or running job per (video, model, language), for coalescing
+        self.active = {}
+        self.pipelines = OrderedDict()
+        self.transcribers = TranscriberPool(transcribe_workers)
+        self.ids = itertools.count(1)
+        self.queue = None
+        self.loop = None
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="service")
+        self.counters = {"submitted": 0, "coalesced": 0, "rejected": 0, "completed": 0, "failed": 0}
+        # Keeps the last spans for GET /report; the metrics aggregate every span
+        self.tracer = enable_tracing(max_spans=2000)
+
+    def _pipeline(self, llm: LLMOption, language):
+        # One pipeline (LLM client, Summarizer) per model and language, shared by its jobs; running jobs keep
+        # a dropped pipeline alive until they finish
+        key = (llm, language)
+        if key in self.pipelines:
+            self.pipelines.move_to_end(key)
+        else:
+            while len(self.pipelines) >= MAX_PIPELINES:
+                self.pipelines.popitem(last=False)
+            self.pipelines[key] = BatchSummarizer(llm, language, transcribe_workers=self.transcribe_workers,
+                                                  transcribers=self.transcribers,
+                                                  cache=self.cache, summary_cache=self.summary_cache,
+                                                  transcription_server=self.transcription_server,
+                                                  whisper_workers=self.whisper_workers,
+                                                  whisper_model=self.whisper_model,
+                                                  whisper_backend=self.whisper_backend,
+                                                  audio_preprocessing=self.audio_preprocessing,
+                                                  stream_audio=self.stream_audio,
+                                                  compress=self.compress)
+        return self.pipelines[key]
+
+    def _prune(self):
+        cutoff = time.time() - self.job_ttl
+        for job_id in [job.id for job in self.jobs.values() if job.finished and job.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def submit(self, url, llm: LLMOption, language):
+        """
+        Queue a job, or join the queued/running job for the same video, model and language.
+        Returns (job, coalesced); job is None when the queue is full.
+        """
+        self._prune()
+        key = (VIDEO_URL.match(url).group(1), llm.name, language)
+        job = self.active.get(key)
+        if job is not None:
+            job.requests += 1
+            self.counters["coalesced"] += 1
+            return job, True
+        if self.queue.full():
+            self.counters["rejected"] += 1
+            return None, False
+
+        job = SummaryJob(str(next(self.ids)), key, url, llm, language)
+        self.jobs[job.id] = job
+        self.active[key] = job
+        self.counters["submitted"] += 1
+        self.queue.put_nowait(job)
+        return job, False
+
+    def _publish(self, job: SummaryJob):
+        event = job.to_dict()
+        for subscriber in job.subscribers:
+            subscriber.put_nowait(event)
+
+    def _set_stage(self, job: SummaryJob, stage):
+        job.stage = stage
+        self._publish(job)
+
+    def _run(self, job: SummaryJob, pipeline: BatchSummarizer):
+        """
+        Run a job in a worker thread and return its result dict. Raises RuntimeError on failure.
+        """
+        video_job = pipeline.make_job(int(job.id), job.url)
+        on_stage = lambda stage: self.loop.call_soon_threadsafe(self._set_stage, job, stage)
+        if not pipeline.run_job(video_job, on_stage=on_stage):
+            raise RuntimeError(video_job.error or "no summary")
+        video = video_job.video
+        return {
+            "video_id": video.video_id,
+            "title": video.video_title,
+            "duration": video.video_length_seconds,
+            "transcript_source": video_job.transcript_source,
+            "summary": video.summary,
+            "stage_times": video_job.stage_times,
+        }
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            job.status = SummaryJob.RUNNING
+            self._publish(job)
+            try:
+                pipeline = self._pipeline(job.llm, job.language)
+                job.result = await self.loop.run_in_executor(self.executor, self._run, job, pipeline)
+                job.status = SummaryJob.DONE
+                self.counters["completed"] += 1
+            except Exception as e:
+                job.error = str(e)
+                job.status = SummaryJob.FAILED
+                self.counters["failed"] += 1
+            job.finished = time.time()
+            job.stage = None
+            self.active.pop(job.key, None)
+            self._publish(job)
+            self.queue.task_done()
+
+    def stats(self):
+        routers = [pipeline.summarizer.client for (llm, _), pipeline in self.pipelines.items() if llm == LLMOption.AUTO]
+        return {
+            **self.counters,
+            "router": routers[0].stats() if routers else None,
+            "subtitles": subtitle_stats(),
+            "preprocessing": preprocessing_stats(),
+            "ollama": ollama_stats(),
+            "queued": self.queue.qsize(),
+            "running": sum(1 for job in self.active.values() if job.status == SummaryJob.RUNNING),
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "jobs": len(self.jobs),
+        }
+
+    def metrics(self):
+        """
+        Return the span metrics plus the service counters in the Prometheus text format.
+        """
+        stats = self.stats()
+        lines = ["# HELP yt_tldr_service_jobs_total Summarize requests by outcome",
+                 "# TYPE yt_tldr_service_jobs_total counter"]
+        lines += [f'yt_tldr_service_jobs_total{{outcome="{name}"}} {self.counters[name]}' for name in self.counters]
+        for name, help_text in (("queued", "Jobs waiting for a worker"), ("running", "Jobs being processed")):
+            lines += [f"# HELP yt_tldr_service_{name} {help_text}", f"# TYPE yt_tldr_service_{name} gauge",
+                      f"yt_tldr_service_{name} {stats[name]}"]
+        return self.tracer.prometheus() + "\n".join(lines) + "\n"
+
+    # HTTP
+
+    @staticmethod
+    async def _send(writer, status, payload=None, headers=None, content_type="application/json"):
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+        else:
+            body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        head = [f"HTTP/1.1 {status} {HTTP_STATUS[status]}", f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}", "Connection: close"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _events(self, writer, job: SummaryJob, keepalive=15):
+        """
+        Stream the job's state as server-sent events until it finishes.
+        """
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        updates = asyncio.Queue()
+        job.subscribers.append(updates)
+        try:
+            event = job.to_dict()
+            while True:
+                writer.write(f"event: {event['status']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                await writer.drain()
+                if event["status"] in (SummaryJob.DONE, SummaryJob.FAILED):
+                    return
+                try:
+                    event = await asyncio.wait_for(updates.get(), keepalive)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                    await writer.drain()
+                    event = job.to_dict()
+        finally:
+            job.subscribers.remove(updates)
+
+    def _parse_submission(self, body):
+        """
+        Validate a POST /summaries body. Returns (url, llm, language) or raises ValueError.
+        """
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise ValueError("body must be JSON")
+        if not isinstance(data, dict):
+            raise ValueError("body must be a JSON object")
+        url = str(data.get("url", "")).strip()
+        if not VIDEO_URL.match(url):
+            raise ValueError("url must be a YouTube watch link")
+        llm = LLMOption.from_name(str(data.get("llm", "OLLAMA")).upper())
+        if llm is None:
+            raise ValueError(f"llm must be one of {', '.join(option.name for option in LLMOption)}")
+        language = " ".join(str(data.get("language", "english")).lower().split()) or "english"
+        if len(language) > MAX_LANGUAGE_CHARS or not LANGUAGE.match(language):
+            raise ValueError("language must be a language name or code, such as english or pt-br")
+        return url, llm, language
+
+    async def _route(self, method, path, body, writer):
+        parts = [part for part in urlsplit(path).path.split("/") if part]
+        if parts == ["stats"] and method == "GET":
+            return await self._send(writer, 200, self.stats())
+        if parts == ["metrics"] and method == "GET":
+            return await self._send(writer, 200, self.metrics(), content_type="text/plain; version=0.0.4")
+        if parts == ["report"] and method == "GET":
+            return await self._send(writer, 200, self.tracer.report())
+        if parts == ["summaries"]:
+            if method != "POST":
+                return await self._send(writer, 405, {"error": "use POST"})
+            try:
+                url, llm, language = self._parse_submission(body)
+                job, coalesced = self.submit(url, llm, language)
+            except ValueError as e:
+                return await self._send(writer, 400, {"error": str(e)})
+            if job is None:
+                return await self._send(writer, 503, {"error": "queue full"}, headers={"Retry-After": "10"})
+            return await self._send(writer, 202, {"coalesced": coalesced, "job": job.to_dict()},
+                                    headers={"Location": f"/summaries/{job.id}"})
+        if len(parts) in (2, 3) and parts[0] == "summaries" and method == "GET":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return await self._send(writer, 404, {"error": "unknown job"})
+            if len(parts) == 2:
+                return await self._send(writer, 200, job.to_dict())
+            if parts[2] == "events":
+                return await self._events(writer, job)
+        return await self._send(writer, 404, {"error": "not found"})
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) != 3:
+                return await self._send(writer, 400, {"error": "malformed request"})
+            length = headers.get("content-length") or "0"
+            if not (length.isascii() and length.isdigit()):
+                return await self._send(writer, 400, {"error": "invalid Content-Length"})
+            length = int(length)
+            if length > MAX_BODY_BYTES:
+                return await self._send(writer, 413, {"error": "body too large"})
+            body = await reader.readexactly(length) if length else b""
+            await self._route(request_line[0].upper(), request_line[1], body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logging.debug("Dropped connection: %s", e)
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        logging.info("Summary service listening on http://%s:%d (%d workers, queue of %d)",
+                     self.host, self.port, self.workers, self.max_queue)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.transcribers.close()
+
+    def serve_forever(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            logging.info("Summary service stopped")
@@ -1,28 +1,54 @@
+import json
 import logging
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
 
 from rich import box
 from rich.console import Console
-from rich.markdown import Markdown
+from rich.live import Live
 from rich.panel import Panel
 from rich.table import Table
 
-from clients import OllamaClient, OpenAIClient, AnthropicClient, GeminiClient
-from models import LLMOption
+from cache import SummaryCache, TranscriptCache, WorkspaceStore
+from clients import (OllamaClient, OpenAIClient, AnthropicClient, GeminiClient, CachedClient, StreamInterrupted,
+                     get_router)
+from models import LLMOption, get_provider_limits
+from summary.chunking import TranscriptChunker
+from summary.tokens import estimate_tokens
+from telemetry import current_span, span, stream_span
 from video.audio import AudioDownloader
+from video.backends import BackendSpec, Segment
+from video.extractor import VideoExtractor, video_id_from_url
 from video.info import VideoInfoRetriever
+from video.preprocessing import AudioPreprocessing
 from video.subtitles import SubtitleManager
 from video.transcription import TranscriptProcessor, Transcriber
+from video.transcription_service import RemoteTranscriber
 
 console = Console()
 
+# Format URLs in a saved info dict expire after about six hours
+INFO_MAX_AGE = 3 * 3600
+
 
 class Summarizer:
-    def __init__(self, llm_option: LLMOption, language: str):
+    def __init__(self, llm_option: LLMOption, language: str, cache: SummaryCache = None, bypass_cache=False,
+                 compress=False):
         self.llm_option = llm_option
         self.client = self.get_client(llm_option)
+        # The router's budgets fit every provider it may pick; Ollama's follow its context size
+        self.limits = getattr(self.client, "limits", None) or get_provider_limits(llm_option)
+        if cache is not None:
+            self.client = CachedClient(self.client, cache, provider=llm_option.name, bypass=bypass_cache)
         self.llm_name = self.get_llm_name()
         self.language = language
+        self.compress = compress
+        self.compression = {"transcripts": 0, "tokens_before": 0, "tokens_after": 0, "cost_saved": 0.0}
+        self._compression_lock = threading.Lock()
 
     @staticmethod
     def get_client(llm_option: LLMOption):
@@ -33,15 +59,20 @@ class Summarizer:
         elif llm_option == LLMOption.GEMINI:
             return GeminiClient()
         elif llm_option == LLMOption.OLLAMA:
-            return OllamaClient()
+            client = OllamaClient()
+            # The model loads while the video is fetched and transcribed
+            client.preload()
+            return client
+        elif llm_option == LLMOption.AUTO:
+            return get_router()
         else:
             raise ValueError(f"Invalid LLM client: {llm_option}")
 
     def get_llm_name(self):
         return self.llm_option.value
 
-    def summarize(self, title, transcript):
-        prompt_template = f"""
+    def summary_prompt(self, title, transcript):
+        return f"""
         Please summarize the following transcript of the video named '{title}' and provide the summary in {self.language}:
 
         Transcript:
@@ -49,8 +80,160 @@ class Summarizer:
 
         Summary (in {self.language}):
         """
-        prompt = prompt_template.format(transcript=transcript)
-        return self.client.chat(prompt)
+
+    def chunk_prompt(self, title, chunk, index, total):
+        return f"""
+        The following is part {index} of {total} of the transcript of the video named '{title}'.
+        Please summarize this part, keeping every important point, and provide the summary in {self.language}:
+
+        Transcript (part {index} of {total}):
+        {chunk}
+
+        Summary of part {index} (in {self.language}):
+        """
+
+    def combine_prompt(self, title, partial_summaries):
+        parts = "\n\n".join(f"Part {i}:\n{summary}" for i, summary in enumerate(partial_summaries, start=1))
+        return f"""
+        The following are summaries of consecutive parts of the video named '{title}'.
+        Please combine them into a single coherent summary of the whole video in {self.language}:
+
+        {parts}
+
+        Summary (in {self.language}):
+        """
+
+    def compress_transcript(self, transcript):
+        """
+        With compression enabled, keep the most informative sentences of the transcript
+        up to the provider's compressed_tokens budget and record what that saved.
+        """
+        if not self.compress:
+            return transcript
+        # numpy is only needed when compressing
+        from summary.compression import TranscriptCompressor
+
+        limits = self.limits
+        with span("summarize.compress", provider=self.llm_name) as s:
+            result = TranscriptCompressor().compress(transcript, limits.compressed_tokens)
+            cost_saved = result.tokens_saved * limits.input_cost_per_mtok / 1_000_000
+            s.set(tokens_before=result.tokens_before, tokens_after=result.tokens_after, cost_saved_usd=cost_saved)
+        with self._compression_lock:
+            self.compression["transcripts"] += 1
+            self.compression["tokens_before"] += result.tokens_before
+            self.compression["tokens_after"] += result.tokens_after
+            self.compression["cost_saved"] += cost_saved
+        if result.tokens_saved:
+            logging.info("Compressed the transcript from %d to %d tokens (%d of %d passages kept).",
+                         result.tokens_before, result.tokens_after, result.units_after, result.units_before)
+        return result.text
+
+    def compression_summary(self):
+        """
+        One line describing the tokens removed by compression so far, or None if it is off.
+        """
+        if not self.compress:
+            return None
+        with self._compression_lock:
+            stats = dict(self.compression)
+        saved = stats["tokens_before"] - stats["tokens_after"]
+        percent = 100 * saved / stats["tokens_before"] if stats["tokens_before"] else 0
+        return (f"Transcript compression: {stats['tokens_before']:,} → {stats['tokens_after']:,} input tokens "
+                f"(-{percent:.0f}%), about ${stats['cost_saved']:.4f} saved")
+
+    def final_prompt(self, title, transcript):
+        """
+        Return the prompt whose answer is the video summary. Long transcripts are first
+        compressed (if enabled), then map-reduced into partial summaries so that the final
+        prompt fits the provider budget. Returns None if summarizing any of the parts failed.
+        """
+        transcript = self.compress_transcript(transcript)
+        limits = self.limits
+        if estimate_tokens(transcript) <= limits.chunk_tokens:
+            return self.summary_prompt(title, transcript)
+
+        with span("summarize.map_reduce", provider=self.llm_name):
+            return self._map_reduce(title, transcript, limits)
+
+    def _map_reduce(self, title, transcript, limits):
+        # Map: summarize budget-sized chunks concurrently
+        chunks = TranscriptChunker(limits.chunk_tokens, limits.overlap_tokens).chunk(transcript)
+        logging.info("Transcript too long for a single request; summarizing %d chunks.", len(chunks))
+        current_span().set(chunks=len(chunks))
+        prompts = [self.chunk_prompt(title, chunk, i, len(chunks)) for i, chunk in enumerate(chunks, start=1)]
+        partial_summaries = self._chat_all(prompts, limits.max_concurrency)
+        if partial_summaries is None:
+            return None
+
+        # Reduce: combine the partial summaries, in several rounds if they still don't fit
+        while estimate_tokens("\n\n".join(partial_summaries)) > limits.chunk_tokens and len(partial_summaries) > 1:
+            groups = self._group(partial_summaries, limits.chunk_tokens)
+            if len(groups) == len(partial_summaries):
+                # Every summary fills a request on its own: combining in pairs is the only way forward
+                groups = [partial_summaries[i:i + 2] for i in range(0, len(partial_summaries), 2)]
+            logging.info("Combining %d partial summaries into %d.", len(partial_summaries), len(groups))
+            current_span().add(reduce_rounds=1)
+            partial_summaries = self._chat_all([self.combine_prompt(title, group) for group in groups],
+                                               limits.max_concurrency)
+            if partial_summaries is None:
+                return None
+
+        return self.combine_prompt(title, partial_summaries)
+
+    def summarize(self, title, transcript):
+        with span("summarize", provider=self.llm_name, transcript_chars=len(transcript),
+                  transcript_tokens=estimate_tokens(transcript)) as s:
+            prompt = self.final_prompt(title, transcript)
+            if prompt is None:
+                s.fail("map-reduce failed")
+                return None
+            summary = self.client.chat(prompt)
+            if summary:
+                s.set(summary_tokens=estimate_tokens(summary))
+            return summary
+
+    def summarize_stream(self, title, transcript):
+        """
+        Yield the summary text as the LLM streams it. Only the final request is
+        streamed; the map-reduce steps of long transcripts run before it.
+        """
+        with stream_span("summarize", provider=self.llm_name, transcript_chars=len(transcript),
+                         transcript_tokens=estimate_tokens(transcript)) as s:
+            prompt = self.final_prompt(title, transcript)
+            if prompt is None:
+                s.fail("map-reduce failed")
+                return
+            chars = 0
+            for token in self.client.stream(prompt):
+                chars += len(token)
+                yield token
+            s.set(summary_tokens=(chars + 3) // 4)
+
+    def _chat_all(self, prompts, max_concurrency):
+        """
+        Send the prompts concurrently and return the answers in order, or None if any failed.
+        """
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            answers = list(pool.map(self.client.chat, prompts))
+        if not all(answers):
+            logging.error("Failed to summarize %d of %d transcript parts.",
+                          sum(1 for answer in answers if not answer), len(answers))
+            return None
+        return answers
+
+    @staticmethod
+    def _group(summaries, max_tokens):
+        groups, current, size = [], [], 0
+        for summary in summaries:
+            cost = estimate_tokens(summary)
+            if current and size + cost > max_tokens:
+                groups.append(current)
+                current, size = [], 0
+            current.append(summary)
+            size += cost
+        if current:
+            groups.append(current)
+        return groups
 
 
 class YouTubeSummarizer:
@@ -60,59 +243,295 @@ class YouTubeSummarizer:
     - Attempts to get subtitles, else downloads audio and transcribes
     - Summarizes transcript
     - Calculates time saved
+
+    With a WorkspaceStore, the artifacts of every stage (info JSON, subtitles, audio,
+    transcript, summary) are kept in the video's workspace instead of a temporary
+    directory, and stages completed by an earlier run are skipped.
     """
 
-    def __init__(self, youtube_url: str, llm: LLMOption, language: str):
+    def __init__(self, youtube_url: str, llm: LLMOption, language: str, summarizer: Summarizer = None,
+                 cache: TranscriptCache = None, whisper_model="turbo", transcription_server=None,
+                 whisper_workers=1, stream_audio=False, workspaces: WorkspaceStore = None,
+                 whisper_backend: BackendSpec = None, audio_preprocessing: AudioPreprocessing = None):
         self.youtube_url = youtube_url
-        self.summarizer = Summarizer(llm_option=llm, language=language)
+        # One in-process extraction shared by the info, subtitle and audio steps
+        self.extractor = VideoExtractor(youtube_url)
+        self.summarizer = summarizer or Summarizer(llm_option=llm, language=language)
+        self.cache = cache
+        self.whisper_model = whisper_model
+        self.transcription_server = transcription_server
+        self.whisper_workers = whisper_workers
+        self.whisper_backend = whisper_backend
+        self.audio_preprocessing = audio_preprocessing or AudioPreprocessing()
+        # Streaming needs a local model; the transcription service only accepts files
+        self.stream_audio = stream_audio and not transcription_server
+        self.video_id = None
         self.video_title = None
         self.video_length_seconds = None
+        self.subtitle_track = None
         self.transcript = None
+        # Timed segments of a speech-to-text transcript, in seconds of the original video
+        self.segments = None
         self.summary = None
+        self.workspaces = workspaces
+        self._workspace = None
+        self._workspace_id = video_id_from_url(youtube_url)
+
+    @property
+    def workspace(self):
+        # Opened (and its directory created) on first use, so a run that never reaches a stage leaves nothing behind
+        if self._workspace is None and self.workspaces is not None and self._workspace_id:
+            self._workspace = self.workspaces.get(self._workspace_id)
+        return self._workspace
+
+    def open_workspace(self, video_id):
+        if self._workspace_id is None:
+            self._workspace_id = video_id
+        return self.workspace
+
+    @contextmanager
+    def workdir(self):
+        """
+        Working directory of a run: the video's workspace when resuming, else a temporary directory.
+        """
+        if self.workspace is not None:
+            yield str(self.workspace.path)
+        else:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                yield tmpdir
+
+    def _in_workspace(self, path):
+        return self.workspace is not None and path and Path(path).parent == self.workspace.path
+
+    def fetch_info(self):
+        """
+        Retrieve the video metadata and remember its id, title and duration.
+        Returns the info dict or None on error.
+        """
+        workspace = self.workspace
+        record = workspace.completed("info") if workspace is not None else None
+        # The saved info is reused while its format URLs are fresh, or when nothing needs downloading anymore
+        if record and (time.time() - record["completed_at"] < INFO_MAX_AGE or workspace.completed("transcript")):
+            video_info = json.loads(workspace.read_text("info.json"))
+            self.extractor.use_info(video_info)
+        else:
+            video_info = VideoInfoRetriever(self.youtube_url, extractor=self.extractor).get_video_info()
+            if video_info is None:
+                return None
+            workspace = self.open_workspace(video_info.get("id"))
+            if workspace is not None and self.extractor.write_info_json(workspace.file("info.json")):
+                workspace.complete("info", ["info.json"])
+        self.video_id = video_info.get("id")
+        self.video_length_seconds = video_info.get("duration", 0)
+        self.video_title = video_info.get("title", "Unknown")
+        return video_info
+
+    def fetch_subtitles(self, workdir):
+        """
+        Download the best caption track for the summary language into workdir and turn
+        it into the transcript. Returns the transcript, or None if the video has no usable subtitles.
+        """
+        subtitle_manager = SubtitleManager(self.youtube_url, workdir, extractor=self.extractor,
+                                           language=self.summarizer.language)
+        self.transcript = TranscriptProcessor.from_subtitles(subtitle_manager, self.video_id, self.cache)
+        if self.transcript:
+            self.subtitle_track = subtitle_manager.track
+            self.checkpoint_transcript(self.subtitle_track.source)
+        return self.transcript
+
+    def fetch_cached_transcription(self):
+        """
+        Return a Whisper transcript of this video from the transcript cache, if any,
+        so that the audio does not need to be downloaded again.
+        """
+        if self.cache is None:
+            return None
+        self.transcript = self.cache.get(self.video_id, self.whisper_source)
+        return self.transcript
+
+    def resume_transcript(self):
+        """
+        Return the transcript saved in the workspace by an earlier run, if any.
+        """
+        record = self.workspace.completed("transcript") if self.workspace is not None else None
+        if record is None:
+            return None
+        self.transcript = self.workspace.read_text("transcript.txt")
+        if "segments.json" in record["files"]:
+            self.segments = [Segment(**segment) for segment in json.loads(self.workspace.read_text("segments.json"))]
+        return self.transcript
+
+    def checkpoint_transcript(self, source):
+        if self.workspace is not None and self.transcript:
+            files = [self.workspace.write_text("transcript.txt", self.transcript)]
+            if self.segments:
+                files.append(self.workspace.write_text(
+                    "segments.json", json.dumps([segment.to_dict() for segment in self.segments], indent=1)))
+            self.workspace.complete("transcript", files, source=source)
+
+    def resume_summary(self):
+        """
+        Return the summary saved in the workspace by an earlier run with the same model and language, if any.
+        """
+        record = self.workspace.completed("summary") if self.workspace is not None else None
+        if record is None or record["data"] != self._summary_settings():
+            return None
+        self.summary = self.workspace.read_text("summary.md")
+        return self.summary
+
+    def checkpoint_summary(self):
+        if self.workspace is not None and self.summary:
+            self.workspace.write_text("summary.md", self.summary)
+            self.workspace.complete("summary", ["summary.md"], **self._summary_settings())
+
+    def _summary_settings(self):
+        return {"llm": self.summarizer.llm_name, "language": self.summarizer.language,
+                "compress": self.summarizer.compress}
+
+    def download_audio(self, workdir, show_progress=True):
+        """
+        Download the audio into workdir, or reuse the audio an earlier run saved in the workspace.
+        """
+        record = self.workspace.completed("audio") if self.workspace is not None else None
+        if record is not None:
+            return str(self.workspace.file(next(iter(record["files"]))))
+        downloader = AudioDownloader(self.youtube_url, workdir, show_progress=show_progress, extractor=self.extractor)
+        audio_file = downloader.download_audio()
+        if self._in_workspace(audio_file):
+            self.workspace.complete("audio", [audio_file])
+        return audio_file
+
+    @property
+    def whisper_source(self):
+        # Transcript cache source of this run's speech-to-text model
+        return Transcriber.cache_source(self.whisper_model, self.whisper_backend, self.audio_preprocessing)
+
+    def make_transcriber(self):
+        """
+        Return a transcriber for this run: the resident transcription service when one
+        is configured, otherwise a local model of the selected backend.
+        """
+        if self.transcription_server:
+            return RemoteTranscriber(self.transcription_server, self.whisper_model, cache=self.cache,
+                                     backend=self.whisper_backend, preprocessing=self.audio_preprocessing)
+        return Transcriber(model_name=self.whisper_model, cache=self.cache, workers=self.whisper_workers,
+                           backend=self.whisper_backend, preprocessing=self.audio_preprocessing)
+
+    def transcribe(self, audio_file, transcriber):
+        self.transcript = transcriber.transcribe_with_whisper(audio_file, video_id=self.video_id)
+        self.segments = transcriber.segments
+        self.checkpoint_transcript(self.whisper_source)
+        return self.transcript
+
+    def stream_transcribe(self, workdir, transcriber, show_progress=True):
+        """
+        Transcribe the audio while it downloads, without writing an audio file.
+        """
+        # numpy is only needed on the streaming path; keep it out of the CLI startup
+        from video.audio_stream import AudioStreamer
+        streamer = AudioStreamer(self.youtube_url, workdir, show_progress=show_progress, extractor=self.extractor,
+                                 tempo=self.audio_preprocessing.tempo)
+        self.transcript = transcriber.transcribe_stream(streamer.windows(), video_id=self.video_id)
+        self.segments = transcriber.segments
+        self.checkpoint_transcript(self.whisper_source)
+        return self.transcript
+
+    def summarize(self):
+        self.summary = self.summarizer.summarize(self.video_title, self.transcript)
+        self.checkpoint_summary()
+        return self.summary
+
+    def summary_panel(self, summary):
+        # Markdown rendering pulls in markdown-it; load it only when a summary is shown
+        from rich.markdown import Markdown
+        return Panel(Markdown(f"## {self.video_title}\n\n{summary}"),
+                     title="[bold green]Video Summary[/bold green]",
+                     border_style="green")
+
+    def stream_summary(self):
+        """
+        Summarize while rendering the answer live as the tokens arrive. A stream that
+        breaks off leaves no summary, so the partial text is not checkpointed.
+        """
+        tokens = []
+        try:
+            with Live(self.summary_panel("…"), console=console, refresh_per_second=10,
+                      vertical_overflow="visible") as live:
+                for token in self.summarizer.summarize_stream(self.video_title, self.transcript):
+                    tokens.append(token)
+                    live.update(self.summary_panel("".join(tokens)))
+        except StreamInterrupted as e:
+            logging.error("The summary stream was interrupted: %s", e)
+            self.summary = None
+            return None
+        self.summary = "".join(tokens).strip() or None
+        self.checkpoint_summary()
+        return self.summary
+
+    def fetch_transcript(self, workdir):
+        """
+        Get the transcript from subtitles, the transcript cache or Whisper, reporting
+        each step. Returns True on success.
+        """
+        console.print("[bold cyan]\nChecking for subtitles...[/bold cyan]")
+        # Try to get subtitles
+        if self.fetch_subtitles(workdir):
+            console.print(f"[green]Subtitles found ({self.subtitle_track.kind} captions, "
+                          f"{self.subtitle_track.language})! Transcript extracted.[/green]")
+        elif self.fetch_cached_transcription():
+            console.print("[green]Found a cached transcription of this video.[/green]")
+        elif self.stream_audio:
+            console.print("[yellow]No subtitles found. Streaming audio into Whisper...[/yellow]")
+            with self.make_transcriber() as transcriber:
+                transcript = self.stream_transcribe(workdir, transcriber)
+            if not transcript:
+                logging.error("Failed to transcribe audio.")
+                console.print("[red]Error: Failed to transcribe the audio stream.[/red]")
+                return False
+        else:
+            console.print("[yellow]No subtitles found. Downloading audio and transcribing...[/yellow]")
+            audio_file = self.download_audio(workdir)
+            if not audio_file:
+                logging.error("Failed to download audio.")
+                console.print("[red]Error: Failed to download audio.[/red]")
+                return False
+
+            with self.make_transcriber() as transcriber:
+                transcript = self.transcribe(audio_file, transcriber)
+            if not transcript:
+                logging.error("Failed to transcribe audio.")
+                console.print("[red]Error: Failed to transcribe audio.[/red]")
+                return False
+        return True
 
     def run(self):
-        # Create a temporary working directory
-        with tempfile.TemporaryDirectory() as tmpdir:
+        # Work in the video's workspace when resuming, else in a temporary directory
+        with self.workdir() as workdir:
             console.print("[bold cyan]\nFetching video information...[/bold cyan]")
             # Get video info
-            info = VideoInfoRetriever(self.youtube_url)
-            video_info = info.get_video_info()
-            self.video_length_seconds = video_info.get("duration", 0)
-            self.video_title = video_info.get("title", "Unknown")
-
-            console.print("[bold cyan]\nChecking for subtitles...[/bold cyan]")
-            # Try to get subtitles
-            subtitle_manager = SubtitleManager(self.youtube_url, tmpdir)
-            subtitle_file = subtitle_manager.check_and_download_subtitles()
-
-            if subtitle_file:
-                console.print("[green]Subtitles found! Extracting text...[/green]")
-                self.transcript = TranscriptProcessor.vtt_to_text(subtitle_file)
-            else:
-                console.print("[yellow]No subtitles found. Downloading audio and transcribing...[/yellow]")
-                audio_downloader = AudioDownloader(self.youtube_url, tmpdir)
-                audio_file = audio_downloader.download_audio()
-                if not audio_file:
-                    logging.error("Failed to download audio.")
-                    console.print("[red]Error: Failed to download audio.[/red]")
-                    return
-
-                transcriber = Transcriber(model_name="turbo")
-                self.transcript = transcriber.transcribe_with_whisper(audio_file)
-                if not self.transcript:
-                    logging.error("Failed to transcribe audio.")
-                    console.print("[red]Error: Failed to transcribe audio.[/red]")
-                    return
+            if self.fetch_info() is None:
+                console.print("[red]Error: Failed to retrieve video information.[/red]")
+                return
+
+            if self.resume_summary():
+                console.print("[green]Found the summary of an earlier run.[/green]")
+                console.print(self.summary_panel(self.summary))
+                self.calculate_time_saved()
+                return
+
+            if self.resume_transcript():
+                console.print("[green]Resuming with the transcript of an earlier run.[/green]")
+            elif not self.fetch_transcript(workdir):
+                return
 
             logging.debug("Transcript: %s", self.transcript)
 
             console.print(f"[bold cyan]\nSummarizing transcript with {self.summarizer.llm_name}...[/bold cyan]")
-            self.summary = self.summarizer.summarize(self.video_title, self.transcript)
+            self.stream_summary()
 
             if self.summary:
-                console.print(Panel(Markdown(f"## {self.video_title}\n\n{self.summary}"),
-                                    title="[bold green]Video Summary[/bold green]",
-                                    border_style="green"))
+                if self.summarizer.compress:
+                    console.print(self.summarizer.compression_summary())
                 self.calculate_time_saved()
             else:
                 logging.error("Failed to summarize.")
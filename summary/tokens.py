@@ -0,0 +1,6 @@
+def estimate_tokens(text):
+    """
+    Rough token count for budgeting prompts: about four characters per token
+    for English text with the tokenizers used by the supported providers.
+    """
+    return (len(text) + 3) // 4
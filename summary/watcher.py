@@ -0,0 +1,222 @@
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from rich.console import Console
+
+from cache.store import SQLiteStore, default_state_dir
+from telemetry import span
+from video.extractor import VideoExtractor
+from video.feeds import FeedReader
+
+console = Console()
+
+CHANNEL_URL = re.compile(r"^(https?://(www\.)?youtube\.com/(@[\w.-]+|channel/[\w-]+|c/[\w.-]+|user/[\w.-]+))"
+                         r"(/(videos|streams|shorts))?/?$")
+
+
+class WatchState(SQLiteStore):
+    """
+    Persistent watch list: the watched channels and playlists with the validators of
+    their last feed answer, and every video seen on them with its processing status
+    ("new", "done", "failed", or "skipped" for uploads that predate the watch).
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sources (
+        url TEXT PRIMARY KEY,
+        feed TEXT,
+        etag TEXT,
+        last_modified TEXT,
+        scanned_at REAL,
+        polled_at REAL,
+        error TEXT
+    );
+    CREATE TABLE IF NOT EXISTS videos (
+        video_id TEXT PRIMARY KEY,
+        source TEXT NOT NULL,
+        title TEXT,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        first_seen REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS videos_status ON videos (status);
+    """
+
+    def __init__(self, path=None):
+        path = Path(path) if path else default_state_dir() / "watch.sqlite3"
+        super().__init__(path.parent, path.name)
+
+    def add_sources(self, urls):
+        with self.connect() as db:
+            db.executemany("INSERT OR IGNORE INTO sources (url) VALUES (?)", [(url,) for url in urls])
+
+    def sources(self):
+        with self.connect() as db:
+            cursor = db.execute("SELECT * FROM sources ORDER BY url")
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+
+    def save_polls(self, polls):
+        """
+        Store the outcome of polling sources in one transaction. polls are
+        (source url, source fields to update, entries, status of the unseen entries) tuples.
+        Returns the number of entries not seen before with status "new".
+        """
+        now = time.time()
+        new = 0
+        with self.connect() as db:
+            for url, fields, entries, status in polls:
+                before = db.total_changes
+                db.executemany("INSERT OR IGNORE INTO videos (video_id, source, title, status, first_seen, updated_at) "
+                               "VALUES (?, ?, ?, ?, ?, ?)",
+                               [(entry["id"], url, entry.get("title"), status, now, now) for entry in entries])
+                if status == "new":
+                    new += db.total_changes - before
+                columns = ", ".join(f"{name} = ?" for name in fields)
+                db.execute(f"UPDATE sources SET {columns} WHERE url = ?", (*fields.values(), url))
+        return new
+
+    def pending(self, max_attempts=3):
+        """
+        Return the ids of the new videos and of the failed ones worth another attempt, oldest first.
+        """
+        with self.connect() as db:
+            rows = db.execute("SELECT video_id FROM videos WHERE status = 'new' "
+                              "OR (status = 'failed' AND attempts < ?) ORDER BY first_seen, video_id",
+                              (max_attempts,)).fetchall()
+        return [row[0] for row in rows]
+
+    def finish(self, video_id, error=None):
+        with self.connect() as db:
+            db.execute("UPDATE videos SET status = ?, attempts = attempts + 1, error = ?, updated_at = ? "
+                       "WHERE video_id = ?", ("failed" if error else "done", error, time.time(), video_id))
+
+    def status_counts(self):
+        with self.connect() as db:
+            return dict(db.execute("SELECT status, COUNT(*) FROM videos GROUP BY status"))
+
+
+def flat_url(url):
+    """
+    URL whose flat extraction lists a source's videos: a channel's Videos tab, or the playlist itself.
+    """
+    match = CHANNEL_URL.match(url)
+    if match and not match.group(4):
+        return f"{match.group(1)}/videos"
+    return url
+
+
+def feed_query(url, info):
+    """
+    Feed query of a source from its flat info dict: the playlist id for playlists, else the channel id.
+    """
+    if "list=" in url:
+        return f"playlist_id={info['id']}"
+    channel_id = info.get("channel_id") or info.get("id")
+    return f"channel_id={channel_id}" if channel_id else None
+
+
+class ChannelWatcher:
+    """
+    Summarizes the new uploads of a list of channels and playlists.
+
+    Each poll checks every source in parallel. A source is listed with a flat
+    extraction (one request per page of the listing, no video page) when it is
+    first added and then every full_scan_interval seconds; in between, only its
+    Atom feed is fetched with a conditional GET, so unchanged sources cost a 304.
+    The results of a poll are stored in a single transaction. Newly seen videos, and
+    failed ones below max_attempts, are then summarized by the BatchSummarizer and
+    their status is stored in the WatchState. The uploads already on a source when
+    it is added are marked skipped unless backfill is set.
+    """
+
+    def __init__(self, state: WatchState, batch, interval=900, poll_workers=16, full_scan_interval=24 * 3600,
+                 max_attempts=3, backfill=False, feeds: FeedReader = None):
+        self.state = state
+        self.batch = batch
+        self.interval = interval
+        self.poll_workers = poll_workers
+        self.full_scan_interval = full_scan_interval
+        self.max_attempts = max_attempts
+        self.backfill = backfill
+        self.feeds = feeds or FeedReader(pool_size=poll_workers)
+
+    def add(self, urls):
+        self.state.add_sources(urls)
+
+    def poll_source(self, source):
+        """
+        Check one source for new videos without touching the state. Returns the outcome
+        ("scanned", "modified", "not_modified" or "error") and the save_polls tuple.
+        """
+        url, now = source["url"], time.time()
+        with span("watch.poll") as s:
+            if source["feed"] is None or now - (source["scanned_at"] or 0) > self.full_scan_interval:
+                info = VideoExtractor.extract_flat(flat_url(url))
+                if info is not None:
+                    entries = [entry for entry in info.get("entries") or [] if entry.get("id")]
+                    status = "skipped" if source["scanned_at"] is None and not self.backfill else "new"
+                    s.set(outcome="scanned", entries=len(entries))
+                    return "scanned", (url, {"feed": feed_query(url, info), "scanned_at": now, "polled_at": now,
+                                             "error": None}, entries, status)
+            else:
+                feed = self.feeds.fetch(source["feed"], source["etag"], source["last_modified"])
+                if feed is not None and not feed.modified:
+                    s.set(outcome="not_modified")
+                    return "not_modified", (url, {"polled_at": now, "error": None}, [], "new")
+                if feed is not None:
+                    s.set(outcome="modified", entries=len(feed.entries))
+                    return "modified", (url, {"etag": feed.etag, "last_modified": feed.last_modified,
+                                              "polled_at": now, "error": None}, feed.entries, "new")
+            s.set(outcome="error")
+            s.fail("poll failed")
+            return "error", (url, {"polled_at": now, "error": "poll failed"}, [], "new")
+
+    def poll(self):
+        """
+        Poll every source and return the outcome counts and the number of new videos.
+        """
+        sources = self.state.sources()
+        counts = {"scanned": 0, "modified": 0, "not_modified": 0, "error": 0}
+        polls = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.poll_workers, thread_name_prefix="watch") as pool:
+            for outcome, poll in pool.map(self.poll_source, sources):
+                counts[outcome] += 1
+                polls.append(poll)
+        counts["new"] = self.state.save_polls(polls)
+        console.print(f"[cyan]Polled {len(sources)} sources in {time.perf_counter() - start:.1f}s: "
+                      f"{counts['scanned']} scanned, {counts['modified']} changed, "
+                      f"{counts['not_modified']} unchanged, {counts['error']} failed; "
+                      f"{counts['new']} new videos[/cyan]")
+        return counts
+
+    def run_once(self):
+        """
+        Poll the sources, then summarize the pending videos. Returns the batch jobs.
+        """
+        self.poll()
+        video_ids = self.state.pending(self.max_attempts)
+        if not video_ids:
+            console.print("[green]No new videos.[/green]")
+            return []
+        jobs = self.batch.run([f"https://www.youtube.com/watch?v={video_id}" for video_id in video_ids])
+        for video_id, job in zip(video_ids, jobs):
+            self.state.finish(video_id, None if job.ok else job.error)
+        return jobs
+
+    def run_forever(self):
+        while True:
+            start = time.monotonic()
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error("Watch cycle failed: %s", e)
+            delay = max(0.0, self.interval - (time.monotonic() - start))
+            console.print(f"[cyan]Next poll in {delay:.0f}s.[/cyan]")
+            time.sleep(delay)
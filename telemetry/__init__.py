@@ -0,0 +1 @@
+from .tracing import NoopTracer, Tracer, current_span, enable_tracing, get_tracer, span, stream_span, traced
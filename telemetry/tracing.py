@@ -0,0 +1,239 @@
+import contextvars
+import functools
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+# Span attributes exported as Prometheus labels; other strings (video ids, titles) stay in the JSON report
+LABELS = ("provider", "model", "source", "stage", "language")
+METRIC_PREFIX = "yt_tldr"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    A timed operation. Numeric attributes (bytes, audio_seconds, prompt_tokens, ...)
+    are summed per span name in the metrics; string attributes describe the span.
+    """
+
+    def __init__(self, tracer, name, parent, attributes, activate=True):
+        self.tracer = tracer
+        self.activate = activate
+        self.name = name
+        self.id = next(tracer.ids)
+        self.parent_id = parent.id if parent is not None else None
+        self.attributes = attributes
+        self.start = None
+        self.duration = None
+        self.error = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, **counts):
+        for name, value in counts.items():
+            self.attributes[name] = self.attributes.get(name, 0) + value
+
+    def fail(self, reason):
+        """
+        Mark the span as failed when the operation reports errors without raising.
+        """
+        self.error = reason
+
+    def __enter__(self):
+        if self.activate:
+            self._token = _current_span.set(self)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        if self._token is not None:
+            _current_span.reset(self._token)
+        self.tracer.finish(self)
+        return False
+
+    def to_dict(self):
+        return {"id": self.id, "parent_id": self.parent_id, "name": self.name, "start": self.start,
+                "duration": self.duration, "error": self.error, "attributes": self.attributes}
+
+
+class NoopSpan:
+    """
+    Stand-in returned while tracing is off: entering, setting and adding do nothing.
+    """
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, **counts):
+        pass
+
+    def fail(self, reason):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class NoopTracer:
+    enabled = False
+
+    def span(self, name, **attributes):
+        return NOOP_SPAN
+
+    def stream_span(self, name, **attributes):
+        return NOOP_SPAN
+
+
+class Tracer:
+    """
+    Records finished spans and aggregates them per span name and label set.
+
+    Spans opened while another span is active in the same thread (or asyncio task)
+    become its children. Only the last max_spans spans are kept for the JSON report;
+    the aggregates behind the metrics cover the whole run.
+    """
+
+    enabled = True
+
+    def __init__(self, max_spans=10_000):
+        self.ids = itertools.count(1)
+        self.spans = deque(maxlen=max_spans)
+        self.aggregates = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def span(self, name, **attributes):
+        return Span(self, name, _current_span.get(), attributes)
+
+    def stream_span(self, name, **attributes):
+        """
+        Span for the body of a generator: it does not become the current span, because
+        a generator may be resumed from other threads or contexts between its steps.
+        """
+        return Span(self, name, _current_span.get(), attributes, activate=False)
+
+    def finish(self, span: Span):
+        labels = tuple((label, str(span.attributes[label])) for label in LABELS if label in span.attributes)
+        with self.lock:
+            self.spans.append(span)
+            aggregate = self.aggregates.get((span.name, labels))
+            if aggregate is None:
+                aggregate = self.aggregates[(span.name, labels)] = {"count": 0, "errors": 0, "seconds": 0.0,
+                                                                    "max_seconds": 0.0, "totals": {}}
+            aggregate["count"] += 1
+            aggregate["errors"] += span.error is not None
+            aggregate["seconds"] += span.duration
+            aggregate["max_seconds"] = max(aggregate["max_seconds"], span.duration)
+            for name, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    aggregate["totals"][name] = aggregate["totals"].get(name, 0) + value
+
+    def report(self):
+        """
+        Return the run report: every kept span plus the per-name aggregates.
+        """
+        with self.lock:
+            spans = [span.to_dict() for span in self.spans]
+            summary = [{"name": name, "labels": dict(labels), **{**aggregate, "totals": dict(aggregate["totals"])}}
+                       for (name, labels), aggregate in sorted(self.aggregates.items())]
+        return {"started": self.started, "finished": time.time(), "summary": summary, "spans": spans}
+
+    def write_report(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def prometheus(self):
+        """
+        Return the aggregates in the Prometheus text exposition format.
+        """
+        with self.lock:
+            aggregates = sorted(self.aggregates.items())
+            totals = sorted({name for _, aggregate in aggregates for name in aggregate["totals"]})
+            lines = [f"# HELP {METRIC_PREFIX}_span_seconds Wall time of traced operations",
+                     f"# TYPE {METRIC_PREFIX}_span_seconds summary"]
+            for (name, labels), aggregate in aggregates:
+                lines.append(f"{METRIC_PREFIX}_span_seconds_count{_labels(name, labels)} {aggregate['count']}")
+                lines.append(f"{METRIC_PREFIX}_span_seconds_sum{_labels(name, labels)} {aggregate['seconds']:.6f}")
+            lines += [f"# HELP {METRIC_PREFIX}_span_errors_total Traced operations that raised",
+                      f"# TYPE {METRIC_PREFIX}_span_errors_total counter"]
+            lines += [f"{METRIC_PREFIX}_span_errors_total{_labels(name, labels)} {aggregate['errors']}"
+                      for (name, labels), aggregate in aggregates]
+            for total in totals:
+                metric = f"{METRIC_PREFIX}_{total}_total"
+                lines += [f"# HELP {metric} Sum of the {total} attribute of traced operations",
+                          f"# TYPE {metric} counter"]
+                lines += [f"{metric}{_labels(name, labels)} {aggregate['totals'][total]}"
+                          for (name, labels), aggregate in aggregates if total in aggregate["totals"]]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(name, labels):
+    pairs = [("span", name), *labels]
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+_tracer = NoopTracer()
+
+
+def get_tracer():
+    return _tracer
+
+
+def enable_tracing(max_spans=10_000):
+    """
+    Start recording spans for the rest of the process and return the tracer.
+    """
+    global _tracer
+    if not _tracer.enabled:
+        _tracer = Tracer(max_spans=max_spans)
+    return _tracer
+
+
+def span(name, **attributes):
+    """
+    Open a span on the active tracer: `with span("video.info") as s: ... s.set(bytes=n)`.
+    A no-op unless enable_tracing() was called.
+    """
+    return _tracer.span(name, **attributes)
+
+
+def stream_span(name, **attributes):
+    return _tracer.stream_span(name, **attributes)
+
+
+def current_span():
+    """
+    Return the innermost active span of this thread (or task), or a no-op span.
+    """
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name, **attributes):
+    """
+    Decorator running each call of the function in a span; the function can add
+    attributes with current_span().set(...).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,9 +1,11 @@
 import logging
-import subprocess
-from pathlib import Path
+import os
 
 from rich.console import Console
-from rich.progress import Progress
+
+from telemetry import span
+from video.extractor import VideoExtractor
+from video.progress import ProgressFeed
 
 console = Console()
 
@@ -13,47 +15,29 @@ class AudioDownloader:
     Downloads the best audio track from a YouTube video using yt-dlp.
     """
 
-    def __init__(self, url, output_dir):
+    def __init__(self, url, output_dir, show_progress=True, extractor: VideoExtractor = None):
         self.url = url
-        self.output_dir = Path(output_dir)
+        self.output_dir = output_dir
+        self.show_progress = show_progress
+        self.extractor = extractor or VideoExtractor(url)
 
     def download_audio(self):
         """
         Download the best audio track for transcription with Whisper.
         Returns the path to the downloaded audio file or None on error.
         """
-        audio_path = self.output_dir / "audio.m4a"
-        cmd_download_audio = [
-            "yt-dlp",
-            "--newline",
-            "-f", "bestaudio",
-            "-o", str(audio_path),
-            self.url
-        ]
-
-        with subprocess.Popen(cmd_download_audio, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
-                              bufsize=1) as proc:
-            if proc.stdout is None:
-                logging.error("No stdout available from yt-dlp.")
-                return None
-
-            with Progress(transient=True) as progress:
-                task_id = progress.add_task("Downloading audio", total=100)
-                for line in proc.stdout:
-                    if "[download]" in line:
-                        parts = line.strip().split()
-                        for p in parts:
-                            if p.endswith("%"):
-                                try:
-                                    percent = float(p.replace("%", ""))
-                                    progress.update(task_id, completed=percent)
-                                except ValueError:
-                                    pass
-
-            return_code = proc.wait()
-
-        if return_code != 0:
-            logging.error("Error downloading audio. yt-dlp returned code %d", return_code)
-            return None
-
-        return audio_path.as_posix()
+        # Rich allows a single live display at a time, so concurrent downloads run without a bar
+        with span("video.audio_download") as s, \
+                ProgressFeed("Downloading audio", show_progress=self.show_progress) as feed:
+            def on_progress(status):
+                if status.get("status") == "downloading":
+                    feed.update(downloaded_bytes=status.get("downloaded_bytes", 0),
+                                total_bytes=status.get("total_bytes") or status.get("total_bytes_estimate"))
+
+            audio_file = self.extractor.download_audio(self.output_dir, progress_callback=on_progress)
+            if audio_file is not None:
+                s.set(bytes=os.path.getsize(audio_file))
+
+        if audio_file is None:
+            logging.error("Error downloading audio.")
+        return audio_file
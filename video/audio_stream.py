@@ -0,0 +1,267 @@
+import logging
+import queue
+import subprocess
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from video.extractor import VideoExtractor
+from video.progress import ProgressFeed
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2  # s16le
+RELAY_CHUNK = 64 * 1024
+
+
+def pcm_command(source, tempo=1.0):
+    """
+    ffmpeg command decoding source to 16 kHz mono s16le on stdout, sped up tempo× (atempo keeps the pitch).
+    """
+    tempo_filter = ["-af", f"atempo={tempo:g}"] if tempo != 1.0 else []
+    return ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", source, *tempo_filter,
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"]
+
+
+def quietest_cut(audio, search_seconds):
+    """
+    Return the sample offset where a window should end: the quietest 30 ms frame
+    in its last search_seconds.
+    """
+    frame = SAMPLE_RATE * 30 // 1000
+    search = audio[-int(search_seconds * SAMPLE_RATE):]
+    n_frames = len(search) // frame
+    if n_frames == 0:
+        return len(audio)
+    energy = np.abs(search[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+    return len(audio) - len(search) + int(np.argmin(energy)) * frame
+
+
+def pcm_windows(chunks, window_bytes, cut_search_seconds=3.0):
+    """
+    Turn s16le PCM chunks into float32 windows of at most window_bytes of audio, each
+    ending at the quietest frame of its last cut_search_seconds; the remainder starts
+    the next window.
+    """
+    max_samples = window_bytes // BYTES_PER_SAMPLE
+    buffer = np.zeros(0, dtype=np.float32)
+    for data in chunks:
+        samples = np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+        buffer = np.concatenate([buffer, samples.astype(np.float32) / 32768.0])
+        while len(buffer) >= max_samples:
+            cut = quietest_cut(buffer[:max_samples], cut_search_seconds)
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    if len(buffer):
+        yield buffer
+
+
+def speech_mask(audio, threshold_db=-40.0, min_silence=0.5, padding=0.2):
+    """
+    Return which 30 ms frames of audio to keep (the last frame includes the leftover
+    samples): frames louder than threshold_db dBFS, widened by padding seconds on both
+    sides, and quieter stretches shorter than min_silence seconds.
+    """
+    frame = SAMPLE_RATE * 30 // 1000
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return np.ones(1, dtype=bool)
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    level = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    keep = level > threshold_db
+    pad = int(round(padding / 0.03))
+    if pad:
+        keep = np.convolve(keep, np.ones(2 * pad + 1), mode="same") > 0
+    # Silent runs as (start, end) frame pairs: the edges of keep padded with True on both sides
+    edges = np.flatnonzero(np.diff(np.concatenate(([True], keep, [True])).astype(np.int8)))
+    starts, ends = edges[::2], edges[1::2]
+    for start, end in zip(starts, ends):
+        if end - start < min_silence / 0.03:
+            keep[start:end] = True
+    return keep
+
+
+def trim_windows(windows, settings, timestamps, window_seconds=30, cut_search_seconds=3.0):
+    """
+    Drop the non-speech stretches of 16 kHz windows (see speech_mask) and repack the
+    kept audio into full windows, each ending at the quietest frame of its last
+    cut_search_seconds like the decoder's: the model pads every window to 30 seconds,
+    so removing audio only saves work once there are fewer windows. Each kept piece is
+    added to timestamps (a TimestampMap).
+    """
+    frame = SAMPLE_RATE * 30 // 1000
+    max_samples = window_seconds * SAMPLE_RATE
+    buffer, decoded, processed = np.zeros(0, dtype=np.float32), 0, 0
+    for window in windows:
+        keep = speech_mask(window, settings.threshold_db, settings.min_silence, settings.padding)
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], keep, [False])).astype(np.int8)))
+        for start, end in zip((edges[::2] * frame).tolist(), (edges[1::2] * frame).tolist()):
+            end = len(window) if end >= len(keep) * frame else end
+            timestamps.add(processed, decoded + start)
+            processed += end - start
+            buffer = np.concatenate([buffer, window[start:end]])
+            while len(buffer) >= max_samples:
+                cut = quietest_cut(buffer[:max_samples], cut_search_seconds)
+                yield buffer[:cut]
+                buffer = buffer[cut:]
+        decoded += len(window)
+    if len(buffer):
+        yield buffer
+
+
+class AudioFileDecoder:
+    """
+    Decodes an audio file into 16 kHz mono float32 windows through an ffmpeg pipe.
+
+    Unlike whisper.load_audio, which holds the whole file as one float32 array (about
+    2.3 GB for 10 hours), only the window being read and the one being transcribed are
+    in memory: ffmpeg blocks on the full pipe until the next window is read, so the
+    memory ceiling does not depend on the audio length. With tempo != 1 the windows
+    are sped up by ffmpeg.
+    """
+
+    def __init__(self, audio_file, window_seconds=30, cut_search_seconds=3.0, tempo=1.0):
+        self.audio_file = str(audio_file)
+        self.window_seconds = window_seconds
+        self.cut_search_seconds = cut_search_seconds
+        self.tempo = tempo
+
+    def windows(self):
+        """
+        Yield float32 windows until the file is decoded.
+        Raises RuntimeError if ffmpeg produces no audio.
+        """
+        command = pcm_command(self.audio_file, self.tempo)
+        # ffmpeg only reports errors, so its stderr cannot fill the pipe and block it
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        window_bytes = self.window_seconds * SAMPLE_RATE * BYTES_PER_SAMPLE
+        decoded = [0]
+
+        def chunks():
+            while True:
+                data = process.stdout.read(window_bytes)
+                if not data:
+                    return
+                decoded[0] += len(data)
+                yield data
+
+        try:
+            yield from pcm_windows(chunks(), window_bytes, self.cut_search_seconds)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            error = process.stderr.read().decode(errors="replace").strip()
+            process.wait()
+
+        if decoded[0] == 0:
+            raise RuntimeError(f"could not decode {self.audio_file}: {error or 'no audio'}")
+        if process.returncode:
+            logging.warning("Decoding %s ended with errors: %s", self.audio_file, error)
+
+
+class AudioStreamer:
+    """
+    Streams the audio of a video straight into transcription without writing it to disk:
+    yt-dlp writes the best audio format to stdout, ffmpeg resamples it to 16 kHz mono
+    PCM in a pipe, and fixed-size float32 windows are yielded as they arrive.
+
+    At most max_buffered_windows windows wait for the consumer; when they pile up the
+    pipes fill and yt-dlp blocks, so memory stays bounded whatever the video length.
+    Each window ends at the quietest frame of its last cut_search_seconds (the remainder
+    starts the next window) to avoid cutting words in half. With tempo != 1 the windows
+    are sped up by ffmpeg.
+    """
+
+    def __init__(self, url, workdir, window_seconds=30, max_buffered_windows=4, cut_search_seconds=3.0,
+                 show_progress=True, extractor: VideoExtractor = None, tempo=1.0):
+        self.url = url
+        self.workdir = Path(workdir)
+        self.window_seconds = window_seconds
+        self.max_buffered_windows = max_buffered_windows
+        self.cut_search_seconds = cut_search_seconds
+        self.show_progress = show_progress
+        self.extractor = extractor or VideoExtractor(url)
+        self.tempo = tempo
+
+    def _commands(self):
+        source = ["--load-info-json", self.extractor.write_info_json(self.workdir / "info.json")] \
+            if self.extractor.extract() is not None else [self.url]
+        ytdlp = ["yt-dlp", "--quiet", "--no-warnings", "-f", "bestaudio/best", "-o", "-", *source]
+        return ytdlp, pcm_command("pipe:0", self.tempo)
+
+    def windows(self):
+        """
+        Yield float32 windows of 16 kHz mono audio until the stream ends.
+        Raises RuntimeError if yt-dlp or ffmpeg fail before producing any audio.
+        """
+        ytdlp_cmd, ffmpeg_cmd = self._commands()
+        ytdlp = subprocess.Popen(ytdlp_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        ffmpeg = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        window_bytes = self.window_seconds * SAMPLE_RATE * BYTES_PER_SAMPLE
+        windows = queue.Queue(maxsize=self.max_buffered_windows)
+        downloaded = [0]
+
+        def relay():
+            # Copy yt-dlp's output into ffmpeg, counting the downloaded bytes on the way
+            try:
+                while True:
+                    chunk = ytdlp.stdout.read(RELAY_CHUNK)
+                    if not chunk:
+                        break
+                    downloaded[0] += len(chunk)
+                    ffmpeg.stdin.write(chunk)
+            except (BrokenPipeError, ValueError, OSError):
+                pass
+            finally:
+                try:
+                    ffmpeg.stdin.close()
+                except OSError:
+                    pass
+
+        def read_pcm():
+            while True:
+                data = ffmpeg.stdout.read(window_bytes)
+                if not data:
+                    break
+                windows.put(data)
+            windows.put(None)
+
+        threads = [threading.Thread(target=relay, daemon=True), threading.Thread(target=read_pcm, daemon=True)]
+        for thread in threads:
+            thread.start()
+
+        decoded_seconds = [0.0]
+        duration = (self.extractor.extract() or {}).get("duration")
+
+        def chunks(feed):
+            while True:
+                data = windows.get()
+                if data is None:
+                    return
+                # In seconds of the video, for the progress against its duration
+                decoded_seconds[0] += len(data) / (SAMPLE_RATE * BYTES_PER_SAMPLE) * self.tempo
+                feed.update(downloaded_bytes=downloaded[0], seconds=decoded_seconds[0])
+                yield data
+
+        try:
+            with ProgressFeed("Streaming audio", total_seconds=duration, show_progress=self.show_progress) as feed:
+                yield from pcm_windows(chunks(feed), window_bytes, self.cut_search_seconds)
+        finally:
+            for proc in (ytdlp, ffmpeg):
+                if proc.poll() is None:
+                    proc.kill()
+            # Drain the reader so it can exit even if the consumer stopped early
+            while threads[1].is_alive():
+                try:
+                    windows.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            ytdlp_error = ytdlp.stderr.read().decode(errors="replace").strip()
+            ffmpeg_error = ffmpeg.stderr.read().decode(errors="replace").strip()
+            ytdlp.wait()
+            ffmpeg.wait()
+
+        if decoded_seconds[0] == 0:
+            raise RuntimeError(f"no audio streamed: {ytdlp_error or ffmpeg_error or 'empty stream'}")
+        if ytdlp.returncode or ffmpeg.returncode:
+            logging.warning("Audio stream ended with errors: %s", ytdlp_error or ffmpeg_error)
@@ -0,0 +1,210 @@
+import logging
+from abc import ABC, abstractmethod
+
+SAMPLE_RATE = 16000
+CLIP_SAMPLES = 30 * SAMPLE_RATE
+
+
+class Segment:
+    """
+    A piece of transcribed text with its start and end in seconds.
+    """
+
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def shifted(self, seconds):
+        return Segment(self.start + seconds, self.end + seconds, self.text)
+
+    def to_dict(self):
+        return {"start": round(self.start, 2), "end": round(self.end, 2), "text": self.text}
+
+
+def segments_text(segments):
+    return " ".join(segment.text for segment in segments if segment.text)
+
+
+class TranscriptionBackend(ABC):
+    """
+    Speech-to-text engine behind Transcriber. A backend transcribes 16 kHz float32
+    windows of about 30 seconds into Segments; transcribe_windows() may override the
+    default window-by-window loop to batch windows. Subclasses must implement transcribe(),
+    so an incomplete backend fails when it is created, not in a worker mid-run.
+    """
+
+    name = None
+
+    def __init__(self, model_name, threads=None):
+        self.model_name = model_name
+        self.threads = threads
+
+    @abstractmethod
+    def transcribe(self, audio, language=None, prompt=None):
+        """
+        Transcribe one window, detecting the language when none is given.
+        Returns (segments, language), the segment times in seconds from the window start.
+        """
+
+    def detect_language(self, audio):
+        """
+        Return the language spoken in a window. Backends override this with a
+        detection pass that is cheaper than transcribing the window.
+        """
+        return self.transcribe(audio)[1]
+
+    def transcribe_windows(self, windows):
+        """
+        Yield (segments, language) for the windows in order, the segment times in seconds
+        from the start of the first window. The language is detected on the first window,
+        and each window gets the previous text as prompt for context.
+        """
+        language, previous, start = None, None, 0
+        for window in windows:
+            segments, language = self.transcribe(window, language=language, prompt=previous)
+            previous = segments_text(segments)
+            yield [segment.shifted(start / SAMPLE_RATE) for segment in segments], language
+            start += len(window)
+
+
+class WhisperBackend(TranscriptionBackend):
+    """
+    openai-whisper on PyTorch (fp16 on GPU, fp32 on CPU).
+    """
+
+    name = "whisper"
+
+    def __init__(self, model_name, threads=None, device=None):
+        super().__init__(model_name, threads)
+        # Imported here: whisper pulls in torch, which subtitle-only runs never need
+        import torch
+        import whisper
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_name, device=device)
+        self.fp16 = self.model.device.type == "cuda"
+
+    def transcribe(self, audio, language=None, prompt=None):
+        result = self.model.transcribe(audio, language=language, initial_prompt=prompt, fp16=self.fp16)
+        segments = [Segment(segment["start"], segment["end"], segment["text"].strip())
+                    for segment in result["segments"]]
+        return segments, result["language"]
+
+    def detect_language(self, audio):
+        import whisper
+
+        # One encoder pass over the first 30 seconds, without decoding any text
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), self.model.dims.n_mels).to(self.model.device)
+        _, probs = self.model.detect_language(mel)
+        return max(probs, key=probs.get)
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """
+    faster-whisper (CTranslate2) with quantized weights: compute_type "int8" runs the
+    CPU workers with a quarter of the fp32 memory traffic. With batch_size > 1, groups
+    of batch_size windows are decoded together by BatchedInferencePipeline, with the
+    window boundaries as clip timestamps; batched windows are not prompted with the
+    previous text.
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, model_name, threads=None, compute_type="int8", batch_size=8, device="cpu"):
+        super().__init__(model_name, threads)
+        from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+        self.compute_type = compute_type
+        self.batch_size = batch_size
+        self.model = WhisperModel(model_name, device=device, compute_type=compute_type, cpu_threads=threads or 0)
+        self.pipeline = BatchedInferencePipeline(self.model) if batch_size > 1 else None
+
+    def transcribe(self, audio, language=None, prompt=None):
+        segments, info = self.model.transcribe(audio, language=language, initial_prompt=prompt)
+        return [Segment(segment.start, segment.end, segment.text.strip()) for segment in segments], info.language
+
+    def detect_language(self, audio):
+        # The language is detected up front; the segments are only decoded when iterated
+        _, info = self.model.transcribe(audio)
+        return info.language
+
+    def _transcribe_batch(self, windows, language, start_seconds):
+        # Segment times come relative to the concatenated batch; shifted to the start of the first window
+        import numpy as np
+
+        # Clips longer than 30 seconds would be trimmed, so a window cut a bit past 30 s becomes two
+        bounds, start = [], 0
+        for window in windows:
+            for offset in range(0, len(window), CLIP_SAMPLES):
+                bounds.append({"start": start + offset, "end": start + min(len(window), offset + CLIP_SAMPLES)})
+            start += len(window)
+        segments, _ = self.pipeline.transcribe(np.concatenate(windows), language=language, clip_timestamps=bounds,
+                                               batch_size=self.batch_size)
+        return [Segment(start_seconds + segment.start, start_seconds + segment.end, segment.text.strip())
+                for segment in segments]
+
+    def transcribe_windows(self, windows):
+        if self.pipeline is None:
+            yield from super().transcribe_windows(windows)
+            return
+
+        language, batch, start, batch_start = None, [], 0, 0
+        for window in windows:
+            if language is None:
+                # The first window alone, to detect the language for the batches
+                segments, language = self.transcribe(window)
+                yield segments, language
+                start = batch_start = len(window)
+                continue
+            batch.append(window)
+            start += len(window)
+            if len(batch) == self.batch_size:
+                yield self._transcribe_batch(batch, language, batch_start / SAMPLE_RATE), language
+                batch, batch_start = [], start
+        if batch:
+            yield self._transcribe_batch(batch, language, batch_start / SAMPLE_RATE), language
+
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend, FasterWhisperBackend)}
+
+
+class BackendSpec:
+    """
+    Which backend to use and its settings; picklable, so it can be sent to worker
+    processes and to the transcription service. compute_type and batch_size only
+    apply to faster-whisper.
+    """
+
+    def __init__(self, name="whisper", compute_type="int8", threads=None, batch_size=8):
+        if name not in BACKENDS:
+            raise ValueError(f"unknown transcription backend '{name}' (choose from {', '.join(BACKENDS)})")
+        self.name = name
+        self.compute_type = compute_type
+        self.threads = threads
+        self.batch_size = batch_size
+
+    @property
+    def tag(self):
+        """
+        Transcript cache tag: settings that change the text, not the speed.
+        """
+        return self.name if self.name == "whisper" else f"{self.name}-{self.compute_type}"
+
+    def load(self, model_name, threads=None, device=None):
+        """
+        Load the model. Returns the backend, or None (logged) if it cannot be loaded.
+        """
+        threads = threads or self.threads
+        try:
+            if self.name == "faster-whisper":
+                return FasterWhisperBackend(model_name, threads, compute_type=self.compute_type,
+                                            batch_size=self.batch_size, device=device or "cpu")
+            return WhisperBackend(model_name, threads, device=device)
+        except Exception as e:
+            logging.error("Error loading %s model '%s': %s", self.name, model_name, e)
+            return None
+
+    def __repr__(self):
+        return f"BackendSpec({self.name!r}, compute_type={self.compute_type!r}, batch_size={self.batch_size})"
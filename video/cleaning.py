@@ -0,0 +1,117 @@
+import re
+
+# Filler words per language; "en" is the list the cleaner has always used
+FILLERS = {
+    "en": ["um", "uh", "like", "you know", "so", "actually"],
+    "es": ["eh", "em", "este", "o sea", "pues", "bueno"],
+    "fr": ["euh", "ben", "bah", "du coup", "genre", "en fait"],
+    "de": ["äh", "ähm", "halt", "sozusagen", "quasi"],
+    "it": ["ehm", "cioè", "tipo", "praticamente", "allora"],
+    "pt": ["né", "tipo", "então", "assim"],
+}
+
+LANGUAGE_CODES = {
+    "english": "en", "spanish": "es", "español": "es", "french": "fr", "français": "fr",
+    "german": "de", "deutsch": "de", "italian": "it", "italiano": "it", "portuguese": "pt", "português": "pt",
+}
+
+TAGS = re.compile(r"<(?:\d{2}:\d{2}:\d{2}\.\d{3}|/?c)>")
+# Stripped from a word before comparing it with fillers and with the previous word
+PUNCTUATION = ".,;:!?¡¿…\"'“”‘’«»()[]-–—"
+
+
+class TranscriptCleaner:
+    """
+    Tokenizer-based transcript cleaner.
+
+    One precompiled pass removes timecodes and <c> tags, then a single walk over the
+    whitespace-separated words drops filler words (multi-word ones included) and
+    repeats of the previous word, comparing words case-insensitively without their
+    punctuation. Joining the kept words normalizes whitespace. Filler lists depend
+    on the language and can be replaced or disabled.
+
+    feed() cleans a transcript segment by segment while transcription is still
+    running; the previous word is carried over so repeats across segment
+    boundaries are collapsed too.
+    """
+
+    def __init__(self, language="en", fillers=None, remove_fillers=True):
+        language = LANGUAGE_CODES.get(language.lower(), language.lower()) if language else "en"
+        if fillers is None:
+            fillers = FILLERS.get(language, [])
+        if not remove_fillers:
+            fillers = []
+        self.fillers = set()
+        # First word -> remaining words of each multi-word filler, longest first
+        self.multi_fillers = {}
+        for filler in fillers:
+            words = filler.lower().split()
+            if len(words) == 1:
+                self.fillers.add(words[0])
+            else:
+                self.multi_fillers.setdefault(words[0], []).append(words[1:])
+        for rests in self.multi_fillers.values():
+            rests.sort(key=len, reverse=True)
+        self.last_word = None
+
+    def _words(self, text, last):
+        """
+        Return the kept words of text and the last kept word (lowercased, without punctuation).
+        """
+        tokens = TAGS.sub("", text).split()
+        fillers, multi_fillers = self.fillers, self.multi_fillers
+        kept = []
+        append = kept.append
+        skip = 0
+        for i, token in enumerate(tokens):
+            if skip:
+                skip -= 1
+                continue
+            word = token.lower().strip(PUNCTUATION)
+            if word in fillers:
+                continue
+            if word in multi_fillers:
+                for rest in multi_fillers[word]:
+                    following = tokens[i + 1:i + 1 + len(rest)]
+                    if [t.lower().strip(PUNCTUATION) for t in following] == rest:
+                        skip = len(rest)
+                        break
+                if skip:
+                    continue
+            if word and word == last:
+                continue
+            last = word
+            append(token)
+        return kept, last
+
+    def clean(self, raw_transcript):
+        """
+        Clean a whole transcript. Stateless, so a cleaner can be shared between threads.
+        """
+        words, _ = self._words(raw_transcript, None)
+        return " ".join(words)
+
+    def feed(self, segment):
+        """
+        Clean the next segment of a transcript and return its text. Joining the returned
+        pieces with spaces gives the same result as cleaning the whole transcript
+        (except for a multi-word filler split across two segments).
+        """
+        words, self.last_word = self._words(segment, self.last_word)
+        return " ".join(words)
+
+    def reset(self):
+        self.last_word = None
+
+
+_cleaners = {}
+
+
+def get_cleaner(language="en"):
+    """
+    Return a shared cleaner for the language, for whole-transcript clean() calls.
+    """
+    cleaner = _cleaners.get(language)
+    if cleaner is None:
+        cleaner = _cleaners[language] = TranscriptCleaner(language)
+    return cleaner
@@ -0,0 +1,173 @@
+import json
+import logging
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+_local = threading.local()
+
+BASE_OPTIONS = {
+    "quiet": True,
+    "no_warnings": True,
+    "noprogress": True,
+    # Pick an audio-only format during processing so no ffmpeg merge is ever needed
+    "format": "bestaudio/best",
+}
+
+
+def get_ydl(**overrides):
+    """
+    Return the YoutubeDL instance of the current worker thread for the given options,
+    creating it on first use. Reusing it avoids paying extractor setup on every video.
+    """
+    instances = getattr(_local, "instances", None)
+    if instances is None:
+        instances = _local.instances = {}
+    key = tuple(sorted(overrides.items()))
+    ydl = instances.get(key)
+    if ydl is None:
+        import yt_dlp
+        ydl = yt_dlp.YoutubeDL({**BASE_OPTIONS, **overrides, "progress_hooks": [_dispatch_progress]})
+        instances[key] = ydl
+    return ydl
+
+
+def video_id_from_url(url):
+    """
+    Return the video id of a watch (or youtu.be) URL without extracting anything, or None.
+    """
+    parts = urlsplit(url)
+    if parts.netloc.endswith("youtu.be"):
+        return parts.path.strip("/") or None
+    return (parse_qs(parts.query).get("v") or [None])[0]
+
+
+def _download_error():
+    # yt_dlp is imported on first use to keep the CLI startup fast
+    from yt_dlp.utils import DownloadError
+    return DownloadError
+
+
+def _dispatch_progress(status):
+    # The shared instance keeps a single hook; per-download callbacks are set per thread
+    callback = getattr(_local, "progress_callback", None)
+    if callback is not None:
+        callback(status)
+
+
+class VideoExtractor:
+    """
+    Extracts a YouTube video in-process with the yt_dlp API: a single extraction
+    returns the metadata, the subtitle tracks and the audio formats, and only the
+    artifacts that are actually needed get downloaded afterwards.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self._info = None
+
+    def extract(self):
+        """
+        Extract the video info dict once and cache it on the instance.
+        Returns the info dict or None on error.
+        """
+        if self._info is None:
+            try:
+                self._info = get_ydl().extract_info(self.url, download=False)
+            except _download_error() as e:
+                logging.error("Error retrieving video info: %s", e)
+                return None
+        return self._info
+
+    def use_info(self, info):
+        """
+        Reuse an info dict saved by an earlier run (see write_info_json) instead of extracting again.
+        """
+        self._info = info
+
+    def subtitle_tracks(self, automatic=False):
+        """
+        Return the {language: [formats]} mapping of manual (or automatic) subtitle tracks.
+        """
+        info = self.extract()
+        if info is None:
+            return {}
+        return info.get("automatic_captions" if automatic else "subtitles") or {}
+
+    def audio_formats(self):
+        """
+        Return the audio-only formats, ordered from worst to best as yt-dlp sorts them.
+        """
+        info = self.extract()
+        if info is None:
+            return []
+        return [f for f in info.get("formats") or [] if f.get("vcodec") == "none" and f.get("acodec") != "none"]
+
+    def download_subtitles(self, language, output_dir, automatic=False, ext="vtt"):
+        """
+        Download a single subtitle track directly from its URL.
+        Returns the path to the subtitle file or None if the track is unavailable.
+        """
+        track = next((f for f in self.subtitle_tracks(automatic).get(language, []) if f.get("ext") == ext), None)
+        if track is None:
+            return None
+
+        info = self.extract()
+        path = Path(output_dir) / f"{info['id']}.{language}.{ext}"
+        try:
+            with get_ydl().urlopen(track["url"]) as response:
+                path.write_bytes(response.read())
+        except Exception as e:
+            logging.error("Error downloading subtitles: %s", e)
+            return None
+        return path.as_posix()
+
+    def download_audio(self, output_dir, progress_callback=None):
+        """
+        Download the best audio-only format into output_dir, reusing the extracted info.
+        progress_callback receives yt-dlp progress dicts. Returns the file path or None on error.
+        """
+        formats = self.audio_formats()
+        if not formats:
+            logging.error("No audio-only format available.")
+            return None
+
+        best = formats[-1]
+        path = Path(output_dir) / f"audio.{best.get('ext', 'm4a')}"
+        _local.progress_callback = progress_callback
+        try:
+            success, _ = get_ydl().dl(str(path), {**self.extract(), **best})
+        except _download_error() as e:
+            logging.error("Error downloading audio: %s", e)
+            return None
+        finally:
+            _local.progress_callback = None
+
+        if not success or not path.exists():
+            logging.error("Error downloading audio.")
+            return None
+        return path.as_posix()
+
+    def write_info_json(self, path):
+        """
+        Write the extracted info dict as JSON, for `yt-dlp --load-info-json` to reuse
+        without extracting the video again. Returns the path or None on error.
+        """
+        info = self.extract()
+        if info is None:
+            return None
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(get_ydl().sanitize_info(info), f)
+        return str(path)
+
+    @staticmethod
+    def extract_flat(url):
+        """
+        List the entries of a playlist or channel without fetching every video page.
+        Returns the flat info dict or None on error.
+        """
+        try:
+            return get_ydl(extract_flat="in_playlist").extract_info(url, download=False)
+        except _download_error() as e:
+            logging.error("Error extracting playlist: %s", e)
+            return None
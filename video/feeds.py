@@ -0,0 +1,73 @@
+import logging
+import os
+import xml.etree.ElementTree as ET
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from telemetry import span
+
+FEED_URL = "https://www.youtube.com/feeds/videos.xml"
+ATOM = "{http://www.w3.org/2005/Atom}"
+YT = "{http://www.youtube.com/xml/schemas/2015}"
+
+
+class Feed:
+    """
+    Result of a feed request: modified is False when the server answered 304 Not Modified,
+    in which case entries is empty. Entries are {"id", "title", "published"} dicts, newest first.
+    """
+
+    def __init__(self, modified, entries=(), etag=None, last_modified=None):
+        self.modified = modified
+        self.entries = list(entries)
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class FeedReader:
+    """
+    Reads the Atom feeds YouTube publishes for channels and playlists (the latest 15
+    uploads) with conditional GETs: the ETag and Last-Modified of the previous answer
+    are sent back, so an unchanged feed costs an empty 304 response.
+    """
+
+    def __init__(self, base_url=None, timeout=15, pool_size=32):
+        self.base_url = base_url or os.getenv("YT_TLDR_FEED_URL") or FEED_URL
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def fetch(self, feed, etag=None, last_modified=None):
+        """
+        Fetch a feed given as its query ("channel_id=UC..." or "playlist_id=PL...").
+        Returns a Feed, or None on error.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        with span("watch.feed") as s:
+            try:
+                response = self.session.get(f"{self.base_url}?{feed}", headers=headers, timeout=self.timeout)
+                if response.status_code == 304:
+                    s.set(not_modified=1)
+                    return Feed(False, etag=etag, last_modified=last_modified)
+                response.raise_for_status()
+                entries = self.parse(response.content)
+            except (requests.RequestException, ET.ParseError) as e:
+                logging.error("Error fetching feed %s: %s", feed, e)
+                s.fail(str(e))
+                return None
+            s.set(bytes=len(response.content), entries=len(entries))
+            return Feed(True, entries, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+    @staticmethod
+    def parse(content):
+        root = ET.fromstring(content)
+        return [{"id": entry.findtext(f"{YT}videoId"), "title": entry.findtext(f"{ATOM}title"),
+                 "published": entry.findtext(f"{ATOM}published")}
+                for entry in root.iter(f"{ATOM}entry") if entry.findtext(f"{YT}videoId")]
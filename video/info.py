@@ -1,28 +1,24 @@
-import json
-import logging
-import subprocess
+from telemetry import span
+from video.extractor import VideoExtractor
 
 
 class VideoInfoRetriever:
     """
-    Retrieves metadata about a YouTube video using yt-dlp,
+    Retrieves metadata about a YouTube video using the yt-dlp API,
     including its duration in seconds.
     """
 
-    def __init__(self, url):
+    def __init__(self, url, extractor: VideoExtractor = None):
         self.url = url
+        self.extractor = extractor or VideoExtractor(url)
 
     def get_video_info(self):
         """
-        Uses yt-dlp to get video metadata in JSON and extracts its details.
+        Returns the video metadata dict extracted in-process by yt-dlp, or None on error.
+        The extraction is shared with the subtitle and audio steps through the extractor.
         """
-        cmd = ["yt-dlp", "--dump-single-json", self.url]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            logging.error("Error retrieving video info: %s", result.stderr)
-            return None
-        try:
-            return json.loads(result.stdout)
-        except json.JSONDecodeError:
-            logging.error("Failed to parse video info JSON.")
-            return None
+        with span("video.info") as s:
+            info = self.extractor.extract()
+            if info is not None:
+                s.set(video_id=info.get("id"), video_seconds=info.get("duration") or 0)
+            return info
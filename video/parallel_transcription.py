@@ -0,0 +1,68 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from video.backends import SAMPLE_RATE, BackendSpec
+
+# Set in each worker process by _init_worker
+_worker_backend = None
+
+
+def _init_worker(spec, model_name, threads):
+    global _worker_backend
+    # Each worker gets a share of the cores instead of every process spawning one thread per core
+    _worker_backend = spec.load(model_name, threads, device="cpu")
+    if _worker_backend is None:
+        raise RuntimeError(f"failed to load {spec.name} model '{model_name}'")
+
+
+def _transcribe_window(audio, language=None):
+    return _worker_backend.transcribe(audio, language=language)
+
+
+def _detect_language(audio):
+    return _worker_backend.detect_language(audio)
+
+
+class ParallelTranscriber:
+    """
+    CPU transcription in parallel: the audio windows (cut at silence by the decoder)
+    are transcribed by a process pool (one model per worker, with the backend's
+    threads capped per worker), and the segments are stitched in order.
+    """
+
+    def __init__(self, model_name, workers, threads_per_worker=None, backend=None):
+        backend = backend or BackendSpec()
+        self.model_name = model_name
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or backend.threads or max(1, (os.cpu_count() or 1) // workers)
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                        initargs=(backend, model_name, self.threads_per_worker))
+
+    def transcribe_windows(self, windows):
+        """
+        Transcribe an iterable of 16 kHz windows as they arrive, keeping at most two
+        windows per worker in flight. Returns (segments, detected language), the segment
+        times in seconds from the start of the first window.
+        """
+        language, futures, segments, start = None, deque(), [], 0
+
+        def collect():
+            future, offset = futures.popleft()
+            segments.extend(segment.shifted(offset / SAMPLE_RATE) for segment in future.result()[0])
+
+        for window in windows:
+            if language is None:
+                # A detection pass on the first window, much shorter than transcribing it, so
+                # every window (the first included) is then transcribed in parallel
+                language = self.pool.submit(_detect_language, window).result()
+            futures.append((self.pool.submit(_transcribe_window, window, language), start))
+            start += len(window)
+            while len(futures) > 2 * self.workers:
+                collect()
+        while futures:
+            collect()
+        return segments, language
+
+    def close(self):
+        self.pool.shutdown()
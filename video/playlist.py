@@ -0,0 +1,22 @@
+from video.extractor import VideoExtractor
+
+
+class PlaylistExpander:
+    """
+    Expands a YouTube playlist into the watch URLs of its videos using yt-dlp.
+    """
+
+    def __init__(self, url):
+        self.url = url
+
+    def get_video_urls(self):
+        """
+        Uses yt-dlp flat extraction to list the playlist entries without
+        fetching every video page. Returns a list of watch URLs (empty on error).
+        """
+        playlist = VideoExtractor.extract_flat(self.url)
+        if playlist is None:
+            return []
+
+        entries = playlist.get("entries") or []
+        return [f"https://www.youtube.com/watch?v={entry['id']}" for entry in entries if entry.get("id")]
@@ -0,0 +1,166 @@
+import bisect
+import logging
+import math
+import threading
+
+from telemetry import current_span
+from video.backends import Segment
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30
+
+_stats = {"transcriptions": 0, "original_seconds": 0.0, "processed_seconds": 0.0, "trimmed_seconds": 0.0,
+          "original_windows": 0, "windows": 0}
+_stats_lock = threading.Lock()
+
+
+def preprocessing_stats():
+    """
+    Totals of the audio preprocessed so far in this process, with the estimated
+    transcription speedup: the model pads every window to 30 seconds, so its cost
+    follows the number of windows, not the seconds of audio.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["speedup"] = stats["original_windows"] / stats["windows"] if stats["windows"] else None
+    return stats
+
+
+class TimestampMap:
+    """
+    Maps times in the preprocessed audio back to the original video. Each kept piece
+    of audio is recorded with its start in the processed audio and in the decoded
+    audio (sample offsets); decoded time is original time divided by the tempo.
+    """
+
+    def __init__(self, tempo=1.0):
+        self.tempo = tempo
+        self.processed = []
+        self.decoded = []
+
+    def add(self, processed_start, decoded_start):
+        # A piece that continues the previous one needs no entry of its own
+        if self.processed and decoded_start - self.decoded[-1] == processed_start - self.processed[-1]:
+            return
+        self.processed.append(processed_start)
+        self.decoded.append(decoded_start)
+
+    def to_original(self, seconds):
+        """
+        Return the time in the original video of a time in the preprocessed audio.
+        """
+        if not self.processed:
+            return seconds * self.tempo
+        i = max(0, bisect.bisect_right(self.processed, seconds * SAMPLE_RATE) - 1)
+        return (self.decoded[i] / SAMPLE_RATE + seconds - self.processed[i] / SAMPLE_RATE) * self.tempo
+
+    def segments_to_original(self, segments):
+        """
+        Return the segments with their times in the original video.
+        """
+        mapped = []
+        for segment in segments:
+            start = self.to_original(segment.start)
+            # An end on a cut belongs to the piece before it, not to the start of the next one
+            end = max(start, self.to_original(max(segment.start, segment.end - 1 / SAMPLE_RATE)))
+            mapped.append(Segment(start, end, segment.text))
+        return mapped
+
+
+class AudioPreprocessing:
+    """
+    Preprocessing between the audio decoder and the speech-to-text model, which cuts
+    the audio the model goes through:
+    - tempo > 1 speeds the audio up in ffmpeg (atempo keeps the pitch); Whisper stays
+      accurate up to about 1.5×.
+    - trim drops the stretches quieter than threshold_db (RMS in dBFS of 30 ms frames)
+      that last at least min_silence seconds, keeping padding seconds around speech,
+      and repacks the rest into full windows (see trim_windows).
+    Picklable like BackendSpec, so it reaches the transcription service.
+    """
+
+    def __init__(self, trim=False, tempo=1.0, threshold_db=-40.0, min_silence=0.5, padding=0.2):
+        if not 0.5 <= tempo <= 2.0:
+            raise ValueError(f"tempo must be between 0.5 and 2.0, not {tempo}")
+        self.trim = trim
+        self.tempo = tempo
+        self.threshold_db = threshold_db
+        self.min_silence = min_silence
+        self.padding = padding
+
+    @property
+    def enabled(self):
+        return self.trim or self.tempo != 1.0
+
+    @property
+    def tag(self):
+        """
+        Transcript cache suffix: "" without preprocessing, else e.g. "+trim-40+x1.25".
+        """
+        tag = f"+trim{self.threshold_db:g}" if self.trim else ""
+        return tag + (f"+x{self.tempo:g}" if self.tempo != 1.0 else "")
+
+    def apply(self, windows):
+        return PreprocessedAudio(windows, self)
+
+    def __repr__(self):
+        return f"AudioPreprocessing(trim={self.trim}, tempo={self.tempo:g}, threshold_db={self.threshold_db:g})"
+
+
+class PreprocessedAudio:
+    """
+    The windows the model gets, made from decoded (already tempo-adjusted) windows.
+    Once iterated, timestamps maps the processed audio back to the video, and the
+    seconds removed and the windows saved are logged, set on the current span and
+    added to preprocessing_stats().
+    """
+
+    def __init__(self, windows, settings: AudioPreprocessing):
+        self.windows = windows
+        self.settings = settings
+        self.timestamps = TimestampMap(settings.tempo)
+        self.decoded_samples = 0
+        self.processed_samples = 0
+        self.processed_windows = 0
+
+    def _decoded(self):
+        for window in self.windows:
+            self.decoded_samples += len(window)
+            yield window
+
+    def __iter__(self):
+        if self.settings.trim:
+            # numpy is only needed once there is audio to trim
+            from video.audio_stream import trim_windows
+            windows = trim_windows(self._decoded(), self.settings, self.timestamps)
+        else:
+            self.timestamps.add(0, 0)
+            windows = self._decoded()
+        for window in windows:
+            self.processed_samples += len(window)
+            self.processed_windows += 1
+            yield window
+        self._record()
+
+    def _record(self):
+        original = self.decoded_samples / SAMPLE_RATE * self.settings.tempo
+        processed = self.processed_samples / SAMPLE_RATE
+        # In seconds of the original video
+        trimmed = (self.decoded_samples - self.processed_samples) / SAMPLE_RATE * self.settings.tempo
+        # The windows the model would have gone through without preprocessing
+        original_windows = math.ceil(original / WINDOW_SECONDS)
+        with _stats_lock:
+            _stats["transcriptions"] += 1
+            _stats["original_seconds"] += original
+            _stats["processed_seconds"] += processed
+            _stats["trimmed_seconds"] += trimmed
+            _stats["original_windows"] += original_windows
+            _stats["windows"] += self.processed_windows
+        # tempo is a setting, not an amount: as a string it is not summed into the span totals
+        current_span().set(original_audio_seconds=original, trimmed_seconds=trimmed, original_windows=original_windows,
+                           windows=self.processed_windows, tempo=f"{self.settings.tempo:g}")
+        if self.processed_windows:
+            logging.info("Preprocessing: transcribed %.0fs of audio in %d windows instead of %.0fs in %d (%.0fs of "
+                         "non-speech removed, tempo %g×), about %.2f× less work", processed, self.processed_windows,
+                         original, original_windows, trimmed, self.settings.tempo,
+                         original_windows / self.processed_windows)
@@ -0,0 +1,48 @@
+from rich import filesize
+from rich.progress import BarColumn, Progress, TextColumn, TimeElapsedColumn
+
+
+class ProgressFeed:
+    """
+    Byte/time-based progress display shared by the audio download and streaming paths.
+    Updates report downloaded bytes and, when known, decoded audio seconds; the bar
+    tracks seconds against the video duration when available, bytes otherwise.
+    """
+
+    def __init__(self, description, total_bytes=None, total_seconds=None, show_progress=True):
+        self.total_bytes = total_bytes
+        self.total_seconds = total_seconds
+        self.downloaded_bytes = 0
+        self.seconds = 0.0
+        self.progress = Progress(TextColumn("{task.description}"), BarColumn(), TextColumn("{task.fields[size]}"),
+                                 TextColumn("{task.fields[audio]}"), TimeElapsedColumn(),
+                                 transient=True, disable=not show_progress)
+        total = total_seconds if total_seconds else total_bytes
+        self.task_id = self.progress.add_task(description, total=total, size="", audio="")
+
+    def __enter__(self):
+        self.progress.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.progress.stop()
+
+    def update(self, downloaded_bytes=None, total_bytes=None, seconds=None):
+        if downloaded_bytes is not None:
+            self.downloaded_bytes = downloaded_bytes
+        if total_bytes:
+            self.total_bytes = total_bytes
+        if seconds is not None:
+            self.seconds = seconds
+        size = filesize.decimal(self.downloaded_bytes)
+        if self.total_bytes:
+            size += f"/{filesize.decimal(self.total_bytes)}"
+        audio = ""
+        if self.seconds:
+            audio = f"{self.seconds / 60:.1f}"
+            audio += f"/{self.total_seconds / 60:.1f} min audio" if self.total_seconds else " min audio"
+        if self.total_seconds:
+            fields = {"completed": min(self.seconds, self.total_seconds), "total": self.total_seconds}
+        else:
+            fields = {"completed": self.downloaded_bytes, "total": self.total_bytes}
+        self.progress.update(self.task_id, size=size, audio=audio, **fields)
@@ -1,53 +1,187 @@
-import logging
-import subprocess
-from pathlib import Path
+import os
+import threading
+
+from telemetry import span
+from video.cleaning import LANGUAGE_CODES
+from video.extractor import VideoExtractor
+
+# Caption use since the process started; every transcript taken from captions is a Whisper run avoided
+_counters = {"manual": 0, "auto": 0, "translated": 0, "rescued": 0, "audio_seconds": 0.0}
+_counters_lock = threading.Lock()
+
+
+def language_code(language):
+    """
+    Turn a summary language ("english", "Deutsch", "pt-BR") into a base language code ("en", "de", "pt").
+    """
+    if not language:
+        return None
+    language = language.strip().lower()
+    return LANGUAGE_CODES.get(language, language).split("-")[0]
+
+
+class SubtitleTrack:
+    """
+    One downloadable caption track. kind is "manual", "auto" (speech recognition in the
+    spoken language) or "translated" (auto-captions machine-translated by YouTube).
+    """
+
+    def __init__(self, key, kind):
+        self.key = key
+        self.kind = kind
+        # yt-dlp lists the untranslated auto-captions as e.g. "en-orig" next to the translations
+        self.language = key[:-len("-orig")] if key.endswith("-orig") else key
+        self.base = self.language.split("-")[0].lower()
+
+    @property
+    def automatic(self):
+        return self.kind != "manual"
+
+    @property
+    def source(self):
+        return f"subs:{self.kind}:{self.language}"
+
+    def __repr__(self):
+        return f"SubtitleTrack({self.key!r}, {self.kind!r})"
+
+
+class SubtitleSelector:
+    """
+    Ranks the caption tracks of a video from the structured `subtitles` and
+    `automatic_captions` of its info dict, best first:
+    1. manual captions in the summary language
+    2. manual captions in the video's original language
+    3. auto-captions in the original language (untranslated speech recognition)
+    4. manual captions in any other language
+    5. auto-captions machine-translated into the summary language
+    When the original language is unknown, auto-captions in the summary language,
+    then English, then any language are used. Only tracks in `ext` are considered.
+    """
+
+    def __init__(self, target_language=None, ext="vtt"):
+        self.target = language_code(target_language)
+        self.ext = ext
+
+    def _available(self, tracks):
+        # live_chat and other non-caption entries have no track in the wanted format
+        return [key for key, formats in tracks.items() if any(f.get("ext") == self.ext for f in formats or [])]
+
+    @staticmethod
+    def original_language(info, automatic):
+        orig = next((key for key in automatic if key.endswith("-orig")), None)
+        if orig is not None:
+            return orig[:-len("-orig")].split("-")[0].lower()
+        language = info.get("language")
+        if language:
+            return language.split("-")[0].lower()
+        return automatic[0].split("-")[0].lower() if len(automatic) == 1 else None
+
+    def candidates(self, info):
+        """
+        Return (rank, track) pairs for every usable track of the info dict.
+        """
+        manual = self._available(info.get("subtitles") or {})
+        automatic = self._available(info.get("automatic_captions") or {})
+        original = self.original_language(info, automatic)
+        has_orig = any(key.endswith("-orig") for key in automatic)
+        ranked = []
+
+        for key in manual:
+            track = SubtitleTrack(key, "manual")
+            rank = 0 if track.base == self.target else 1 if track.base == original else 3
+            ranked.append((rank, track))
+
+        for key in automatic:
+            base = key.split("-")[0].lower()
+            if original is None:
+                rank = 4 if base == self.target else 5 if base == "en" else 6
+                ranked.append((rank, SubtitleTrack(key, "auto")))
+            elif base == original and (key.endswith("-orig") or not has_orig):
+                ranked.append((2, SubtitleTrack(key, "auto")))
+            elif base == self.target:
+                ranked.append((4, SubtitleTrack(key, "translated")))
+        return ranked
+
+    def rank(self, info):
+        """
+        Return the usable tracks best first; ties go to exact language codes ("en" over
+        "en-GB") and then to the order yt-dlp listed them in.
+        """
+        ranked = self.candidates(info)
+        order = sorted(range(len(ranked)), key=lambda i: (ranked[i][0], "-" in ranked[i][1].language, i))
+        return [ranked[i][1] for i in order]
+
+    def select(self, info):
+        tracks = self.rank(info)
+        return tracks[0] if tracks else None
 
 
 class SubtitleManager:
     """
     Manages subtitle checking and downloading from YouTube videos using yt-dlp.
+    The best caption track for the summary language is picked by SubtitleSelector
+    and only that one is downloaded.
     """
 
-    def __init__(self, url, output_dir):
+    def __init__(self, url, output_dir, extractor: VideoExtractor = None, language=None):
         self.url = url
-        self.output_dir = Path(output_dir)
+        self.output_dir = output_dir
+        self.extractor = extractor or VideoExtractor(url)
+        self.selector = SubtitleSelector(language)
+        self._track = None
+        self._selected = False
+
+    @property
+    def track(self):
+        """
+        The selected SubtitleTrack, or None if the video has no usable captions.
+        """
+        if not self._selected:
+            info = self.extractor.extract()
+            self._track = self.selector.select(info) if info is not None else None
+            self._selected = True
+        return self._track
+
+    @property
+    def source(self):
+        """
+        Transcript cache source of the track this manager downloads, e.g. "subs:manual:de".
+        """
+        return self.track.source if self.track is not None else None
 
     def check_and_download_subtitles(self):
         """
-        Check if subtitles are available and download them if so.
+        Download the best available caption track.
         Returns the path to the subtitle file if found, otherwise None.
         """
-        # Check available subtitles
-        cmd_list_subs = ["yt-dlp", "--list-subs", self.url]
-        result = subprocess.run(cmd_list_subs, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            logging.error("Error checking subtitles: %s", result.stderr)
+        track = self.track
+        if track is None:
             return None
+        with span("video.subtitles", source=track.source) as s:
+            path = self.extractor.download_subtitles(track.key, self.output_dir, automatic=track.automatic,
+                                                     ext=self.selector.ext)
+            if path is not None:
+                s.set(bytes=os.path.getsize(path))
+            return path
 
-        # Look for English subtitles in the output.
-        has_subtitles = any('en' in line.lower() for line in result.stdout.splitlines())
-
-        if not has_subtitles:
-            return None
+    def record_used(self):
+        """
+        Count the transcript taken from the selected track as a Whisper run avoided.
+        "rescued" counts the videos that only looking for English auto-captions would have sent to Whisper.
+        """
+        track = self.track
+        info = self.extractor.extract() or {}
+        with _counters_lock:
+            _counters[track.kind] += 1
+            _counters["rescued"] += "en" not in (info.get("automatic_captions") or {})
+            _counters["audio_seconds"] += info.get("duration") or 0
 
-        # Download the English auto-subtitles
-        cmd_download_subs = [
-            "yt-dlp",
-            "--skip-download",
-            "--write-auto-sub",
-            "--sub-lang", "en",
-            "--convert-subs", "vtt",
-            "-o", str(self.output_dir / "%(title)s.%(ext)s"),
-            self.url
-        ]
-        result = subprocess.run(cmd_download_subs, capture_output=True, text=True)
-        if result.returncode != 0:
-            logging.error("Error downloading subtitles: %s", result.stderr)
-            return None
 
-        # Find the downloaded .vtt file
-        vtt_files = list(self.output_dir.glob("*.en.vtt"))
-        if vtt_files:
-            return vtt_files[0].as_posix()
-        return None
+def subtitle_stats():
+    """
+    Return the caption counters: transcripts per track kind, Whisper runs avoided and the audio seconds they cover.
+    """
+    with _counters_lock:
+        stats = dict(_counters)
+    stats["whisper_avoided"] = stats["manual"] + stats["auto"] + stats["translated"]
+    return stats
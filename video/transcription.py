@@ -1,11 +1,21 @@
+import copy
 import logging
 import os
 import re
 import warnings
 
-import whisper
 from rich.console import Console
 
+from summary.tokens import estimate_tokens
+from telemetry import current_span, traced
+from video.backends import BackendSpec, segments_text
+from video.cleaning import TranscriptCleaner, get_cleaner
+from video.preprocessing import AudioPreprocessing
+from video.vtt import iter_vtt_segments
+
+SAMPLE_RATE = 16000
+SENTENCE_END = re.compile(r"(?<=[.!?…。？！])\s+")
+
 os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "expandable_segments:True"
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -18,81 +28,228 @@ class TranscriptProcessor:
     """
 
     @staticmethod
-    def clean_transcript(raw_transcript):
+    def clean_transcript(raw_transcript, language="en"):
         """
         Cleans the raw transcript by removing timecodes, tags, filler words,
-        duplicate phrases, and normalizing whitespace.
+        duplicate words, and normalizing whitespace (see TranscriptCleaner).
         """
-        # Step 1: Remove timecodes like <00:00:01.079>
-        cleaned = re.sub(r'<\d{2}:\d{2}:\d{2}\.\d{3}>', '', raw_transcript)
-
-        # Step 2: Remove tags like <c> and </c>
-        cleaned = re.sub(r'</?c>', '', cleaned)
-
-        # Step 3: Remove filler words (optional)
-        filler_words = ['um', 'uh', 'like', 'you know', 'so', 'actually']
-        pattern = r'\b(?:' + '|'.join(filler_words) + r')\b'
-        cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+        return get_cleaner(language).clean(raw_transcript)
 
-        # Step 4: Remove duplicate consecutive words (simple approach)
-        cleaned = re.sub(r'\b(\w+)( \1\b)+', r'\1', cleaned, flags=re.IGNORECASE)
-
-        # Step 5: Normalize whitespace
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+    @staticmethod
+    def split_sentences(transcript, max_words=40):
+        """
+        Split a transcript into sentences. Auto-captions have little or no punctuation,
+        so sentences longer than max_words are cut into max_words-word pieces.
+        """
+        sentences = []
+        for sentence in SENTENCE_END.split(transcript):
+            words = sentence.split()
+            for start in range(0, len(words), max_words):
+                sentences.append(" ".join(words[start:start + max_words]))
+        return sentences
 
-        return cleaned
+    @staticmethod
+    def vtt_segments(vtt_file, rolling=None):
+        """
+        Stream (start, end, text) segments from a WebVTT subtitle file,
+        with YouTube's rolling-cue duplicates removed (see iter_vtt_segments).
+        """
+        with open(vtt_file, 'r', encoding='utf-8') as f:
+            yield from iter_vtt_segments(f, rolling=rolling)
 
     @staticmethod
-    def vtt_to_text(vtt_file):
+    def vtt_to_text(vtt_file, language="en", rolling=None):
         """
         Convert a WebVTT subtitle file to a clean transcript text.
         """
-        lines = []
-        with open(vtt_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                if '-->' in line or line.strip() == "" or line.strip().startswith("WEBVTT"):
-                    continue
-                clean_line = re.sub(r'</?c>', '', line)
-                lines.append(clean_line.strip())
+        raw_transcript = " ".join(text for _, _, text in TranscriptProcessor.vtt_segments(vtt_file, rolling))
+        return TranscriptProcessor.clean_transcript(raw_transcript, language)
 
-        raw_transcript = " ".join(lines)
-        return TranscriptProcessor.clean_transcript(raw_transcript)
+    @staticmethod
+    def record_transcript(transcript):
+        """
+        Add the size of a finished transcript to the current span.
+        """
+        if transcript:
+            current_span().set(transcript_chars=len(transcript), transcript_tokens=estimate_tokens(transcript))
+
+    @staticmethod
+    @traced("transcript.subtitles")
+    def from_subtitles(subtitle_manager, video_id=None, cache=None):
+        """
+        Return the transcript of the subtitle track selected by subtitle_manager,
+        reading it from the transcript cache before downloading anything.
+        Returns None if the video has no usable subtitles.
+        """
+        track = subtitle_manager.track
+        if track is None:
+            return None
+        current_span().set(source=track.source)
+        transcript = cache.get(video_id, track.source) if cache is not None else None
+        if transcript:
+            current_span().set(cached=True)
+        else:
+            subtitle_file = subtitle_manager.check_and_download_subtitles()
+            if not subtitle_file:
+                return None
+            # Auto-captions roll; manual ones only when they carry word timings (see iter_vtt_segments)
+            transcript = TranscriptProcessor.vtt_to_text(subtitle_file, track.base, rolling=track.automatic or None)
+            if cache is not None:
+                cache.put(video_id, track.source, transcript)
+        subtitle_manager.record_used()
+        current_span().set(whisper_avoided=1)
+        TranscriptProcessor.record_transcript(transcript)
+        return transcript
 
 
 class Transcriber:
-    def __init__(self, model_name):
+    def __init__(self, model_name, cache=None, workers=1, threads_per_worker=None, backend: BackendSpec = None,
+                 preprocessing: AudioPreprocessing = None):
         self.model_name = model_name
+        self.cache = cache
+        self.spec = backend or BackendSpec()
+        self.preprocessing = preprocessing or AudioPreprocessing()
+        self.backend = None
+        self.parallel = None
+        # using() copies share the model; only the transcriber that loaded it closes it
+        self.shared = False
+        # Segments of the last transcription, timed in the original video (None when it came from the cache)
+        self.segments = None
+        if workers > 1:
+            # Chunked CPU mode: the models live in the worker processes
+            from video.parallel_transcription import ParallelTranscriber
+            self.parallel = ParallelTranscriber(model_name, workers, threads_per_worker, self.spec)
+            return
+        self.backend = self.spec.load(model_name)
+
+    @property
+    def loaded(self):
+        return self.backend is not None or self.parallel is not None
+
+    def using(self, preprocessing: AudioPreprocessing = None):
+        """
+        Return a transcriber sharing this one's model, with other preprocessing settings.
+        """
+        transcriber = copy.copy(self)
+        transcriber.preprocessing = preprocessing or AudioPreprocessing()
+        transcriber.shared = True
+        return transcriber
+
+    def close(self):
+        """
+        Shut down the worker processes of chunked CPU mode, each holding a model.
+        """
+        if self.parallel is not None and not self.shared:
+            self.parallel.close()
+            self.parallel = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def cache_source(model_name, backend: BackendSpec = None, preprocessing: AudioPreprocessing = None):
+        """
+        Transcript cache source for transcripts produced by the given model, backend and preprocessing.
+        """
+        tag = backend.tag if backend else "whisper"
+        return f"{tag}:{model_name}{preprocessing.tag if preprocessing else ''}"
+
+    def _cached(self, video_id):
+        self.segments = None
+        current_span().set(model=self.model_name, backend=self.spec.tag)
+        if self.cache is None:
+            return None
+        transcript = self.cache.get(video_id, self.cache_source(self.model_name, self.spec, self.preprocessing))
+        if transcript:
+            current_span().set(cached=True)
+            TranscriptProcessor.record_transcript(transcript)
+        return transcript
+
+    def _finish(self, raw_transcript, video_id, language="en", cleaned=False):
         try:
-            self.model = whisper.load_model(self.model_name)
+            transcript = raw_transcript if cleaned else TranscriptProcessor.clean_transcript(raw_transcript, language)
         except Exception as e:
-            logging.error("Error loading Whisper model '%s': %s", self.model_name, e)
-            self.model = None
+            logging.error("Error cleaning transcript: %s", e)
+            return None
+
+        if self.cache is not None:
+            self.cache.put(video_id, self.cache_source(self.model_name, self.spec, self.preprocessing), transcript)
+        TranscriptProcessor.record_transcript(transcript)
+        return transcript
+
+    @traced("whisper.transcribe")
+    def transcribe_with_whisper(self, audio_file, video_id=None):
+        """
+        Transcribe an audio file in 30-second windows decoded by an ffmpeg pipe (see
+        AudioFileDecoder), so memory stays flat however long the audio is. The windows
+        are preprocessed (see AudioPreprocessing) on their way to the model.
+        """
+        transcript = self._cached(video_id)
+        if transcript:
+            return transcript
 
-    def transcribe_with_whisper(self, audio_file):
-        if self.model is None:
+        if not self.loaded:
             logging.error("No model loaded; cannot transcribe.")
             return None
 
-        try:
-            audio = whisper.load_audio(audio_file)
-            snippet = whisper.pad_or_trim(audio)
-            mel = whisper.log_mel_spectrogram(snippet, n_mels=self.model.dims.n_mels).to(self.model.device)
-            _, probs = self.model.detect_language(mel)
-            detected_language = max(probs, key=probs.get)
-            console.print(f"[bold cyan]\nDetected language: {detected_language}[/bold cyan]")
-        except Exception as e:
-            logging.error("Error detecting language: %s", e)
+        # numpy is only needed once there is audio to decode; keep it out of the CLI startup
+        from video.audio_stream import AudioFileDecoder
+        decoder = AudioFileDecoder(audio_file, tempo=self.preprocessing.tempo)
+        return self._transcribe_windows(decoder.windows(), video_id)
+
+    @staticmethod
+    def _counted(windows):
+        # Adds each window's length to the audio_seconds of the span active while consuming them
+        span = current_span()
+        for window in windows:
+            span.add(audio_seconds=len(window) / SAMPLE_RATE)
+            yield window
+
+    @traced("whisper.transcribe_stream")
+    def transcribe_stream(self, windows, video_id=None):
+        """
+        Transcribe 16 kHz audio windows as they arrive (see AudioStreamer), so that
+        downloading, decoding and transcription overlap. The text of each window is
+        given as prompt to the next one to keep context across window boundaries.
+        The windows must already have the preprocessing tempo; trimming happens here.
+        """
+        transcript = self._cached(video_id)
+        if transcript:
+            return transcript
+
+        if not self.loaded:
+            logging.error("No model loaded; cannot transcribe.")
             return None
+        return self._transcribe_windows(windows, video_id)
+
+    def _timed(self, segments, preprocessed):
+        # Segment times are in the audio the model got; the preprocessing's map takes them back to the video
+        self.segments = preprocessed.timestamps.segments_to_original(segments) if preprocessed else segments
 
+    def _transcribe_windows(self, windows, video_id):
+        preprocessed = self.preprocessing.apply(windows) if self.preprocessing.enabled else None
+        windows = self._counted(preprocessed or windows)
         try:
-            result = self.model.transcribe(audio_file)
-            raw_transcript = result["text"]
+            if self.parallel is not None:
+                segments, detected_language = self.parallel.transcribe_windows(windows)
+                console.print(f"[bold cyan]\nDetected language: {detected_language}[/bold cyan]")
+                self._timed(segments, preprocessed)
+                return self._finish(segments_text(segments), video_id, detected_language)
+
+            # Each window is cleaned as soon as it is transcribed
+            cleaned, cleaner, segments = [], None, []
+            for window_segments, language in self.backend.transcribe_windows(windows):
+                if cleaner is None:
+                    console.print(f"[bold cyan]\nDetected language: {language}[/bold cyan]")
+                    cleaner = TranscriptCleaner(language)
+                cleaned.append(cleaner.feed(segments_text(window_segments)))
+                segments.extend(window_segments)
         except Exception as e:
             logging.error("Error during transcription: %s", e)
             return None
 
-        try:
-            return TranscriptProcessor.clean_transcript(raw_transcript)
-        except Exception as e:
-            logging.error("Error cleaning transcript: %s", e)
-            return None
+        self._timed(segments, preprocessed)
+        return self._finish(" ".join(text for text in cleaned if text), video_id, cleaned=True)
@@ -0,0 +1,322 @@
+import ipaddress
+import logging
+import os
+import queue
+import secrets
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+from cache.store import default_cache_dir, default_state_dir
+from video.backends import BackendSpec
+from video.preprocessing import AudioPreprocessing
+from video.transcription import Transcriber
+
+# A Unix socket only the user can reach; TCP on the loopback where there are none (Windows)
+DEFAULT_ADDRESS = str(default_state_dir() / "transcription.sock") if hasattr(socket, "AF_UNIX") else "127.0.0.1:50051"
+
+
+def parse_address(address):
+    """
+    Turn "host:port" into a TCP address tuple; anything else is used as a Unix socket path.
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def is_loopback(address):
+    """
+    Whether a parsed address is only reachable from this host: a Unix socket, or a
+    TCP host that resolves to loopback addresses only.
+    """
+    if isinstance(address, str):
+        return True
+    try:
+        return all(ipaddress.ip_address(info[4][0]).is_loopback for info in socket.getaddrinfo(address[0], None))
+    except (OSError, ValueError):
+        return False
+
+
+def get_authkey(create=False):
+    """
+    Secret shared by the service and its clients: YT_TLDR_TRANSCRIPTION_AUTHKEY, or a
+    random key in transcription.key (mode 0600) in the state directory, which the
+    server creates on its first start. Returns None when there is neither.
+    """
+    key = os.getenv("YT_TLDR_TRANSCRIPTION_AUTHKEY")
+    if key:
+        return key.encode("utf-8")
+    path = default_state_dir() / "transcription.key"
+    if create and not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    try:
+        return path.read_text(encoding="utf-8").strip().encode("utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def allowed_roots():
+    """
+    Directories the service transcribes files from: the temporary directory and the
+    cache directory (batch work directories and workspaces), plus the
+    YT_TLDR_TRANSCRIPTION_ROOTS directories (separated like PATH).
+    """
+    roots = [tempfile.gettempdir(), default_cache_dir()]
+    roots += [root for root in os.getenv("YT_TLDR_TRANSCRIPTION_ROOTS", "").split(os.pathsep) if root]
+    return [Path(root).expanduser().resolve() for root in roots]
+
+
+class TranscriptionJob:
+    def __init__(self, audio_file, model_name, backend: BackendSpec = None, preprocessing: AudioPreprocessing = None):
+        self.audio_file = audio_file
+        self.model_name = model_name
+        self.backend = backend or BackendSpec()
+        self.preprocessing = preprocessing
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.transcript = None
+        self.segments = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class TranscriptionServer:
+    """
+    Long-lived transcription worker that keeps Whisper models resident.
+
+    Summarizer processes on the same host send audio file paths over a local socket;
+    jobs are queued and run by `workers` threads, each using models from a small
+    LRU of loaded (backend, model size) pairs, so a model is loaded once instead of
+    once per video. A model keeps the threads and batch size of the request that loaded it.
+
+    Requests are pickled, so only clients holding the authkey (see get_authkey) are
+    accepted, and a non-loopback address is refused unless the key was set explicitly.
+    Only regular files under allowed_roots() are transcribed.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, max_models=2, workers=1, latency_window=200, roots=None):
+        self.address = parse_address(address)
+        if not is_loopback(self.address) and not os.getenv("YT_TLDR_TRANSCRIPTION_AUTHKEY"):
+            raise ValueError(f"refusing to listen on {address}, which other hosts can reach, without an explicit "
+                             f"YT_TLDR_TRANSCRIPTION_AUTHKEY")
+        self.roots = roots or allowed_roots()
+        self.max_models = max_models
+        self.workers = workers
+        self.jobs = queue.Queue()
+        self.models = OrderedDict()
+        self.models_lock = threading.Lock()
+        self.latencies = deque(maxlen=latency_window)
+        self.counters = {"completed": 0, "failed": 0, "active": 0, "model_loads": 0}
+        self.counters_lock = threading.Lock()
+
+    def _get_transcriber(self, model_name, backend: BackendSpec):
+        key = Transcriber.cache_source(model_name, backend)
+        with self.models_lock:
+            transcriber = self.models.get(key)
+            if transcriber is not None:
+                self.models.move_to_end(key)
+                return transcriber
+            while len(self.models) >= self.max_models:
+                evicted, _ = self.models.popitem(last=False)
+                logging.info("Unloading model '%s'", evicted)
+            logging.info("Loading model '%s'", key)
+            transcriber = Transcriber(model_name=model_name, backend=backend)
+            if not transcriber.loaded:
+                raise RuntimeError(f"failed to load model '{key}'")
+            self.models[key] = transcriber
+        with self.counters_lock:
+            self.counters["model_loads"] += 1
+        return transcriber
+
+    def _worker(self):
+        while True:
+            job = self.jobs.get()
+            job.started = time.perf_counter()
+            with self.counters_lock:
+                self.counters["active"] += 1
+            try:
+                transcriber = self._get_transcriber(job.model_name, job.backend).using(job.preprocessing)
+                job.transcript = transcriber.transcribe_with_whisper(job.audio_file)
+                job.segments = transcriber.segments
+                if not job.transcript:
+                    job.error = "transcription failed"
+            except Exception as e:
+                logging.exception("Transcription job failed")
+                job.error = str(e)
+            finally:
+                latency = time.perf_counter() - job.submitted
+                with self.counters_lock:
+                    self.counters["active"] -= 1
+                    self.counters["failed" if job.error else "completed"] += 1
+                    self.latencies.append(latency)
+                logging.info("Transcribed %s with '%s' in %.1fs (%.1fs queued); queue depth %d",
+                             job.audio_file, Transcriber.cache_source(job.model_name, job.backend), latency,
+                             job.started - job.submitted, self.jobs.qsize())
+                job.done.set()
+
+    def stats(self):
+        with self.counters_lock:
+            latencies = sorted(self.latencies)
+            stats = dict(self.counters)
+        stats["queue_depth"] = self.jobs.qsize()
+        with self.models_lock:
+            stats["models_loaded"] = list(self.models)
+        if latencies:
+            stats["latency_p50"] = statistics.median(latencies)
+            stats["latency_p95"] = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        return stats
+
+    def _check_path(self, audio_file):
+        path = Path(audio_file).resolve()
+        if not path.is_file() or not any(path.is_relative_to(root) for root in self.roots):
+            raise ValueError(f"not an audio file under {', '.join(map(str, self.roots))}: {audio_file}")
+        return str(path)
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    # A message that does not unpickle here, e.g. of a class the service cannot import
+                    conn.send({"ok": False, "error": f"unreadable request: {e}"})
+                    continue
+                if not isinstance(request, dict):
+                    conn.send({"ok": False, "error": f"expected a dict request, not {type(request).__name__}"})
+                    continue
+                if request.get("op") == "stats":
+                    conn.send(self.stats())
+                    continue
+                if request.get("op") != "transcribe":
+                    conn.send({"ok": False, "error": f"unknown op {request.get('op')!r}"})
+                    continue
+
+                try:
+                    audio_file = self._check_path(request["audio_file"])
+                except (KeyError, TypeError, ValueError) as e:
+                    logging.warning("Rejected transcription request: %s", e)
+                    conn.send({"ok": False, "error": str(e)})
+                    continue
+                job = TranscriptionJob(audio_file, request.get("model", "turbo"), request.get("backend"),
+                                       request.get("preprocessing"))
+                self.jobs.put(job)
+                job.done.wait()
+                conn.send({
+                    "ok": job.error is None,
+                    "transcript": job.transcript,
+                    "segments": job.segments,
+                    "error": job.error,
+                    "queue_wait": job.started - job.submitted,
+                    "latency": time.perf_counter() - job.submitted,
+                })
+
+    def _clear_socket(self):
+        # Remove the socket a previous server left behind, unless one is still listening on it
+        path = Path(self.address)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists():
+            return
+        with socket.socket(socket.AF_UNIX) as probe:
+            try:
+                probe.connect(self.address)
+            except OSError:
+                path.unlink()
+            else:
+                raise OSError(f"a transcription service is already listening on {self.address}")
+
+    def serve_forever(self):
+        if isinstance(self.address, str):
+            self._clear_socket()
+        authkey = get_authkey(create=True)
+        for _ in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+        with Listener(self.address, authkey=authkey) as listener:
+            if isinstance(self.address, str):
+                os.chmod(self.address, 0o600)
+            logging.info("Transcription service listening on %s", self.address)
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logging.warning("Rejected transcription client: %s", e)
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+class RemoteTranscriber:
+    """
+    Drop-in replacement for Transcriber that sends jobs to a TranscriptionServer.
+    The transcript cache is still consulted locally before any job is sent.
+    """
+
+    def __init__(self, address, model_name, cache=None, backend: BackendSpec = None,
+                 preprocessing: AudioPreprocessing = None):
+        self.address = parse_address(address)
+        self.model_name = model_name
+        self.cache = cache
+        self.backend = backend
+        self.preprocessing = preprocessing
+        self.segments = None
+
+    def _request(self, request):
+        authkey = get_authkey()
+        if authkey is None:
+            raise OSError("no transcription service key: start the service first or set YT_TLDR_TRANSCRIPTION_AUTHKEY")
+        with Client(self.address, authkey=authkey) as conn:
+            conn.send(request)
+            return conn.recv()
+
+    def transcribe_with_whisper(self, audio_file, video_id=None):
+        source = Transcriber.cache_source(self.model_name, self.backend, self.preprocessing)
+        self.segments = None
+        if self.cache is not None:
+            transcript = self.cache.get(video_id, source)
+            if transcript:
+                return transcript
+
+        try:
+            reply = self._request({"op": "transcribe", "audio_file": os.path.abspath(audio_file),
+                                   "model": self.model_name, "backend": self.backend,
+                                   "preprocessing": self.preprocessing})
+        except (OSError, AuthenticationError) as e:
+            logging.error("Error reaching the transcription service at %s: %s", self.address, e)
+            return None
+        if not reply["ok"]:
+            logging.error("Transcription service failed: %s", reply["error"])
+            return None
+        logging.info("Transcription service finished in %.1fs (%.1fs queued)", reply["latency"], reply["queue_wait"])
+        self.segments = reply.get("segments")
+
+        if self.cache is not None:
+            self.cache.put(video_id, source, reply["transcript"])
+        return reply["transcript"]
+
+    def stats(self):
+        return self._request({"op": "stats"})
+
+    def close(self):
+        # Every request opens its own connection, so there is nothing to release
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
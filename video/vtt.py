@@ -0,0 +1,103 @@
+import html
+import re
+from collections import deque
+
+TAG = re.compile(r"<[^>]*>")
+# Inline word timings, which only YouTube's rolling auto-captions have
+WORD_TIMING = re.compile(r"<(?:\d+:)?\d{2}:\d{2}\.\d{3}>")
+TIMING = re.compile(r"^\s*((?:\d+:)?\d{2}:\d{2}\.\d{3})\s+-->\s+((?:\d+:)?\d{2}:\d{2}\.\d{3})")
+
+
+def parse_timestamp(value):
+    """
+    Convert a WebVTT timestamp ("HH:MM:SS.mmm" or "MM:SS.mmm") to seconds.
+    """
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _cues(lines):
+    """
+    Yield (start, end, [text lines]) for every cue, skipping the header and NOTE/STYLE/REGION blocks.
+    """
+    start = end = None
+    text = []
+    skipping = True  # the WEBVTT header block
+    for line in lines:
+        line = line.rstrip("\r\n")
+        # Only an empty line ends a block: YouTube cues start with a line holding a single space
+        if not line:
+            if start is not None and text:
+                yield start, end, text
+            start, text, skipping = None, [], False
+            continue
+        if skipping:
+            continue
+        if start is None:
+            timing = TIMING.match(line)
+            if timing:
+                start, end = parse_timestamp(timing.group(1)), parse_timestamp(timing.group(2))
+            elif line.startswith(("NOTE", "STYLE", "REGION")):
+                skipping = True
+            # Otherwise a cue identifier line
+            continue
+        text.append(line)
+    if start is not None and text:
+        yield start, end, text
+
+
+def _overlap(tail, words, min_words):
+    """
+    Length of the longest suffix of tail that is a prefix of words. Overlaps shorter
+    than min_words only count when they cover all of words.
+    """
+    tail = list(tail)
+    for size in range(min(len(tail), len(words)), 0, -1):
+        if (size >= min_words or size == len(words)) and tail[-size:] == words[:size]:
+            return size
+    return 0
+
+
+def iter_vtt_segments(lines, rolling=None, min_overlap_words=3, tail_words=64):
+    """
+    Single-pass WebVTT parser yielding (start, end, text) segments with tags removed
+    and rolling-cue overlap dropped.
+
+    YouTube auto-captions roll: each line is repeated in two or three cues, a short
+    cue that shows the finished line again, then the next cue with that line on top
+    of the new words. In a rolling track (rolling=True, or when rolling is None, one
+    with inline word timings) the lines repeating the previous cue's lines are
+    skipped, and any remaining overlap between the emitted text and the start of a
+    cue (at least min_overlap_words words, or the whole cue) is cut, so every word
+    is emitted once. Other tracks are emitted cue by cue, so lines a speaker repeats
+    are kept. lines can be any iterable of lines, such as an open file, so files of
+    any size stream.
+    """
+    previous_lines = []
+    tail = deque(maxlen=tail_words)
+    for start, end, text in _cues(lines):
+        if rolling is None and any(WORD_TIMING.search(line) for line in text):
+            rolling = True
+        cue_lines = [" ".join(html.unescape(TAG.sub("", line)).split()) for line in text]
+        cue_lines = [line for line in cue_lines if line]
+        if not rolling:
+            if cue_lines:
+                yield start, end, " ".join(cue_lines)
+            continue
+
+        shown, skipped = cue_lines, 0
+        while skipped < len(cue_lines) and cue_lines[skipped] in previous_lines:
+            skipped += 1
+        previous_lines, cue_lines = shown, cue_lines[skipped:]
+        if not cue_lines:
+            continue
+
+        words = " ".join(cue_lines).split()
+        words = words[_overlap(tail, words, min_overlap_words):]
+        if not words:
+            continue
+
+        tail.extend(words)
+        yield start, end, " ".join(words)